@@ -6,14 +6,25 @@ agents should all be extensions of this class.
 """
 
 from mesa import Model
-from mesa import Agent as MesaAgent
 from grid_map.map_object import Road
+from grid_map.grid import WALL, ROAD, HUMAN, ZOMBIE
+from grid_map.spatial_index import ALL_KINDS
+from automaton.state import state_flag
+from .store import Traits
 from shapely.geometry import Point
 import os
 
+AVOIDING_ZOMBIE = state_flag("AvoidingZombie")
 
-class Agent(MesaAgent):
-    """Our own Agent class, extends the agent class from the mesa framework.
+
+class Agent:
+    """Our own Agent class, with the interface of the agent class of mesa.
+
+    Agents keep their fields in slots instead of a per instance dict, so
+    subclasses have to declare the fields they add in __slots__. The
+    direction, age, states and traits of an agent are kept in its slot of the
+    AgentStore of the model, see store.py. The grid keeps the position of the
+    agent in the store up to date.
 
     Args:
         pos (tuple): Position of the agent.
@@ -23,16 +34,30 @@ class Agent(MesaAgent):
     Attributes:
         states (list): Keep track of the current states for the finite state
                        machine used to program agent behaviour.
-        traits (dict): Information about properties of the agent, how far it
-                       can see, for example.
+        state_flags (int): The bits of the current states or-ed together, to
+                           check if the agent is in a state.
+        traits (:obj:): Information about properties of the agent, how far it
+                        can see, for example. A dict like view of the
+                        traits in the store, made when it is read.
         fsm (:obj:): The finite state machine that defines the agents behaviour
                      pos (tuple): The agents position.
         time_alive (int): The amount of steps an agent has been alive for.
+        decisions (dict): Results of computations made in the current step,
+                          with the position and neighbourhood they were made
+                          for, None until one is remembered.
         agent_type (string): String specifying the type of the agent.
         model (:obj:): The model an agent is spawned in.
+        store (:obj:): The AgentStore of the model.
+        slot (int): The slot of the agent in the store.
+        unique_id (int): Number of the agent, unique within its model.
 
     """
 
+    __slots__ = ("unique_id", "model", "store", "slot", "states", "fsm",
+                 "pos", "decisions")
+
+    agent_type = ""
+
     def __init__(self, pos, model, fsm):
         """Initialize the agent.
 
@@ -40,56 +65,89 @@ class Agent(MesaAgent):
         position, and finite state machine.
 
         """
-        super().__init__(model.total, model)
-
+        self.unique_id = model.total
+        self.model = model
+        self.store = model.store
+        self.slot = model.store.add(self)
         self.states = []
-        self.traits = {}
         self.fsm = fsm
         self.pos = pos
         self.time_alive = 0
-        self.agent_type = ""
-        self.model = model
+        self.decisions = None
         # Add one to the counter of total agents in the model
         self.model.total += 1
 
+    @property
+    def random(self):
+        """The random number generator of the model."""
+        return self.model.random
+
+    @property
+    def traits(self):
+        """Dict like view of the traits of the agent in the store."""
+        return Traits(self.store, self.slot)
+
+    @property
+    def direction(self):
+        """Direction the agent moved in last."""
+        return (self.store.direction_x.item(self.slot),
+                self.store.direction_y.item(self.slot))
+
+    @direction.setter
+    def direction(self, direction):
+        """Set the direction the agent moved in last."""
+        self.store.direction_x[self.slot] = direction[0]
+        self.store.direction_y[self.slot] = direction[1]
+
+    @property
+    def time_alive(self):
+        """The amount of steps the agent has been alive for."""
+        return self.store.time_alive.item(self.slot)
+
+    @time_alive.setter
+    def time_alive(self, time_alive):
+        """Set the amount of steps the agent has been alive for."""
+        self.store.time_alive[self.slot] = time_alive
+
+    @property
+    def state_flags(self):
+        """The bits of the current states of the agent or-ed together."""
+        return self.store.state_flags.item(self.slot)
+
+    @state_flags.setter
+    def state_flags(self, state_flags):
+        """Set the bits of the current states of the agent."""
+        self.store.state_flags[self.slot] = state_flags
+
+    def blocked(self):
+        """Get the occupancy bits of the cells the agent can't move into.
+
+        Returns:
+            (int): Occupancy bits, see grid.py.
+
+        """
+        # Cells with a wall, human or zombie can't be overlapped
+        blocked = WALL | HUMAN | ZOMBIE
+
+        if self.agent_type == "zombie" or \
+                (not self.state_flags & AVOIDING_ZOMBIE and
+                 os.environ["mode"] == "5"):
+            blocked |= ROAD
+
+        return blocked
+
     def get_moves(self):
         """Find all cells an agent can move to.
 
-        Gets all non-occupied cells 1 space around the agent, and finds all
-        cells without any overlap.
+        Reads the occupancy raster of the grid around the agent, and finds all
+        cells which are not occupied by anything the agent can't overlap with.
 
         Returns:
             (list): List containing all free cells an agent can move to.
 
         """
-        grid = self.model.grid
-        # List of agents we can't overlap with
-        no_overlap = ["wall", "human", "zombie"]
-
-        if self.agent_type == "zombie" or \
-                ("AvoidingZombie" not in self.states and os.environ["mode"] == "5"):
-            no_overlap.append("road")
-
         # Always give the option to stay on your current location(stand still)
-        all_cells = self.neighbors()
-        free_cells = [self.pos]
-
-        # Get rid of cells that we may not move to by iterating through all
-        # cells next to the agent, and only adding non-occupied cells
-        for cell in all_cells:
-            cell_occupied = False
-            x, y = cell.pos
-            # If there are agents in the current cell, and we are not allowed
-            # to overlap with any of those agents, the cell is occupied.
-            # Only add cells which are not occupied.
-            if not grid.is_cell_empty((x, y)):
-                for agent in grid[x][y]:
-                    if agent.agent_type in no_overlap:
-                        cell_occupied = True
-                        break
-            if not cell_occupied:
-                free_cells.append((x, y))
-        return free_cells
+        return self.model.grid.free_cells(self.pos, self.blocked())
 
     def best_cell(self, coord):
         """Find the nearest cell to a given coordinate.
@@ -133,27 +191,81 @@ class Agent(MesaAgent):
             self.model.susceptible -= 1
         del self
 
-    def neighbors(self, moore=True, include_center=True, radius=1):
-        """Get the direct neighbours of an agent.
+    def neighbors(self, moore=True, include_center=True, radius=1,
+                  kinds=ALL_KINDS):
+        """Get the neighbours of an agent.
 
-        Gets the neighbours with distance 1 of an agent by using the
-        get_neighbours function from the mesa framework.
+        Gets the neighbours within a distance of an agent from the grid. While
+        the agent takes its step, the grid answers repeated queries from one
+        scan of the agents vision.
 
         Args:
             moore=True (bool): If true, get diagonal neighbours as well.
             include_center=True (bool): Include self if true.
             radius=1 (int): Range in which neighbours can be found.
+            kinds=ALL_KINDS (int): Kinds of agents to get, see
+                                   spatial_index.py.
 
         Returns:
-            (list): List of direct neighbours.
+            (list): List of neighbours, which must not be modified.
 
         """
-        return self.model.grid.get_neighbors(self.pos, moore, include_center,
-                                             radius)
+        return self.model.grid.agent_neighbors(
+            self, moore, include_center, radius,
+            scan_radius=self.traits.get("vision", radius), kinds=kinds)
+
+    def recall(self, key):
+        """Get a decision remembered in this step, if it still holds.
+
+        A decision holds as long as the agent has not moved, and nothing
+        entered or left the cells within its vision.
+
+        Args:
+            key (:obj:): Key the decision was remembered under.
+
+        Returns:
+            (:obj:): The remembered decision.
+            None: If there is no decision, or it no longer holds.
+
+        """
+        if self.decisions is None:
+            return None
+
+        decision = self.decisions.get(key)
+
+        if decision is None or decision[0] != self.pos:
+            return None
+
+        window = self.model.grid.window(self, self.traits["vision"])
+
+        if window is None or decision[1] is not window:
+            return None
+
+        return decision[2]
+
+    def remember(self, key, value):
+        """Remember a decision, so the states can reuse it in this step.
+
+        Only decisions of the agent taking its step are remembered.
+
+        Args:
+            key (:obj:): Key to remember the decision under.
+            value (:obj:): The decision, which may not be None.
+
+        """
+        window = self.model.grid.window(self, self.traits["vision"])
+
+        if window is not None:
+            if self.decisions is None:
+                self.decisions = {}
+
+            self.decisions[key] = (self.pos, window, value)
 
     def step(self):
         """Execute one step for an agent."""
         self.time_alive += 1
+        self.decisions = None
+        self.model.grid.activate(self)
         self.fsm.update(self)
 
         for state in self.states:
@@ -162,8 +274,20 @@ class Agent(MesaAgent):
 
             state.on_update(self)
 
+    def parked_step(self):
+        """Execute one step without trying the transitions of the states.
+
+        Used by LazyActivation for agents none of whose transitions can
+        happen in this step, see scheduler.py.
+
+        """
+        self.time_alive += 1
+        self.decisions = None
+        self.model.grid.activate(self)
+
+        for state in self.states:
+            state.on_update(self)
+
     def on_road(self):
-        """Check if agent shares a cell with a Road object."""
-        for obj in self.model.grid[self.pos[0]][self.pos[1]]:
-            if obj.agent_type == "road":
-                return obj
+        """Get the Road object of the cell the agent is on, if there is one."""
+        return self.model.grid.road_at(self.pos)
@@ -1,6 +1,7 @@
 """The human agent class for simulating humans."""
 
 from .agent import Agent
+from grid_map.spatial_index import ZOMBIES
 
 
 class HumanAgent(Agent):
@@ -12,6 +13,10 @@ class HumanAgent(Agent):
 
     """
 
+    __slots__ = ()
+
+    agent_type = "human"
+
     def __init__(self, pos, model, fsm):
         """Initialize the human agent.
 
@@ -23,7 +28,6 @@ class HumanAgent(Agent):
         """
         super().__init__(pos, model, fsm)
 
-        self.agent_type = "human"
         self.direction = (0, 0)
         self.model.susceptible += 1
 
@@ -78,9 +82,7 @@ class HumanAgent(Agent):
         """Bruteforce algorithm for getting the best cell to move to.
 
         For every free cell, calculates the priority for moving to the cell,
-        and returns the cell with the highest priority.
-        The priority is determined by adding the squared distances between the
-        cell and zombies.
+        and returns the direction to a cell with the highest priority.
 
         Args:
             nearby_zombies (list): list of zombies the HumanAgent can see.
@@ -90,6 +92,27 @@ class HumanAgent(Agent):
                      for the human.
             None: If no direction was found.
 
+        """
+        best_cells = self.bruteforce_cells(nearby_zombies)
+
+        if best_cells:
+            return self.vector_to(self.random.choice(best_cells))
+
+        return None
+
+    def bruteforce_cells(self, nearby_zombies):
+        """Get the free cells with the highest bruteforce priority.
+
+        The priority is determined by adding the square roots of the distances
+        between the cell and zombies.
+
+        Args:
+            nearby_zombies (list): list of zombies the HumanAgent can see.
+
+        Returns:
+            (list): The cells with the highest priority.
+            None: If there are no zombies.
+
         """
         free_cells = self.get_moves()
         best_cells = None
@@ -113,30 +136,37 @@ class HumanAgent(Agent):
                 elif priority == best_cells[0]:
                     best_cells[1].append(cell)
 
-            choice = self.random.choice(best_cells[1])
+            return best_cells[1]
+        else:
+            return None
 
-            # Create a normalized vector for the direction of the agent
-            vector = [choice[0] - self.pos[0], choice[1] - self.pos[1]]
-            length = (vector[0]**2 + vector[1]**2)**0.5
+    def vector_to(self, cell):
+        """Get the normalized vector from the agent to a cell.
 
-            if vector[0]:
-                vector[0] /= length
-            if vector[1]:
-                vector[1] /= length
+        Args:
+            cell (tuple): Cell the vector points to.
 
-            return (vector[0], vector[1])
-        else:
-            return None
+        Returns:
+            (tuple): Tuple containing the x and y coordinate of the vector.
 
-    def find_escape(self, neighbours):
-        """Find the best possible cell a human can go to.
+        """
+        vector = [cell[0] - self.pos[0], cell[1] - self.pos[1]]
+        length = (vector[0]**2 + vector[1]**2)**0.5
 
-        Finds the best possible cell to go for a human agent. Do this by first
-        trying the running_direction method. If the human is stuck, this method
-        doesn't work and the bruteforce method is used.
+        if vector[0]:
+            vector[0] /= length
+        if vector[1]:
+            vector[1] /= length
 
-        Args:
-            neighbours (list): List of neighbours with a distance of 1.
+        return (vector[0], vector[1])
+
+    def find_escape(self):
+        """Find the best possible cell a human can go to.
+
+        Finds the best possible cell to go for a human agent, away from the
+        zombies within vision. Do this by first trying the running_direction
+        method. If the human is stuck, this method doesn't work and the
+        bruteforce method is used.
 
         Returns:
             (tuple): Tuple containing the x and y coordinate of the direction
@@ -144,9 +174,36 @@ class HumanAgent(Agent):
             None: If no direction was found.
 
         """
-        nearby_zombies = [agent for agent in neighbours if
-                          agent.agent_type == "zombie"]
+        vector, best_cells = self.escape_plan()
+
+        if best_cells:
+            return self.vector_to(self.random.choice(best_cells))
+
+        return vector
+
+    def escape_plan(self):
+        """Get the running direction and, if it fails, the bruteforce cells.
+
+        A plan to escape from zombies is remembered for the rest of the step,
+        as long as nothing around the human changes and it is blocked by the
+        same cells. Only the random choice between the bruteforce cells is
+        made again every time the plan is used.
+
+        Returns:
+            (tuple): The running direction, None if no zombie is in vision,
+                     and the bruteforce cells if the running direction makes
+                     the human stand still, None otherwise.
+
+        """
+        plan = self.recall("escape")
+
+        if plan is not None and plan[0] == self.blocked():
+            return plan[1:]
+
+        nearby_zombies = self.neighbors(radius=self.traits["vision"],
+                                        kinds=ZOMBIES)
         vector = self.running_direction(nearby_zombies)
+        best_cells = None
 
         if vector:
             # If the vector doesnt find an escape route(agent stands still),
@@ -156,11 +213,12 @@ class HumanAgent(Agent):
             new_cell = self.best_cell([new_x, new_y])
 
             if new_cell == self.pos:
-                vector = self.bruteforce(nearby_zombies)
+                best_cells = self.bruteforce_cells(nearby_zombies)
 
-            return vector
+        if vector:
+            self.remember("escape", (self.blocked(), vector, best_cells))
 
-        return None
+        return vector, best_cells
 
     def setVision(self, vision_radius):
         """Set the vision radius for a human agent.
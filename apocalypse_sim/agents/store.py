@@ -0,0 +1,255 @@
+"""store.py.
+
+Storage of the fields of all agents of a model in NumPy columns, one row (slot)
+per agent. Agents are thin objects which read and write their row, so batched
+computations can read the positions, directions or traits of all agents as
+whole columns without touching the agent objects.
+"""
+from collections.abc import MutableMapping
+
+import numpy as np
+
+# Traits kept in columns, with the type of their column. Every trait has a
+# bit in the trait_flags column, which is set while the agent has the trait.
+TRAIT_TYPES = {
+    "vision": np.int16,
+    "incubation_time": np.int32,
+    "time_at_infection": np.int32,
+    "time_at_reproduction": np.int32,
+    "zombie_kills": np.int32,
+    "infected": np.bool_,
+    "speed": np.float64,
+    "dir_x": np.float64,
+    "dir_y": np.float64,
+}
+
+TRAIT_BITS = {name: 1 << i for i, name in enumerate(
+    ["vision", "incubation_time", "time_at_infection", "time_at_reproduction",
+     "zombie_kills", "infected", "speed", "dir"])}
+
+# Columns of the fields every agent has.
+FIELD_TYPES = {
+    "x": np.int32,
+    "y": np.int32,
+    "direction_x": np.int8,
+    "direction_y": np.int8,
+    "time_alive": np.int32,
+    "state_flags": np.int64,
+    "kind": np.int8,
+    "trait_flags": np.int16,
+}
+
+
+class AgentStore:
+    """Columns with the fields of all agents of a model.
+
+    Slots are not reused, an agent that is removed from the model keeps its
+    row, so references that outlive it still read its last values.
+
+    Attributes:
+        size (int): Number of slots in use.
+        agents (list): The agent of every slot.
+        columns (dict): The column of every field and trait, the columns are
+                        also attributes of the store under the same name.
+        extras (dict): For the slots of agents with traits that are not kept
+                       in columns, a dict of those traits.
+
+    """
+
+    def __init__(self, capacity=256):
+        """Initialize a store with room for a number of agents.
+
+        Args:
+            capacity (int): Number of slots to allocate at first, the columns
+                            grow when they are full.
+
+        """
+        self.size = 0
+        self.agents = []
+        self.columns = {}
+        self.extras = {}
+
+        for name, dtype in list(FIELD_TYPES.items()) + \
+                list(TRAIT_TYPES.items()):
+            self.columns[name] = np.zeros(capacity, dtype=dtype)
+
+        self.columns["x"][:] = -1
+        self.columns["y"][:] = -1
+        self.__dict__.update(self.columns)
+
+    def add(self, agent):
+        """Give an agent a slot.
+
+        Args:
+            agent (:obj:): The new agent.
+
+        Returns:
+            (int): The slot of the agent.
+
+        """
+        if self.size == len(self.x):
+            self.grow()
+
+        slot = self.size
+        self.size += 1
+        self.agents.append(agent)
+
+        return slot
+
+    def grow(self):
+        """Double the number of slots of all columns."""
+        for name, column in self.columns.items():
+            grown = np.zeros(2 * len(column), dtype=column.dtype)
+            grown[:len(column)] = column
+
+            if name in ("x", "y"):
+                grown[len(column):] = -1
+
+            self.columns[name] = grown
+
+        self.__dict__.update(self.columns)
+
+    def slots(self, kinds):
+        """Get the slots of the agents on the grid of some kinds.
+
+        Args:
+            kinds (int): Kinds of agents, see spatial_index.py.
+
+        Returns:
+            (:obj:): Array with the slots, in order of slot.
+
+        """
+        return np.flatnonzero(self.kind[:self.size] & kinds)
+
+    def positions(self, slots):
+        """Get an array of shape (n, 2) with the positions of slots."""
+        return np.stack([self.x[slots], self.y[slots]], axis=1)
+
+
+class Traits(MutableMapping):
+    """Dict like view of the traits of an agent in the store.
+
+    Only the traits in TRAIT_TYPES are kept in columns, other traits are kept
+    in the extras of the store. A trait is in the view once it is set, like a
+    key in a dict, so "infected" in traits is only true once infected is set.
+    Views keep nothing of their own, so any number of them can be made for a
+    slot.
+
+    """
+
+    __slots__ = ("store", "slot")
+
+    def __init__(self, store, slot):
+        """Make the view of the traits of the agent in a slot."""
+        self.store = store
+        self.slot = slot
+
+    @property
+    def extra(self):
+        """Dict of the traits not kept in columns, None if there are none."""
+        return self.store.extras.get(self.slot)
+
+    def __getitem__(self, name):
+        """Get the value of a trait, raise KeyError if it is not set."""
+        bit = TRAIT_BITS.get(name)
+
+        if bit is None:
+            extra = self.extra
+
+            if extra is None:
+                raise KeyError(name)
+
+            return extra[name]
+
+        store = self.store
+        slot = self.slot
+
+        if not store.trait_flags.item(slot) & bit:
+            raise KeyError(name)
+
+        if name == "dir":
+            return (store.dir_x.item(slot), store.dir_y.item(slot))
+
+        return store.columns[name].item(slot)
+
+    def get(self, name, default=None):
+        """Get the value of a trait, default if it is not set."""
+        bit = TRAIT_BITS.get(name)
+
+        if bit is None or name == "dir":
+            return super().get(name, default)
+
+        store = self.store
+
+        if not store.trait_flags.item(self.slot) & bit:
+            return default
+
+        return store.columns[name].item(self.slot)
+
+    def __setitem__(self, name, value):
+        """Set the value of a trait."""
+        bit = TRAIT_BITS.get(name)
+
+        if bit is None:
+            self.store.extras.setdefault(self.slot, {})[name] = value
+            return
+
+        store = self.store
+        slot = self.slot
+
+        if name == "dir":
+            store.dir_x[slot] = value[0]
+            store.dir_y[slot] = value[1]
+        else:
+            store.columns[name][slot] = value
+
+        store.trait_flags[slot] |= bit
+
+    def __delitem__(self, name):
+        """Remove a trait."""
+        bit = TRAIT_BITS.get(name)
+
+        if bit is None:
+            extra = self.extra
+
+            if extra is None:
+                raise KeyError(name)
+
+            del extra[name]
+            return
+
+        if not self.store.trait_flags.item(self.slot) & bit:
+            raise KeyError(name)
+
+        self.store.trait_flags[self.slot] &= ~bit
+
+    def __contains__(self, name):
+        """Return True if the trait is set."""
+        bit = TRAIT_BITS.get(name)
+
+        if bit is None:
+            extra = self.extra
+            return extra is not None and name in extra
+
+        return bool(self.store.trait_flags.item(self.slot) & bit)
+
+    def __iter__(self):
+        """Iterate over the names of the traits that are set."""
+        flags = self.store.trait_flags.item(self.slot)
+
+        for name, bit in TRAIT_BITS.items():
+            if flags & bit:
+                yield name
+
+        extra = self.extra
+
+        if extra is not None:
+            yield from extra
+
+    def __len__(self):
+        """Return the number of traits that are set."""
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        """Show the traits like a dict."""
+        return repr(dict(self))
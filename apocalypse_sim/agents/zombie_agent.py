@@ -1,6 +1,7 @@
 """The zombie agent class for simulating zombies."""
 
 from .agent import Agent
+from grid_map.spatial_index import SUSCEPTIBLE
 
 
 class ZombieAgent(Agent):
@@ -13,6 +14,10 @@ class ZombieAgent(Agent):
 
     """
 
+    __slots__ = ("target",)
+
+    agent_type = "zombie"
+
     def __init__(self, pos, model, fsm):
         """Initialize the zombie agent.
 
@@ -24,55 +29,81 @@ class ZombieAgent(Agent):
         """
         super().__init__(pos, model, fsm)
 
-        self.agent_type = "zombie"
         self.target = None
         self.model.infected += 1
 
         self.setVision(7)
 
-    def nearest_brain(self, neighbours):
+    def nearest_brain(self):
         """Create a vector to a target human the zombie is tracking.
 
         Finds the nearest uninfected human to the ZombieAgent by iterating
-        through all given humans, and making a list of the humans with the
-        smallest euclidian distance to the ZombieAgent. Based on this list and
-        target of the zombie, the zombie will pick its new target. He will
-        chase this new target.
-
-        Args:
-            neighbours (list): A list containing all nearby agents.
+        through all susceptible humans within vision, and making a list of the
+        humans with the smallest euclidian distance to the ZombieAgent. Based
+        on this list and target of the zombie, the zombie will pick its new
+        target. He will chase this new target. In batched chasing mode the
+        nearest humans come from the batch of the current step.
 
         Returns:
             (tuple): Position of the current target, if one is found
             None: If no nearby susceptible human was found
 
         """
-        nearby_humans = [agent for agent in neighbours if
-                         agent.agent_type == "human" and "Infected" not in
-                         [state.name for state in agent.states]]
-                         
-        if len(nearby_humans) > 0:
-            nearest = None
-
-            for human in nearby_humans:
-                distance = ((abs(human.pos[0] - self.pos[0])**2 +
-                             abs(human.pos[1] - self.pos[1])**2))**0.5
-                if not nearest:
-                    nearest = [distance, [human]]
-                elif distance < nearest[0]:
-                    nearest = [distance, [human]]
-                elif distance == nearest[0]:
-                    nearest[1].append(human)
+        nearest = None
+
+        if self.model.chasing == "batched":
+            nearest = self.model.nearest_humans.get(self)
 
+        if nearest is None:
+            nearest = self.nearest_humans()
+
+        if nearest:
             # If your target is not in list of nearest humans, pick a new
             # target
-            if (not (self.target and self.target in nearest[1])):
-                self.target = self.random.choice(nearest[1])
+            if (not (self.target and self.target in nearest)):
+                self.target = self.random.choice(nearest)
 
             return self.target.pos
 
         return None
 
+    def nearest_humans(self):
+        """Find the nearest susceptible humans within vision.
+
+        Found humans are remembered for the rest of the step, as long as
+        nothing around the zombie changes.
+
+        Returns:
+            (list): The humans with the smallest euclidian distance to the
+                    ZombieAgent, empty if no human is within vision.
+
+        """
+        nearest = self.recall("nearest")
+
+        if nearest is not None:
+            return nearest
+
+        nearby_humans = self.neighbors(radius=self.traits["vision"],
+                                       kinds=SUSCEPTIBLE)
+        nearest = None
+
+        for human in nearby_humans:
+            distance = ((abs(human.pos[0] - self.pos[0])**2 +
+                         abs(human.pos[1] - self.pos[1])**2))**0.5
+            if not nearest:
+                nearest = [distance, [human]]
+            elif distance < nearest[0]:
+                nearest = [distance, [human]]
+            elif distance == nearest[0]:
+                nearest[1].append(human)
+
+        if not nearest:
+            return []
+
+        self.remember("nearest", nearest[1])
+
+        return nearest[1]
+
     def move(self):
         """Move a zombie agent to the best possible cell.
 
@@ -81,9 +112,7 @@ class ZombieAgent(Agent):
         is the one closest to the human.
 
         """
-        neighbours = self.model.grid.get_neighbors(self.pos, True, True,
-                                                   self.traits["vision"])
-        nearest_human = self.nearest_brain(neighbours)
+        nearest_human = self.nearest_brain()
 
         if nearest_human:
             new_cell = self.best_cell([nearest_human[0], nearest_human[1]])
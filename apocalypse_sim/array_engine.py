@@ -0,0 +1,587 @@
+"""array_engine.py.
+
+Engine which runs the simulation on NumPy arrays instead of agent objects.
+Humans and zombies are rows in arrays of positions, directions and timers.
+Every step the humans turn first, and then every agent acts in one of ROUNDS
+rounds drawn at random: in its round a zombie fights the humans next to it,
+and then every agent of the round wanders, chases, flees or herds, seeing the
+moves of the rounds before. Moves into the same cell are resolved by a random
+ranking of the agents drawn from the seed of the model, so a seed always gives
+the same run.
+
+The rules are those of the states of the automaton, with the agents of a
+round acting at once instead of one after another, so runs match the ones of
+the agent objects in distribution, not step by step. With a single round all
+agents act on the state at the start of the step, so zombies chase humans
+that already moved away and every fight comes before every move, which makes
+the humans win far more often than with the agent objects. Maps with a door
+or roads that block agents are not supported.
+"""
+from automaton.chasing import nearest_targets
+from automaton.escape import MOVE_OFFSETS, escape_plans, free_moves, \
+    nearest_moves
+from automaton.herding import herd_directions, window_sums
+from grid_map.grid import WALL, ROAD, HUMAN, ZOMBIE
+from grid_map.spatial_index import HUMANS, ZOMBIES
+
+import numpy as np
+import os
+
+# Offsets of the cells next to an agent and its own cell, in the order a
+# neighbourhood query lists them.
+NEIGHBOURHOOD = np.array([(dx, dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1)])
+
+# Vision of a human turned into a zombie, like ZombieAgent.setVision.
+ZOMBIE_VISION = 7
+
+# Index in MOVE_OFFSETS of every offset.
+MOVE_INDEX = {tuple(offset): i
+              for i, offset in enumerate(MOVE_OFFSETS.tolist())}
+
+# Number of rounds a step is split into, see engine_validation.py in the
+# experiments for how close the runs get to the ones of the agent objects.
+ROUNDS = 8
+
+# The arrays with a row per human and per zombie.
+HUMAN_FIELDS = ("human_ids", "human_pos", "human_dir", "human_vision",
+                "kills", "infected_at", "human_round")
+ZOMBIE_FIELDS = ("zombie_pos", "zombie_vision", "zombie_target",
+                 "zombie_busy", "zombie_round")
+
+COUNTERS = ("susceptible", "infected", "carrier", "recovered")
+
+
+def split_outbreak(rows):
+    """Split rows of humans and zombies into the two sides of the outbreak.
+
+    Args:
+        rows (dict): At least the human_pos, infected_at and zombie_pos
+                     arrays of the rows.
+
+    Returns:
+        (tuple): The positions of the susceptible humans, and those of the
+                 zombies and infected humans.
+
+    """
+    infected = rows["infected_at"] >= 0
+
+    return (rows["human_pos"][~infected],
+            np.concatenate([rows["zombie_pos"], rows["human_pos"][infected]]))
+
+
+def first_claims(cells, ranks):
+    """Find the claims on cells that win.
+
+    Args:
+        cells (:obj:): Number of the cell of every claim.
+        ranks (:obj:): Rank of every claim, the lowest rank on a cell wins.
+
+    Returns:
+        (:obj:): Boolean array, true for the claims that win their cell.
+
+    """
+    order = np.lexsort((ranks, cells))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = cells[order[1:]] != cells[order[:-1]]
+
+    won = np.zeros(len(order), dtype=bool)
+    won[order[first]] = True
+
+    return won
+
+
+class ArrayEngine:
+    """Runs the humans and zombies of a model as arrays.
+
+    The engine takes over the agents MapGen spawned, and removes the agent
+    objects from the grid and schedule. The counters of the model and the
+    steps of its schedule are kept up to date.
+
+    The last rows of the arrays can be a halo of agents that belong to
+    another engine, see tiled_engine.py. They are seen by the agents of the
+    engine, but do not act themselves.
+
+    Attributes:
+        model (:obj:): The model the engine runs.
+        rng (:obj:): NumPy random generator, seeded by the model.
+        width (int): Grid width.
+        height (int): Grid height.
+        incubation_time (int): Steps before an infected human turns.
+        kill_chance (float): Base chance of a human to kill a zombie.
+        grouping (bool): If humans form herds.
+        terrain (:obj:): Occupancy raster of the grid without the agents.
+        rounds (int): Number of rounds a step is split into.
+        changes (dict): Change of every counter of the model since the
+                        counters were last updated.
+        human_ids (:obj:): Unique number of every human.
+        human_pos (:obj:): Array of shape (n, 2) with the human positions.
+        human_dir (:obj:): Array of shape (n, 2) with the directions the
+                           humans moved in last.
+        human_vision (:obj:): Vision radius of every human.
+        kills (:obj:): Number of zombies every human killed.
+        infected_at (:obj:): Step every human got infected, -1 if it is not
+                             infected.
+        human_round (:obj:): Round of this step every human acts in.
+        zombie_pos (:obj:): Array of shape (m, 2) with the zombie positions.
+        zombie_vision (:obj:): Vision radius of every zombie.
+        zombie_target (:obj:): Id of the human every zombie chases, -1 for
+                               none.
+        zombie_busy (:obj:): True for zombies that infected a human, which
+                             do not attack while an infected human is next
+                             to them.
+        zombie_round (:obj:): Round of this step every zombie acts in.
+        halo_humans (int): Number of rows of humans in the halo.
+        halo_zombies (int): Number of rows of zombies in the halo.
+
+    """
+
+    def __init__(self, model, rounds=ROUNDS):
+        """Take over the agents of a model.
+
+        Args:
+            model (:obj:): Model whose map and agents are made.
+            rounds (int): Number of rounds a step is split into.
+
+        Raises:
+            ValueError: If the map has a door or roads that block agents.
+
+        """
+        if model.door[0] != (-1, -1) or os.environ["mode"] == "5":
+            raise ValueError("The arrays engine does not support doors and "
+                             "roads")
+
+        self.model = model
+        self.rng = np.random.default_rng(model.random.getrandbits(64))
+        self.width = model.grid.width
+        self.height = model.grid.height
+        self.incubation_time = model.incubation_time
+        self.kill_chance = model.human_kill_zombie_chance
+        self.grouping = model.grouping
+        self.rounds = rounds
+        self.changes = dict.fromkeys(COUNTERS, 0)
+        self.halo_humans = 0
+        self.halo_zombies = 0
+
+        store = model.store
+        humans = store.slots(HUMANS)
+        zombies = store.slots(ZOMBIES)
+
+        self.human_ids = np.arange(len(humans))
+        self.human_pos = store.positions(humans).astype(np.int64)
+        self.human_dir = np.zeros((len(humans), 2), dtype=np.int64)
+        self.human_vision = store.vision[humans].astype(np.int64)
+        self.kills = np.zeros(len(humans), dtype=np.int64)
+        self.infected_at = np.full(len(humans), -1, dtype=np.int64)
+        self.human_round = np.zeros(len(humans), dtype=np.int64)
+
+        self.zombie_pos = store.positions(zombies).astype(np.int64)
+        self.zombie_vision = store.vision[zombies].astype(np.int64)
+        self.zombie_target = np.full(len(zombies), -1, dtype=np.int64)
+        self.zombie_busy = np.zeros(len(zombies), dtype=bool)
+        self.zombie_round = np.zeros(len(zombies), dtype=np.int64)
+
+        for agent in list(model.schedule.agents):
+            model.grid.remove_agent(agent)
+            model.schedule.remove(agent)
+
+        self.terrain = model.grid.occupancy & (WALL | ROAD)
+
+    def step(self):
+        """Let all humans and zombies take one step, round by round."""
+        steps = self.model.schedule.steps
+
+        self.turn(steps)
+        self.draw_rounds()
+
+        for turn in range(self.rounds):
+            self.fight(steps, turn)
+            self.move(turn)
+
+        for name in COUNTERS:
+            setattr(self.model, name,
+                    getattr(self.model, name) + self.changes[name])
+            self.changes[name] = 0
+
+        self.model.schedule.steps += 1
+        self.model.schedule.time += 1
+
+    def turn(self, steps):
+        """Turn the humans whose incubation time is over into zombies.
+
+        Args:
+            steps (int): The current step.
+
+        """
+        turning = (self.infected_at >= 0) & \
+            (steps - self.infected_at >= self.incubation_time)
+        count = int(turning.sum())
+
+        if not count:
+            return
+
+        self.extend({
+            "zombie_pos": self.human_pos[turning],
+            "zombie_vision": np.full(count, ZOMBIE_VISION),
+            "zombie_target": np.full(count, -1),
+            "zombie_busy": np.zeros(count, dtype=bool),
+            "zombie_round": np.zeros(count),
+        })
+        self.remove(turning, None)
+
+        self.changes["infected"] += count
+        self.changes["susceptible"] -= count
+        self.changes["carrier"] -= count
+
+    def draw_rounds(self):
+        """Give every human and zombie the round of this step it acts in."""
+        if self.rounds == 1:
+            return
+
+        self.human_round = self.rng.integers(self.rounds,
+                                             size=len(self.human_pos))
+        self.zombie_round = self.rng.integers(self.rounds,
+                                              size=len(self.zombie_pos))
+
+    def fight(self, steps, turn=0):
+        """Let every zombie of a round next to a susceptible human attack it.
+
+        Like InteractionHuman, the chance of the human to kill the zombie
+        grows with its kills and the humans around it. Otherwise the human
+        gets infected, and the zombie rests until no infected human is next
+        to it. Zombies in the halo do not attack.
+
+        Args:
+            steps (int): The current step.
+            turn (int): The round of the step.
+
+        """
+        if not len(self.zombie_pos) or not len(self.human_pos):
+            return
+
+        human_at = np.full((self.width + 2, self.height + 2), -1,
+                           dtype=np.int64)
+        human_at[self.human_pos[:, 0] + 1, self.human_pos[:, 1] + 1] = \
+            np.arange(len(self.human_pos))
+
+        cells = self.zombie_pos[:, np.newaxis, :] + NEIGHBOURHOOD + 1
+        around = human_at[cells[:, :, 0], cells[:, :, 1]]
+        susceptible = (around >= 0) & (self.infected_at[around] < 0)
+        carriers = (around >= 0) & (self.infected_at[around] >= 0)
+
+        acting = self.zombie_round == turn
+        attacking = acting & ~self.zombie_busy & susceptible.any(axis=1)
+        attacking[len(attacking) - self.halo_zombies:] = False
+        self.zombie_busy &= carriers.any(axis=1) | ~acting
+
+        attackers = np.flatnonzero(attacking)
+
+        if not len(attackers):
+            return
+
+        # The first susceptible human in the neighbourhood is attacked.
+        targets = around[attackers, susceptible[attackers].argmax(axis=1)]
+
+        count = np.zeros((self.width, self.height), dtype=np.int64)
+        np.add.at(count, (self.human_pos[:, 0], self.human_pos[:, 1]), 1)
+        nearby = window_sums(count, self.human_pos[targets, 0],
+                             self.human_pos[targets, 1], 1)
+
+        buff = np.minimum(self.kills[targets] * 0.05, 0.3) + \
+            np.minimum(nearby * 0.05, 0.2)
+        chance = np.minimum(0.8, self.kill_chance + buff)
+        killed = self.rng.random(len(attackers)) <= chance
+
+        np.add.at(self.kills, targets[killed], 1)
+
+        infected = np.unique(targets[~killed])
+        infected = infected[self.infected_at[infected] < 0]
+        self.infected_at[infected] = steps
+        self.zombie_busy[attackers[~killed]] = True
+
+        # Humans in the halo are counted by the engine they belong to.
+        own = len(self.human_pos) - self.halo_humans
+        self.changes["carrier"] += int((infected < own).sum())
+
+        dead = np.zeros(len(self.zombie_pos), dtype=bool)
+        dead[attackers[killed]] = True
+        self.remove(None, dead)
+
+        self.changes["recovered"] += int(killed.sum())
+        self.changes["infected"] -= int(killed.sum())
+
+    def move(self, turn=0):
+        """Move every human and zombie of a round at once.
+
+        When multiple agents choose the same cell, the one ranked first gets
+        it and the others stand still.
+
+        Args:
+            turn (int): The round of the step.
+
+        """
+        positions, moves = self.choose_moves(turn)
+        targets = positions + MOVE_OFFSETS[moves]
+        ranks = self.rng.random(len(positions))
+
+        movers = np.flatnonzero(moves)
+        won = first_claims(self.cell_numbers(targets[movers]), ranks[movers])
+        moves[movers[~won]] = 0
+
+        self.apply_moves(moves, turn)
+
+    def choose_moves(self, turn=0):
+        """Choose the move of every human and zombie of a round outside the
+        halo.
+
+        All moves of a round are chosen from the positions at the start of
+        the round, so agents only move into cells that were free.
+
+        Args:
+            turn (int): The round of the step.
+
+        Returns:
+            (:obj:): Positions of the humans followed by the zombies.
+            (:obj:): Index in MOVE_OFFSETS of the move of each of them, 0 for
+                     the agents of other rounds.
+
+        """
+        occupancy = self.terrain.copy()
+        occupancy[self.human_pos[:, 0] + 1, self.human_pos[:, 1] + 1] |= HUMAN
+        occupancy[self.zombie_pos[:, 0] + 1,
+                  self.zombie_pos[:, 1] + 1] |= ZOMBIE
+
+        humans = len(self.human_pos) - self.halo_humans
+        zombies = len(self.zombie_pos) - self.halo_zombies
+        human_rows = np.flatnonzero(self.human_round[:humans] == turn)
+        zombie_rows = np.flatnonzero(self.zombie_round[:zombies] == turn)
+
+        moves = np.zeros(humans + zombies, dtype=np.int64)
+        moves[human_rows] = self.human_moves(occupancy, human_rows)
+        moves[humans + zombie_rows] = self.zombie_moves(occupancy,
+                                                        zombie_rows)
+
+        positions = np.concatenate([self.human_pos[:humans],
+                                    self.zombie_pos[:zombies]])
+
+        return positions, moves
+
+    def apply_moves(self, moves, turn=0):
+        """Move the humans and zombies of a round outside the halo.
+
+        Args:
+            moves (:obj:): Index in MOVE_OFFSETS of the move of every human
+                           followed by every zombie, like choose_moves.
+            turn (int): The round of the step.
+
+        """
+        humans = len(self.human_pos) - self.halo_humans
+        zombies = len(self.zombie_pos) - self.halo_zombies
+        offsets = MOVE_OFFSETS[moves]
+        rows = np.flatnonzero(self.human_round[:humans] == turn)
+
+        self.human_pos[:humans] += offsets[:humans]
+        self.human_dir[rows] = offsets[rows]
+        self.zombie_pos[:zombies] += offsets[humans:humans + zombies]
+
+    def cell_numbers(self, cells):
+        """Get a unique number for every cell of an array of shape (n, 2)."""
+        return (cells[:, 0] + 1) * (self.height + 2) + cells[:, 1] + 1
+
+    def human_moves(self, occupancy, humans):
+        """Choose the move of some humans.
+
+        Humans that see a zombie flee like AvoidingZombie, humans that see
+        other humans herd like FormingHerd when grouping is on, and all other
+        humans wander.
+
+        Args:
+            occupancy (:obj:): Occupancy raster at the start of the round.
+            humans (:obj:): Rows of the humans.
+
+        Returns:
+            (:obj:): Index in MOVE_OFFSETS of the move of each of them.
+
+        """
+        positions = self.human_pos[humans]
+        visions = self.human_vision[humans]
+        blocked = np.full(len(positions), WALL | HUMAN | ZOMBIE,
+                          dtype=np.uint8)
+        free = free_moves(positions, blocked, occupancy)
+        moves = self.random_moves(free)
+
+        fleeing, vectors, ties = escape_plans(
+            positions, visions, blocked, self.zombie_pos, occupancy)
+        rows = np.flatnonzero(fleeing)
+        moves[rows] = nearest_moves(positions[rows],
+                                    positions[rows] + vectors[rows],
+                                    free[rows])
+
+        for row in rows.tolist():
+            if ties[row] is not None:
+                cell = ties[row][self.rng.integers(len(ties[row]))]
+                moves[row] = MOVE_INDEX[(cell[0] - positions[row, 0],
+                                         cell[1] - positions[row, 1])]
+
+        if not self.grouping or not len(positions):
+            return moves
+
+        count = np.zeros((self.width, self.height), dtype=np.int64)
+        np.add.at(count, (self.human_pos[:, 0], self.human_pos[:, 1]), 1)
+        others = window_sums(count, positions[:, 0], positions[:, 1],
+                             visions) - \
+            count[positions[:, 0], positions[:, 1]]
+
+        rows = np.flatnonzero(~fleeing & (others > 0))
+        directions = herd_directions(self.human_pos, self.human_dir,
+                                     self.human_vision, self.width,
+                                     self.height, humans[rows])
+        targets = positions[rows] + directions
+        moves[rows] = nearest_moves(positions[rows], targets, free[rows])
+
+        # Herding humans that would stand still try a random nearby target.
+        stuck = np.flatnonzero(moves[rows] == 0)
+        jitter = self.rng.integers(-1, 2, size=(len(stuck), 2))
+        moves[rows[stuck]] = nearest_moves(positions[rows[stuck]],
+                                           targets[stuck] + jitter,
+                                           free[rows[stuck]])
+
+        return moves
+
+    def zombie_moves(self, occupancy, zombies):
+        """Choose the move of some zombies.
+
+        Zombies chase the nearest susceptible human they see like
+        ChasingHuman, and keep their target while it is one of the nearest.
+        Zombies that see no susceptible human, or are next to an infected
+        human, wander.
+
+        Args:
+            occupancy (:obj:): Occupancy raster at the start of the round.
+            zombies (:obj:): Rows of the zombies.
+
+        Returns:
+            (:obj:): Index in MOVE_OFFSETS of the move of each of them.
+
+        """
+        positions = self.zombie_pos[zombies]
+        blocked = np.full(len(positions), WALL | ROAD | HUMAN | ZOMBIE,
+                          dtype=np.uint8)
+        free = free_moves(positions, blocked, occupancy)
+        moves = self.random_moves(free)
+
+        susceptible = np.flatnonzero(self.infected_at < 0)
+        offsets, indices = nearest_targets(positions,
+                                           self.zombie_vision[zombies],
+                                           self.human_pos[susceptible])
+        counts = np.diff(offsets)
+        candidates = susceptible[indices]
+        candidate_ids = self.human_ids[candidates]
+        chased = self.zombie_target[zombies]
+
+        hunters = np.repeat(np.arange(len(positions)), counts)
+        keep = np.zeros(len(positions), dtype=bool)
+        np.logical_or.at(keep, hunters, candidate_ids == chased[hunters])
+
+        # Zombies next to an infected human do not chase, like the
+        # transition into ChasingHuman.
+        carriers = np.zeros((self.width, self.height), dtype=np.int64)
+        infected = self.human_pos[self.infected_at >= 0]
+        np.add.at(carriers, (infected[:, 0], infected[:, 1]), 1)
+        guarding = window_sums(carriers, positions[:, 0], positions[:, 1],
+                               1) > 0
+
+        chasing = (counts > 0) & ~guarding
+        rows = np.flatnonzero(chasing & ~keep)
+        picks = offsets[rows] + \
+            (self.rng.random(len(rows)) * counts[rows]).astype(np.int64)
+        chased[rows] = candidate_ids[picks]
+        self.zombie_target[zombies] = chased
+
+        # Find the row of the target of every chasing zombie.
+        match = candidate_ids == chased[hunters]
+        targets = np.zeros(len(positions), dtype=np.int64)
+        targets[hunters[match]] = candidates[match]
+
+        rows = np.flatnonzero(chasing)
+        moves[rows] = nearest_moves(positions[rows],
+                                    self.human_pos[targets[rows]], free[rows])
+
+        return moves
+
+    def random_moves(self, free):
+        """Choose a random free cell for every agent.
+
+        Args:
+            free (:obj:): Result of free_moves for the agents.
+
+        Returns:
+            (:obj:): Index in MOVE_OFFSETS of the move of every agent.
+
+        """
+        draws = self.rng.random(free.shape)
+        draws[~free] = -1
+
+        return draws.argmax(axis=1)
+
+    def outbreak_positions(self):
+        """Get the positions of the two sides of the outbreak, see
+        split_outbreak."""
+        return split_outbreak({"human_pos": self.human_pos,
+                               "infected_at": self.infected_at,
+                               "zombie_pos": self.zombie_pos})
+
+    def take(self, humans, zombies):
+        """Get the rows of some humans and zombies.
+
+        Args:
+            humans (:obj:): Boolean mask of the humans, None for none.
+            zombies (:obj:): Boolean mask of the zombies, None for none.
+
+        Returns:
+            (dict): For every field the array of the rows.
+
+        """
+        rows = {}
+
+        for fields, mask in ((HUMAN_FIELDS, humans), (ZOMBIE_FIELDS, zombies)):
+            for name in fields:
+                column = getattr(self, name)
+                rows[name] = column[mask] if mask is not None else \
+                    column[:0]
+
+        return rows
+
+    def extend(self, rows):
+        """Add rows of humans and zombies after the rows outside the halo.
+
+        Args:
+            rows (dict): For some fields the array of the new rows, which
+                         must be given for all fields of humans or zombies.
+
+        """
+        for fields, halo in ((HUMAN_FIELDS, self.halo_humans),
+                             (ZOMBIE_FIELDS, self.halo_zombies)):
+            for name in fields:
+                if name not in rows:
+                    continue
+
+                column = getattr(self, name)
+                end = len(column) - halo
+                setattr(self, name, np.concatenate(
+                    [column[:end], rows[name].astype(column.dtype),
+                     column[end:]]))
+
+    def remove(self, humans, zombies):
+        """Remove the rows of some humans and zombies.
+
+        Args:
+            humans (:obj:): Boolean mask of the humans, None for none.
+            zombies (:obj:): Boolean mask of the zombies, None for none.
+
+        """
+        for fields, mask in ((HUMAN_FIELDS, humans), (ZOMBIE_FIELDS, zombies)):
+            if mask is None:
+                continue
+
+            for name in fields:
+                setattr(self, name, getattr(self, name)[~mask])
@@ -1,11 +1,22 @@
 from automaton.states import *
+from automaton.state import state_flag
 import os
 
+ON_ROAD = state_flag("OnRoad")
+
 
 class Automaton():
     """Our automaton class. This is used to program finite state machines
     (FSM).
 
+    Attributes:
+        states (dict): For every state name the state object and the names of
+                       the states it can transition to.
+        order (list): The state objects, the index of a state in this list is
+                      its index in the transition table.
+        table (list): For every state index the tuple of state objects it can
+                      transition to, in the order they are tried.
+
     """
 
     def __init__(self, model):
@@ -55,6 +66,8 @@ class Automaton():
             self.event(OnRoad(), AvoidingZombie())
             self.event(OnRoad(), ZombieWandering())
 
+        self.compile()
+
     def add_state(self, state):
         """Adds a state to the Automaton.
 
@@ -63,6 +76,7 @@ class Automaton():
 
         """
         if state.name not in self.states:
+            state.flag = state_flag(state.name)
             self.states[state.name] = {
                 "object": state,
                 "transitions": []
@@ -79,6 +93,24 @@ class Automaton():
         self.add_state(b)
         self.states[a.name]['transitions'].append(b.name)
 
+    def compile(self):
+        """Compile the events into the transition table update uses.
+
+        Gives every state its index in the table, and resolves the names of
+        the states it can transition to into the state objects. Events added
+        after the automaton is made are only used after compiling again.
+
+        """
+        self.order = [entry["object"] for entry in self.states.values()]
+        self.table = []
+        self._new_states = []
+
+        for index, state in enumerate(self.order):
+            state.index = index
+            self.table.append(tuple(
+                self.states[name]["object"]
+                for name in self.states[state.name]["transitions"]))
+
     def set_initial_states(self, state_names, agent):
         """Set the states an agent has to be initialized with.
 
@@ -87,10 +119,38 @@ class Automaton():
             agent (:obj:): Agent whomst'd've initial states have to be set.
         """
         agent.states = []
+        agent.state_flags = 0
 
         for state_name in state_names:
             state = self.states[state_name]['object']
-            agent.states.append(state)
+            self.add_to_state(agent, state)
+
+    def add_to_state(self, agent, state):
+        """Add a state to the active states of an agent.
+
+        Args:
+            agent (:obj:): Agent that enters the state.
+            state (:obj:): State object to add.
+        """
+        agent.states.append(state)
+        agent.state_flags |= state.flag
+
+    def remove_from_state(self, agent, state):
+        """Remove a state from the active states of an agent.
+
+        The flag of the state is kept if the agent is in the state twice.
+
+        Args:
+            agent (:obj:): Agent that leaves the state.
+            state (:obj:): State object to remove.
+        """
+        agent.states.remove(state)
+
+        for other in agent.states:
+            if other is state:
+                return
+
+        agent.state_flags &= ~state.flag
 
     def switch_to_state(self, agent, old, new):
         """Force a state-switch before the Automaton's update function
@@ -108,57 +168,54 @@ class Automaton():
             old_state_obj = self.states[old]["object"]
             new_state_obj = self.states[new]["object"]
 
-            agent.states.remove(old_state_obj)
+            self.remove_from_state(agent, old_state_obj)
             old_state_obj.on_leave(agent)
 
-            agent.states.append(new_state_obj)
+            self.add_to_state(agent, new_state_obj)
             new_state_obj.on_enter(agent)
 
     def update(self, agent):
         """Allow agent to possibly transition from current state to a
         registered and verified new state.
 
+        Uses the transition table made by compile, the states an agent can
+        transition to are tried in the order their events were added.
+
         Args:
             agent (:obj:): Agent whomst'd've states can be updated.
 
         """
-        for state in agent.states.copy():
+        table = self.table
+        new_states = self._new_states
+
+        for state in tuple(agent.states):
             if not agent.pos:
                 continue
 
             if state.halt(agent):
                 continue
 
-            # Use string representation for easy state lookup.
-            state_name = state.name
-            transitions = self.states[state_name]['transitions']
+            new_states.clear()
+            new_flags = 0
 
-            new_states = []
-
-            for transition in transitions:
+            for state_object in table[state.index]:
                 if not agent.pos:
-                    continue
-
-                state_object = self.states[transition]['object']
+                    break
 
                 # Ask a state whether the given agent is allowed
                 # to transition into it from the current state.
                 if state_object.transition(agent):
                     new_states.append(state_object)
+                    new_flags |= state_object.flag
 
-            if new_states:
+            if new_flags:
                 state.on_leave(agent)
-                agent.states.remove(state)
+                self.remove_from_state(agent, state)
 
             # We add the list of new states to our
             # active states list.
             # If transition to road don't transition to other states.
-            if OnRoad() in new_states:
-                for new_state in new_states:
-                    if new_state == "OnRoad":
-                        agent.states.append(new_state)
-                        new_state.on_enter(agent)
-            else:
-                for new_state in new_states:
-                    agent.states.append(new_state)
+            for new_state in new_states:
+                if not new_flags & ON_ROAD or new_state.flag == ON_ROAD:
+                    self.add_to_state(agent, new_state)
                     new_state.on_enter(agent)
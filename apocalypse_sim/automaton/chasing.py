@@ -0,0 +1,159 @@
+"""chasing.py.
+
+Batched version of the search of a zombie for the nearest susceptible humans.
+Finds the nearest humans within vision of every zombie at once with one pass
+over a bucket grid of the humans, instead of a neighbourhood query and a loop
+over the humans for each zombie.
+"""
+from grid_map.spatial_index import SUSCEPTIBLE, ZOMBIES
+
+import numpy as np
+
+
+def nearest_targets(hunters, visions, targets):
+    """Find the nearest targets within vision of every hunter.
+
+    Targets are within vision if they are within the Chebyshev distance of
+    the vision of a hunter, and the nearest ones have the smallest euclidian
+    distance to it.
+
+    Args:
+        hunters (:obj:): Integer array of shape (n, 2) with the positions of
+                         the hunters.
+        visions (:obj:): Integer array of shape (n,) with the vision radius of
+                         each hunter.
+        targets (:obj:): Integer array of shape (m, 2) with the positions of
+                         the targets.
+
+    Returns:
+        (:obj:): Array of shape (n + 1,) with offsets into the second array,
+                 the nearest targets of hunter i are found from offsets[i] up
+                 to offsets[i + 1].
+        (:obj:): Indices of the nearest targets of all hunters, for every
+                 hunter ordered like a neighbourhood query, by row then column.
+
+    """
+    n = len(hunters)
+
+    if not n or not len(targets):
+        return np.zeros(n + 1, dtype=int), np.zeros(0, dtype=int)
+
+    # Sort the targets into buckets at least as wide as the widest vision, so
+    # every hunter only has to look in the bucket it is in and the ones around.
+    size = int(visions.max()) + 1
+    columns = int(max(hunters[:, 0].max(), targets[:, 0].max())) // size + 1
+    rows = int(max(hunters[:, 1].max(), targets[:, 1].max())) // size + 1
+
+    target_buckets = (targets[:, 0] // size) * rows + targets[:, 1] // size
+    order = np.argsort(target_buckets, kind="stable")
+    starts = np.searchsorted(target_buckets[order],
+                             np.arange(columns * rows + 1))
+
+    # The 3 by 3 buckets around each hunter, buckets outside the grid are
+    # empty ranges.
+    around = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)])
+    bucket_x = hunters[:, 0, np.newaxis] // size + around[:, 0]
+    bucket_y = hunters[:, 1, np.newaxis] // size + around[:, 1]
+    inside = ((bucket_x >= 0) & (bucket_x < columns) &
+              (bucket_y >= 0) & (bucket_y < rows))
+    buckets = np.where(inside, bucket_x * rows + bucket_y, 0)
+    first = np.where(inside, starts[buckets], 0).ravel()
+    counts = np.where(inside, starts[buckets + 1] - starts[buckets],
+                      0).ravel()
+
+    # One pair for every hunter and candidate target.
+    total = counts.sum()
+    pair_hunters = np.repeat(np.repeat(np.arange(n), len(around)), counts)
+    within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    pair_targets = order[np.repeat(first, counts) + within]
+
+    d_x = targets[pair_targets, 0] - hunters[pair_hunters, 0]
+    d_y = targets[pair_targets, 1] - hunters[pair_hunters, 1]
+    vision = visions[pair_hunters]
+    visible = (np.abs(d_x) <= vision) & (np.abs(d_y) <= vision)
+
+    pair_hunters = pair_hunters[visible]
+    pair_targets = pair_targets[visible]
+    distance = (d_x ** 2 + d_y ** 2)[visible]
+
+    # Keep the pairs at the smallest distance of their hunter.
+    smallest = np.full(n, np.iinfo(distance.dtype).max, dtype=distance.dtype)
+    np.minimum.at(smallest, pair_hunters, distance)
+    nearest = distance == smallest[pair_hunters]
+
+    pair_hunters = pair_hunters[nearest]
+    pair_targets = pair_targets[nearest]
+    pair_order = np.lexsort((targets[pair_targets, 0],
+                             targets[pair_targets, 1], pair_hunters))
+
+    offsets = np.zeros(n + 1, dtype=int)
+    offsets[1:] = np.cumsum(np.bincount(pair_hunters, minlength=n))
+
+    return offsets, pair_targets[pair_order]
+
+
+class NearestHumans:
+    """The nearest susceptible humans of every zombie, computed once a step.
+
+    Attributes:
+        batch (dict): For every zombie the position it had when the batch was
+                      made and the list of its nearest susceptible humans.
+        batch_step (int): The step in which the batch was computed.
+
+    """
+
+    def __init__(self):
+        """Initialize an empty batch."""
+        self.batch = {}
+        self.batch_step = None
+
+    def get(self, zombie):
+        """Get the nearest susceptible humans of a zombie.
+
+        The first call in a step finds the nearest humans of all zombies with
+        nearest_targets, from the positions at that moment. Humans that were
+        infected or removed since are left out.
+
+        Args:
+            zombie (:obj:): The zombie to get the nearest humans of.
+
+        Returns:
+            (list): The nearest humans within vision of the zombie, in the
+                    order of a neighbourhood query.
+            None: If the zombie moved since the batch was made, or all of
+                  its nearest humans are gone.
+
+        """
+        model = zombie.model
+        grid = model.grid
+
+        if self.batch_step != model.schedule.steps:
+            store = model.store
+            zombie_slots = store.slots(ZOMBIES)
+            human_slots = store.slots(SUSCEPTIBLE)
+            zombies = [store.agents[slot] for slot in zombie_slots.tolist()]
+            humans = [store.agents[slot] for slot in human_slots.tolist()]
+            offsets, nearest = nearest_targets(
+                store.positions(zombie_slots), store.vision[zombie_slots],
+                store.positions(human_slots))
+
+            offsets = offsets.tolist()
+            nearest = nearest.tolist()
+            self.batch = {
+                agent: (agent.pos, [humans[j] for j in
+                                    nearest[offsets[i]:offsets[i + 1]]])
+                for i, agent in enumerate(zombies)}
+            self.batch_step = model.schedule.steps
+
+        plan = self.batch.get(zombie)
+
+        if plan is None or plan[0] != zombie.pos:
+            return None
+
+        if not plan[1]:
+            return plan[1]
+
+        humans = [human for human in plan[1]
+                  if grid.kind(human) == SUSCEPTIBLE]
+
+        return humans or None
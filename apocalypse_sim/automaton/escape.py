@@ -0,0 +1,168 @@
+"""escape.py.
+
+Batched version of the escape rules of the AvoidingZombie state. Computes the
+running direction of many humans away from the zombies they can see at once,
+and for the humans that are stuck, the cells the bruteforce method of a
+HumanAgent would choose between, instead of looping over the zombies and
+cells of each human.
+
+The sums over the zombies are taken in the order the neighbourhood of a human
+lists them, so the results match the ones of HumanAgent exactly.
+"""
+from grid_map.grid import MOORE_OFFSETS
+from .herding import window_sums
+
+import numpy as np
+
+# Offsets of the cells a human can move to, in the order get_moves lists them.
+MOVE_OFFSETS = np.array([(0, 0)] + MOORE_OFFSETS, dtype=int)
+
+# Number of human and zombie pairs handled at once, to bound the memory.
+CHUNK_PAIRS = 1 << 20
+
+
+def free_moves(positions, blocked, occupancy):
+    """Find the cells around each human that are not blocked.
+
+    Args:
+        positions (:obj:): Integer array of shape (n, 2) with the positions.
+        blocked (:obj:): Array of shape (n,) with the occupancy bits each
+                         human may not enter.
+        occupancy (:obj:): Occupancy raster of the grid, with its border.
+
+    Returns:
+        (:obj:): Boolean array of shape (n, 9), true for the cells of
+                 MOVE_OFFSETS the human can move to. Standing still is
+                 always possible.
+
+    """
+    xs = positions[:, 0, np.newaxis] + MOVE_OFFSETS[:, 0] + 1
+    ys = positions[:, 1, np.newaxis] + MOVE_OFFSETS[:, 1] + 1
+    free = (occupancy[xs, ys] & blocked[:, np.newaxis]) == 0
+    free[:, 0] = True
+
+    return free
+
+
+def nearest_moves(positions, targets, free):
+    """Get the free cell nearest to a target for each human.
+
+    Like Agent.best_cell, the first of the nearest cells is taken, and a
+    target on the position of the human itself means standing still.
+
+    Args:
+        positions (:obj:): Integer array of shape (n, 2) with the positions.
+        targets (:obj:): Array of shape (n, 2) with the targets.
+        free (:obj:): Result of free_moves for the humans.
+
+    Returns:
+        (:obj:): Array of shape (n,) with the index in MOVE_OFFSETS of the
+                 chosen cell.
+
+    """
+    cells = positions[:, np.newaxis, :] + MOVE_OFFSETS
+    d_x = np.abs(targets[:, 0, np.newaxis] - cells[:, :, 0])
+    d_y = np.abs(targets[:, 1, np.newaxis] - cells[:, :, 1])
+    dist = np.sqrt(d_x ** 2 + d_y ** 2)
+    dist[~free] = np.inf
+
+    moves = dist.argmin(axis=1)
+    moves[(targets == positions).all(axis=1)] = 0
+
+    return moves
+
+
+def escape_plans(positions, visions, blocked, zombies, occupancy):
+    """Compute how every human escapes from the zombies it can see.
+
+    Args:
+        positions (:obj:): Integer array of shape (n, 2) with the positions of
+                           the humans.
+        visions (:obj:): Integer array of shape (n,) with the vision radius of
+                         each human.
+        blocked (:obj:): Array of shape (n,) with the occupancy bits each
+                         human may not enter.
+        zombies (:obj:): Integer array of shape (m, 2) with the positions of
+                         the zombies.
+        occupancy (:obj:): Occupancy raster of the grid, with its border.
+
+    Returns:
+        (:obj:): Boolean array of shape (n,), true for the humans that see a
+                 zombie. Only these humans have a plan.
+        (:obj:): Array of shape (n, 2) with the normalized running direction
+                 of each human.
+        (list): For each human the cells with the highest bruteforce
+                priority if the running direction leaves it standing still,
+                None otherwise.
+
+    """
+    n = len(positions)
+    vectors = np.zeros((n, 2))
+    ties = [None] * n
+
+    if not n or not len(zombies):
+        return np.zeros(n, dtype=bool), vectors, ties
+
+    # Order the zombies like a neighbourhood query does, by row then column.
+    zombies = zombies[np.lexsort((zombies[:, 0], zombies[:, 1]))]
+
+    # Only pair up the humans that see at least one zombie.
+    width, height = occupancy.shape[0] - 2, occupancy.shape[1] - 2
+    count = np.zeros((width, height), dtype=np.int64)
+    np.add.at(count, (zombies[:, 0], zombies[:, 1]), 1)
+    seeing = window_sums(count, positions[:, 0], positions[:, 1],
+                         visions) > 0
+
+    chunk = max(1, CHUNK_PAIRS // len(zombies))
+    seeing_rows = np.flatnonzero(seeing)
+
+    for start in range(0, len(seeing_rows), chunk):
+        rows = seeing_rows[start:start + chunk]
+        vectors[rows], stuck_ties = _escape_chunk(
+            positions[rows], visions[rows], blocked[rows], zombies, occupancy)
+
+        for row, cells in zip(rows, stuck_ties):
+            ties[row] = cells
+
+    return seeing, vectors, ties
+
+
+def _escape_chunk(positions, visions, blocked, zombies, occupancy):
+    """Compute the escape plans of a chunk of humans that see a zombie."""
+    d_x = positions[:, 0, np.newaxis] - zombies[:, 0].astype(float)
+    d_y = positions[:, 1, np.newaxis] - zombies[:, 1].astype(float)
+    visible = ((np.abs(d_x) <= visions[:, np.newaxis]) &
+               (np.abs(d_y) <= visions[:, np.newaxis]))
+
+    # Running direction, the cumulative sums add the zombies one by one.
+    weight = visions[:, np.newaxis] + 1 - np.sqrt(d_x ** 2 + d_y ** 2)
+    direction_x = np.where(visible, weight * d_x, 0.0).cumsum(axis=1)[:, -1]
+    direction_y = np.where(visible, weight * d_y, 0.0).cumsum(axis=1)[:, -1]
+
+    length = np.sqrt(direction_x ** 2 + direction_y ** 2)
+    length[length == 0] = 1
+    vectors = np.stack([direction_x / length, direction_y / length], axis=1)
+
+    free = free_moves(positions, blocked, occupancy)
+    moves = nearest_moves(positions, positions + vectors, free)
+    stuck = np.flatnonzero(moves == 0)
+    ties = [None] * len(positions)
+
+    if not len(stuck):
+        return vectors, ties
+
+    # Bruteforce priorities of the cells around the stuck humans.
+    cells = positions[stuck, np.newaxis, :] + MOVE_OFFSETS
+    dist_x = cells[:, :, 0, np.newaxis] - zombies[:, 0]
+    dist_y = cells[:, :, 1, np.newaxis] - zombies[:, 1]
+    distance = np.sqrt(np.sqrt((dist_x ** 2 + dist_y ** 2).astype(float)))
+    priority = np.where(visible[stuck, np.newaxis, :], distance, 0.0)
+    priority = priority.cumsum(axis=2)[:, :, -1]
+    priority[~free[stuck]] = -np.inf
+
+    best = priority == priority.max(axis=1)[:, np.newaxis]
+
+    for i, row in enumerate(stuck):
+        ties[row] = [tuple(cell) for cell in cells[i][best[i]].tolist()]
+
+    return vectors, ties
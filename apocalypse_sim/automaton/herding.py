@@ -0,0 +1,118 @@
+"""herding.py.
+
+Batched version of the flocking rules of the FormingHerd state. Computes the
+alignment, cohesion and separation of many humans at once from arrays of
+positions and directions, instead of looping over the neighbours of each
+human.
+"""
+import numpy as np
+
+
+def normalize(vectors):
+    """Normalize an array of 2D vectors, vectors of length 0 are kept.
+
+    Args:
+        vectors (:obj:): Array of shape (n, 2).
+
+    Returns:
+        (:obj:): Array of shape (n, 2) with the normalized vectors.
+
+    """
+    length = np.sqrt(vectors[:, 0] ** 2 + vectors[:, 1] ** 2)
+    length[length == 0] = 1
+
+    return vectors / length[:, np.newaxis]
+
+
+def window_sums(raster, xs, ys, radius):
+    """Sum a raster over square windows, using a summed-area table.
+
+    Args:
+        raster (:obj:): Array of shape (width, height).
+        xs (:obj:): X coordinates of the centers of the windows.
+        ys (:obj:): Y coordinates of the centers of the windows.
+        radius (:obj:): Radius of each window, windows are clipped to the
+                        raster.
+
+    Returns:
+        (:obj:): The sum of the raster within each window.
+
+    """
+    width, height = raster.shape
+    table = np.zeros((width + 1, height + 1), dtype=raster.dtype)
+    table[1:, 1:] = raster.cumsum(axis=0).cumsum(axis=1)
+
+    min_x = np.clip(xs - radius, 0, width)
+    min_y = np.clip(ys - radius, 0, height)
+    max_x = np.clip(xs + radius + 1, 0, width)
+    max_y = np.clip(ys + radius + 1, 0, height)
+
+    return (table[max_x, max_y] - table[min_x, max_y] -
+            table[max_x, min_y] + table[min_x, min_y])
+
+
+def herd_directions(positions, directions, visions, width, height,
+                    rows=None):
+    """Get the flocking direction of every human in one pass.
+
+    For every human the neighbours are all humans within its vision, except
+    the ones on its own cell, like FormingHerd.direction does. The directions
+    are the normalized sum of the alignment, cohesion and separation vectors.
+
+    Args:
+        positions (:obj:): Integer array of shape (n, 2) with the positions.
+        directions (:obj:): Integer array of shape (n, 2) with the directions
+                            the humans moved in last.
+        visions (:obj:): Integer array of shape (n,) with the vision radius of
+                         each human.
+        width (int): Grid width.
+        height (int): Grid height.
+        rows (:obj:): Rows of the humans to get the direction of, None for
+                      all of them.
+
+    Returns:
+        (:obj:): Array of shape (n, 2) with the direction of each human, or
+                 of each of the rows, (0, 0) for humans without any
+                 neighbours.
+
+    """
+    xs = positions[:, 0]
+    ys = positions[:, 1]
+
+    count = np.zeros((width, height), dtype=np.int64)
+    dir_x = np.zeros((width, height), dtype=np.int64)
+    dir_y = np.zeros((width, height), dtype=np.int64)
+    pos_x = np.zeros((width, height), dtype=np.int64)
+    pos_y = np.zeros((width, height), dtype=np.int64)
+
+    np.add.at(count, (xs, ys), 1)
+    np.add.at(dir_x, (xs, ys), directions[:, 0])
+    np.add.at(dir_y, (xs, ys), directions[:, 1])
+    np.add.at(pos_x, (xs, ys), xs)
+    np.add.at(pos_y, (xs, ys), ys)
+
+    if rows is not None:
+        xs = xs[rows]
+        ys = ys[rows]
+        visions = visions[rows]
+
+    # Sums over the neighbours, without the humans on the own cell.
+    sums = []
+
+    for raster in (count, dir_x, dir_y, pos_x, pos_y):
+        sums.append(window_sums(raster, xs, ys, visions) - raster[xs, ys])
+
+    n, sum_dir_x, sum_dir_y, sum_pos_x, sum_pos_y = sums
+    has_neighbours = n > 0
+    n = np.where(has_neighbours, n, 1).astype(float)
+
+    alignment = normalize(np.stack([sum_dir_x / n, sum_dir_y / n], axis=1))
+    cohesion = normalize(np.stack([sum_pos_x / n - xs,
+                                   sum_pos_y / n - ys], axis=1))
+    separation = normalize(np.stack([(sum_pos_x - n * xs) / -n,
+                                     (sum_pos_y - n * ys) / -n], axis=1))
+
+    result = normalize(alignment + cohesion + separation)
+    result[~has_neighbours] = 0
+
+    return result
@@ -1,8 +1,43 @@
 """State class for a FSM. Each state should inherit from this class."""
 
+# Bit of each state name in the state_flags of an agent.
+FLAGS = {}
+
+
+def state_flag(name):
+    """Get the bit of a state in the state_flags of an agent.
+
+    States get the next free bit the first time their name is asked for.
+
+    Args:
+        name (string): Name of the state.
+
+    Returns:
+        (int): The bit of the state.
+
+    """
+    if name not in FLAGS:
+        FLAGS[name] = 1 << len(FLAGS)
+
+    return FLAGS[name]
+
 
 class State():
-    """Our own state class, used by the Finite State Machine."""
+    """Our own state class, used by the Finite State Machine.
+
+    Attributes:
+        name (string): A string containing the name of the state.
+        flag (int): The bit of the state in the state_flags of an agent, set
+                    when the state is added to an automaton.
+        index (int): The index of the state in the transition table of its
+                     automaton, set when the automaton is compiled.
+
+    States keep their fields in slots, subclasses have to declare the fields
+    they add in __slots__.
+
+    """
+
+    __slots__ = ("name", "flag", "index")
 
     def __init__(self):
         """Initialize a state."""
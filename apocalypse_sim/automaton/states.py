@@ -1,11 +1,20 @@
 """State class for the states in a finite state machine."""
-from .state import State
+from .state import State, state_flag
+from .herding import herd_directions
+from .escape import escape_plans
 from agents.human_agent import HumanAgent
 from agents.zombie_agent import ZombieAgent
 from grid_map.map_object import Road
+from grid_map.spatial_index import SUSCEPTIBLE, INFECTED, ZOMBIES, HUMANS
+from grid_map.grid import WALL, ROAD, HUMAN, ZOMBIE
+import numpy as np
+import os
 import sys
 sys.path.append("..")
 
+ON_ROAD = state_flag("OnRoad")
+AVOIDING_ZOMBIE = state_flag("AvoidingZombie")
+
 
 class Reproduce(State):
     """Reproduction state.
@@ -17,6 +26,8 @@ class Reproduce(State):
 
     """
 
+    __slots__ = ()
+
     def __init__(self):
         """Initialize the reproduce state."""
         self.name = "Reproduce"
@@ -100,12 +111,19 @@ class FormingHerd(State):
 
     Attributes:
         name (string): A string containing the name of the state.
+        batch (dict): Directions of all humans computed at once in batched
+                      herding mode, by human.
+        batch_step (int): The step in which the batch was computed.
 
     """
 
+    __slots__ = ("batch", "batch_step")
+
     def __init__(self):
         """Initialize the FormingHerd state."""
         self.name = "FormingHerd"
+        self.batch = {}
+        self.batch_step = None
 
     def transition(self, agent):
         """Check if an agent can transition into this state.
@@ -121,17 +139,12 @@ class FormingHerd(State):
                     false otherwise.
 
         """
-        human_count = 0
-
-        for neighbour in agent.neighbors(include_center=False,
-                                         radius=agent.traits["vision"]):
-            if neighbour.agent_type == "zombie":
-                return False
-
-            if neighbour.agent_type == "human":
-                human_count += 1
+        if agent.neighbors(include_center=False, radius=agent.traits["vision"],
+                           kinds=ZOMBIES):
+            return False
 
-        if human_count > 0:
+        if agent.neighbors(include_center=False, radius=agent.traits["vision"],
+                           kinds=HUMANS):
             return True
 
         return False
@@ -234,11 +247,51 @@ class FormingHerd(State):
 
         return self._normalize(v)
 
+    def batched_direction(self, agent):
+        """Get the direction of an agent out of the batch of this step.
+
+        The first call in a step computes the direction of every human on the
+        grid in one pass with herd_directions, from the positions and
+        directions of the humans at that moment.
+
+        Args:
+            agent (:obj:): Agent we want to know the direction for.
+
+        Returns:
+            (list): List containing a normalized vector with the direction for
+                    of an agent.
+            None: If the agent was not on the grid when the batch was made.
+
+        """
+        model = agent.model
+
+        if self.batch_step != model.schedule.steps:
+            store = model.store
+            slots = store.slots(HUMANS)
+            humans = [store.agents[slot] for slot in slots.tolist()]
+            directions = herd_directions(
+                store.positions(slots),
+                np.stack([store.direction_x[slots],
+                          store.direction_y[slots]], axis=1),
+                store.vision[slots],
+                model.grid.width, model.grid.height)
+
+            self.batch = dict(zip(humans, directions.tolist()))
+            self.batch_step = model.schedule.steps
+
+        direction = self.batch.get(agent)
+
+        if direction is None:
+            return None
+
+        return list(direction)
+
     def direction(self, agent):
         """Get the direction vector an agent.
 
         Decides the direction for a human agent based on other agents in the
-        area. This is used to simulate flocking behaviour.
+        area. This is used to simulate flocking behaviour. In batched herding
+        mode the direction comes from the batch of the current step.
 
         Args:
             agent (:obj:): Agent we want to know the direction for.
@@ -248,9 +301,14 @@ class FormingHerd(State):
                     of an agent.
 
         """
-        neighbors = agent.neighbors(radius=agent.traits["vision"],
-                                    include_center=False)
-        humans = [human for human in neighbors if human.agent_type == "human"]
+        if agent.model.herding == "batched":
+            direction = self.batched_direction(agent)
+
+            if direction is not None:
+                return direction
+
+        humans = agent.neighbors(radius=agent.traits["vision"],
+                                 include_center=False, kinds=HUMANS)
 
         # No humans nearby, do not move.
         if not humans:
@@ -305,6 +363,8 @@ class Wandering(State):
 
     """
 
+    __slots__ = ()
+
     def __init__(self):
         """Initialize the Wandering state."""
         self.name = "Wandering"
@@ -350,6 +410,8 @@ class FindDoor(State):
 
     """
 
+    __slots__ = ()
+
     def __init__(self):
         """Initialize the FindDoor state."""
         self.name = "FindDoor"
@@ -415,6 +477,8 @@ class Escaped(State):
 
     """
 
+    __slots__ = ()
+
     def __init__(self):
         """Initialize the Escaped state."""
         self.name = "Escaped"
@@ -441,6 +505,8 @@ class HumanWandering(Wandering):
 
     """
 
+    __slots__ = ()
+
     def __init__(self):
         """Initialize the HumanWandering state."""
         self.name = "HumanWandering"
@@ -456,16 +522,15 @@ class HumanWandering(Wandering):
                     false otherwise.
 
         """
-        neighbors = agent.neighbors(include_center=False,
-                                    radius=agent.traits["vision"])
-
         # No humans (in grouping mode) or zombies nearby
-        for neighbour in neighbors:
-            if neighbour.agent_type == "zombie":
-                return False
+        if agent.neighbors(include_center=False, radius=agent.traits["vision"],
+                           kinds=ZOMBIES):
+            return False
 
-            if neighbour.agent_type == "human" and agent.model.grouping:
-                return False
+        if agent.model.grouping and \
+                agent.neighbors(include_center=False,
+                                radius=agent.traits["vision"], kinds=HUMANS):
+            return False
 
         return True
 
@@ -480,6 +545,8 @@ class ZombieWandering(Wandering):
 
     """
 
+    __slots__ = ()
+
     def __init__(self):
         """Initialize the ZombieWandering state."""
         self.name = "ZombieWandering"
@@ -495,9 +562,7 @@ class ZombieWandering(Wandering):
                     false otherwise.
 
         """
-        neighbors = agent.neighbors(radius=agent.traits["vision"])
-
-        return agent.nearest_brain(neighbors) is None
+        return agent.nearest_brain() is None
 
 
 class AvoidingZombie(State):
@@ -505,16 +570,85 @@ class AvoidingZombie(State):
 
     Attributes:
         name (string): A string containing the name of the state.
+        batch (dict): Escape plans of all humans that saw a zombie, computed
+                      at once in batched escaping mode, by human.
+        batch_step (int): The step in which the batch was computed.
 
     """
 
+    __slots__ = ("batch", "batch_step")
+
     def __init__(self):
         """Initialize the AvoidingZombie state."""
         self.name = "AvoidingZombie"
+        self.batch = {}
+        self.batch_step = None
+
+    def batched_escape(self, agent):
+        """Get the escape direction of an agent out of the batch of this step.
+
+        The first call in a step computes the plan of every human that sees a
+        zombie in one pass with escape_plans, from the positions of the humans
+        and zombies at that moment. A plan is only used while the agent is
+        still where the plan was made, and may move into the same cells. When
+        the plan has multiple best cells, one is chosen now, so the random
+        choices are made in the same order as in sequential escaping.
+
+        Args:
+            agent (:obj:): The agent in the state.
+
+        Returns:
+            (tuple): Tuple containing the x and y coordinate of the direction
+                     for the human.
+            None: If there is no plan for the agent.
+
+        """
+        model = agent.model
+
+        if self.batch_step != model.schedule.steps:
+            store = model.store
+            slots = store.slots(HUMANS)
+            humans = [store.agents[slot] for slot in slots.tolist()]
+
+            # The cells humans can't enter, like HumanAgent.blocked.
+            blocked = np.full(len(slots), WALL | HUMAN | ZOMBIE,
+                              dtype=np.uint8)
+
+            if os.environ["mode"] == "5":
+                blocked[store.state_flags[slots] & AVOIDING_ZOMBIE == 0] |= \
+                    ROAD
+
+            seeing, vectors, ties = escape_plans(
+                store.positions(slots), store.vision[slots], blocked,
+                store.positions(store.slots(ZOMBIES)), model.grid.occupancy)
+
+            vectors = vectors.tolist()
+            blocked = blocked.tolist()
+            self.batch = {human: (human.pos, blocked[i], tuple(vectors[i]),
+                                  ties[i])
+                          for i, human in enumerate(humans) if seeing[i]}
+            self.batch_step = model.schedule.steps
+
+        plan = self.batch.get(agent)
+
+        if plan is None:
+            return None
+
+        pos, blocked, vector, ties = plan
+
+        if pos != agent.pos or blocked != agent.blocked():
+            return None
+
+        if ties is not None:
+            return agent.vector_to(agent.random.choice(ties))
+
+        return vector
 
     def get_best_cell(self, agent):
         """Find the best possible cell for an agent to move to, based
-        on it's current neighbors.
+        on it's current neighbors. In batched escaping mode the direction
+        comes from the batch of the current step, if it has a plan for the
+        agent.
 
         Args:
             agent (:obj:): The agent in the state.
@@ -527,8 +661,13 @@ class AvoidingZombie(State):
         if not agent.pos:
             return None
 
-        neighbors = agent.neighbors(radius=agent.traits["vision"])
-        direction = agent.find_escape(neighbors)
+        direction = None
+
+        if agent.model.escaping == "batched":
+            direction = self.batched_escape(agent)
+
+        if direction is None:
+            direction = agent.find_escape()
 
         if direction:
             new_x = agent.pos[0] + direction[0]
@@ -566,7 +705,8 @@ class AvoidingZombie(State):
                     false otherwise.
 
         """
-        return self.get_best_cell(agent) and "OnRoad" in agent.states
+        return (self.get_best_cell(agent) and
+                agent.state_flags & ON_ROAD != 0)
 
     def on_update(self, agent):
         """Let an agent in this state execute one step.
@@ -596,6 +736,8 @@ class Idle(State):
 
     """
 
+    __slots__ = ()
+
     def __init__(self):
         """Initialize the Idle state."""
         self.name = "Idle"
@@ -614,13 +756,8 @@ class Idle(State):
                     false otherwise.
 
         """
-        neighbors = agent.neighbors()
-
-        for neighbour in neighbors:
-            if neighbour.agent_type == "human":
-                for state in neighbour.states:
-                    if state.name == "Infected":
-                        return False
+        if agent.neighbors(kinds=INFECTED):
+            return False
 
         return True
 
@@ -633,6 +770,8 @@ class ChasingHuman(State):
 
     """
 
+    __slots__ = ()
+
     def __init__(self):
         """Initialize the ChasingHuman state."""
         self.name = "ChasingHuman"
@@ -651,8 +790,7 @@ class ChasingHuman(State):
             None: Returns none if no cell was found.
 
         """
-        neighbors = agent.neighbors(radius=agent.traits["vision"])
-        nearest_human = agent.nearest_brain(neighbors)
+        nearest_human = agent.nearest_brain()
 
         if nearest_human:
             return agent.best_cell([nearest_human[0], nearest_human[1]])
@@ -677,13 +815,8 @@ class ChasingHuman(State):
         if human is None:
             return False
 
-        neighbors = agent.neighbors()
-
-        for neighbour in neighbors:
-            if neighbour.agent_type == "human":
-                for state in neighbour.states:
-                    if state.name == "Infected":
-                        return False
+        if agent.neighbors(kinds=INFECTED):
+            return False
 
         return True
 
@@ -708,6 +841,8 @@ class Susceptible(State):
 
     """
 
+    __slots__ = ()
+
     def __init__(self):
         """Initialize the Susceptible state."""
         self.name = "Susceptible"
@@ -721,6 +856,8 @@ class Infected(State):
 
     """
 
+    __slots__ = ()
+
     def __init__(self):
         """Initialize the Infected state."""
         self.name = "Infected"
@@ -750,6 +887,7 @@ class Infected(State):
         """
         agent.model.carrier += 1
         agent.traits["time_at_infection"] = agent.time_alive
+        agent.model.grid.update_kind(agent)
 
 
 class Turned(State):
@@ -762,6 +900,8 @@ class Turned(State):
 
     """
 
+    __slots__ = ()
+
     def __init__(self):
         """Initialize the Turned state."""
         self.name = "Turned"
@@ -778,7 +918,7 @@ class Turned(State):
         target.model.grid.place_agent(zombie, target.pos)
         target.model.schedule.add(zombie)
 
-        if "OnRoad" in target.states:
+        if target.state_flags & ON_ROAD:
             target.fsm.set_initial_states(["OnRoad"], zombie)
             zombie.traits["dir"] = target.traits["dir"]
             zombie.traits["speed"] = target.traits["speed"]
@@ -822,12 +962,17 @@ class InteractionHuman(State):
 
     Attributes:
         name (string): A string containing the name of the state.
+        target (:obj:): The human found by the last transition into this
+                        state, which the zombie interacts with.
 
     """
 
+    __slots__ = ("target",)
+
     def __init__(self):
         """Initialize the InteractionHuman state."""
         self.name = "InteractionHuman"
+        self.target = None
 
     def transition(self, agent):
         """Check if an agent can transition into this state.
@@ -843,17 +988,12 @@ class InteractionHuman(State):
                     false otherwise.
 
         """
-        neighbors = agent.neighbors()
-
-        for neighbour in neighbors:
-            if not neighbour.agent_type == "human":
-                continue
+        neighbors = agent.neighbors(kinds=SUSCEPTIBLE)
 
-            for state in neighbour.states:
-                if state.name == "Susceptible":
-                    self.target = neighbour
+        if neighbors:
+            self.target = neighbors[0]
 
-                    return True
+            return True
 
         return False
 
@@ -878,11 +1018,7 @@ class InteractionHuman(State):
         else:
             self.target.traits["zombie_kills"] = 0
 
-        neighbour_count = 0
-
-        for neighbour in self.target.neighbors():
-            if neighbour.agent_type == "human":
-                neighbour_count += 1
+        neighbour_count = len(self.target.neighbors(kinds=HUMANS))
 
         buff += min(neighbour_count * 0.05, 0.2)
         total = min(0.8, agent.model.human_kill_zombie_chance + buff)
@@ -903,6 +1039,8 @@ class RemoveZombie(State):
 
     """
 
+    __slots__ = ()
+
     def __init__(self):
         """Initialize the RemoveZombie state."""
         self.name = "RemoveZombie"
@@ -929,6 +1067,8 @@ class InfectHuman(State):
 
     """
 
+    __slots__ = ()
+
     def __init__(self):
         """Initialize the InfectHuman state."""
         self.name = "InfectHuman"
@@ -942,17 +1082,10 @@ class InfectHuman(State):
             agent (:obj:): The zombie in the state.
 
         """
-        neighbors = agent.neighbors()
-
-        for neighbour in neighbors:
-            if not neighbour.agent_type == "human":
-                continue
+        neighbors = agent.neighbors(kinds=SUSCEPTIBLE)
 
-            for state in neighbour.states:
-                if state.name == "Susceptible":
-                    neighbour.traits["infected"] = True
-
-                    return
+        if neighbors:
+            neighbors[0].traits["infected"] = True
 
 
 class OnRoad(State):
@@ -963,6 +1096,8 @@ class OnRoad(State):
 
     """
 
+    __slots__ = ()
+
     def __init__(self):
         """Initialize On Road state."""
         self.name = "OnRoad"
@@ -976,9 +1111,9 @@ class OnRoad(State):
         """
         road = self.on_road(agent)
 
-        if road and "AvoidingZombie" in agent.states:
-            agent.traits["speed"] = road.place.speed
-            agent.traits["dir"] = road.place.flip(agent.pos)
+        if road and agent.state_flags & AVOIDING_ZOMBIE:
+            agent.traits["speed"] = road.speed
+            agent.traits["dir"] = road.flip(agent.pos)
 
             return True
 
@@ -1009,7 +1144,7 @@ class OnRoad(State):
                                                 "ZombieWandering")
 
                 new_state_obj = agent.model.fsm.states["Idle"]["object"]
-                agent.states.append(new_state_obj)
+                agent.model.fsm.add_to_state(agent, new_state_obj)
                 new_state_obj.on_enter(agent)
         else:
             x = int(agent.pos[0] + agent.traits["dir"][0] *
@@ -1019,14 +1154,14 @@ class OnRoad(State):
             agent.model.grid.move_agent(agent, (x, y))
 
     def on_road(self, agent):
-        """Check if human or zombie on the road shares cell with a Road obj.
+        """Check if human or zombie on the road is on a cell of a Road.
 
         Args:
             agent (:obj:): The zombie in the state.
 
         """
         if agent.agent_type == "human" or \
-                (agent.agent_type == "zombie" and "OnRoad" in agent.states):
+                (agent.agent_type == "zombie" and agent.state_flags & ON_ROAD):
 
             return agent.on_road()
 
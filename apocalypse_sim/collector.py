@@ -0,0 +1,206 @@
+"""collector.py.
+
+Collector for the counters of the model, which keeps them in preallocated
+NumPy columns instead of Python lists. When the columns are full, the oldest
+rows are written to a directory of npz chunks, or dropped if there is none, so
+the memory a run takes does not grow with the number of steps.
+"""
+import glob
+import os
+
+import numpy as np
+
+
+class ColumnWindow:
+    """Read only view of the rows of a column that are in memory.
+
+    Indexing gives Python values, so the values can be sent to the browser
+    by the ChartModule of the server.
+
+    """
+
+    def __init__(self, column, size):
+        """Make a view of the first size rows of a column."""
+        self.column = column[:size]
+
+    def __len__(self):
+        """Return the number of rows in the view."""
+        return len(self.column)
+
+    def __getitem__(self, index):
+        """Get a row, or a list of rows for a slice."""
+        return self.column[index].tolist()
+
+
+class ColumnCollector:
+    """Collects model reporters into NumPy columns.
+
+    Works like the DataCollector of mesa for model reporters, the latest rows
+    are found in model_vars, which the ChartModule of the server reads.
+
+    Attributes:
+        model_reporters (dict): For every column name the attribute of the
+                                model or a function of the model to collect.
+        capacity (int): Number of rows kept in memory.
+        every (int): Only collect every k-th step.
+        on_change (bool): Only collect a step if a value changed.
+        path (string): Directory the full chunks are written to, None to drop
+                       old rows instead.
+        steps (:obj:): Column with the step of every row in memory.
+        columns (dict): The column of every model reporter.
+        size (int): Number of rows in memory.
+        flushed (int): Number of rows in memory that are written to disk.
+        chunks (int): Number of chunks written to disk.
+
+    """
+
+    def __init__(self, model_reporters, capacity=1024, every=1,
+                 on_change=False, path=None, dtype=np.float64):
+        """Initialize the collector with empty columns.
+
+        Args:
+            model_reporters (dict): For every column name the attribute of the
+                                    model as string, or a function of the
+                                    model.
+            capacity (int): Number of rows kept in memory, at least 2.
+            every (int): Only collect every k-th step.
+            on_change (bool): Only collect a step if a value changed since
+                              the last collected row.
+            path (string): Directory to write full chunks to, None to drop the
+                           oldest rows instead. Every run needs a directory
+                           without chunks.
+            dtype (:obj:): Type of the values in the columns.
+
+        Raises:
+            ValueError: If the directory already holds chunks, of an earlier
+                        run for example, which are never overwritten.
+
+        """
+        self.model_reporters = model_reporters
+        self.capacity = max(capacity, 2)
+        self.every = every
+        self.on_change = on_change
+        self.path = path
+
+        self.steps = np.zeros(self.capacity, dtype=np.int64)
+        self.columns = {name: np.zeros(self.capacity, dtype=dtype)
+                        for name in model_reporters}
+        self.size = 0
+        self.flushed = 0
+        self.chunks = 0
+
+        if path is not None:
+            if glob.glob(os.path.join(path, "chunk_*.npz")):
+                raise ValueError("The directory %s already holds chunks of "
+                                 "collected counters" % path)
+
+            os.makedirs(path, exist_ok=True)
+
+    @property
+    def model_vars(self):
+        """Rows in memory of every column, the last one is the latest."""
+        return {name: ColumnWindow(column, self.size)
+                for name, column in self.columns.items()}
+
+    def collect(self, model):
+        """Collect the model reporters for the current step of a model.
+
+        Args:
+            model (:obj:): The model to collect the reporters of.
+
+        """
+        step = model.schedule.steps
+
+        if self.every > 1 and step % self.every:
+            return
+
+        values = []
+
+        for reporter in self.model_reporters.values():
+            if isinstance(reporter, str):
+                values.append(getattr(model, reporter))
+            else:
+                values.append(reporter(model))
+
+        if self.on_change and self.size and \
+                all(column[self.size - 1] == value for column, value in
+                    zip(self.columns.values(), values)):
+            return
+
+        if self.size == self.capacity:
+            self.spill()
+
+        self.steps[self.size] = step
+
+        for column, value in zip(self.columns.values(), values):
+            column[self.size] = value
+
+        self.size += 1
+
+    def spill(self):
+        """Make room by writing rows to disk and dropping the oldest half.
+
+        The newest half of the rows stays in memory, so model_vars keeps a
+        window of the latest rows.
+
+        """
+        if self.path is not None and self.flushed < self.size:
+            self.write_chunk(self.flushed, self.size)
+
+        keep = self.capacity // 2
+        start = self.size - keep
+
+        for column in [self.steps] + list(self.columns.values()):
+            column[:keep] = column[start:self.size]
+
+        self.size = keep
+        self.flushed = keep
+
+    def write_chunk(self, start, end):
+        """Write rows from start up to end to a new chunk file."""
+        chunk = os.path.join(self.path, "chunk_%05d.npz" % self.chunks)
+        arrays = {name: column[start:end]
+                  for name, column in self.columns.items()}
+        np.savez(chunk, step=self.steps[start:end], **arrays)
+        self.chunks += 1
+
+    def flush(self):
+        """Write all rows in memory that are not on disk yet."""
+        if self.path is not None and self.flushed < self.size:
+            self.write_chunk(self.flushed, self.size)
+            self.flushed = self.size
+
+    def to_arrays(self):
+        """Get all collected rows, from disk and memory.
+
+        Returns:
+            (dict): For "step" and every column name an array of the values.
+                    Without a path, only the rows in memory are returned.
+
+        """
+        parts = {name: [] for name in ["step"] + list(self.columns)}
+
+        if self.path is not None:
+            for chunk in sorted(glob.glob(os.path.join(self.path,
+                                                       "chunk_*.npz"))):
+                with np.load(chunk) as data:
+                    for name in parts:
+                        parts[name].append(data[name])
+
+            start = self.flushed
+        else:
+            start = 0
+
+        parts["step"].append(self.steps[start:self.size])
+
+        for name, column in self.columns.items():
+            parts[name].append(column[start:self.size])
+
+        return {name: np.concatenate(arrays)
+                for name, arrays in parts.items()}
+
+    def get_model_vars_dataframe(self):
+        """Get all collected rows as a pandas DataFrame indexed by step."""
+        import pandas as pd
+
+        return pd.DataFrame(self.to_arrays()).set_index("step")
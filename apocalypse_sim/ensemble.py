@@ -0,0 +1,83 @@
+"""ensemble.py.
+
+Runs the replicates of one parameter cell, which only differ in their seed.
+The map of the cell is made once, in a base model. The worker processes are
+forked from the process holding the base model, so they share its map copy on
+write, and every replicate only spawns and runs its own agents on it. A
+replicate gives the same run as a model made from scratch with its seed.
+"""
+from model import Apocalypse
+from multiprocessing import get_context
+
+import os
+
+# The base map, parameters and measure of the ensemble that is running, which
+# the forked workers inherit.
+_ENSEMBLE = None
+
+
+def outcome(model):
+    """Get the reason a run ended and its number of steps."""
+    return model.reason, model.schedule.steps
+
+
+def run_replicate(seed):
+    """Run the replicate with a seed of the ensemble that is running.
+
+    Args:
+        seed (string): Seed of the replicate.
+
+    Returns:
+        (:obj:): The measure of the model after its run.
+
+    """
+    base_map, params, measure = _ENSEMBLE
+    model = Apocalypse(seed=seed, base_map=base_map, **params)
+    model.run_model()
+
+    return measure(model)
+
+
+def run_ensemble(params, seeds, measure=outcome, processes=None):
+    """Run a replicate of a parameter cell for every seed.
+
+    Args:
+        params (dict): Parameters of the model, without the seed. Runs should
+                       end, so give a termination policy like max_steps.
+        seeds (list): Seed of every replicate.
+        measure (function): Gets the result of a replicate out of its model
+                            after the run, by default the outcome. Workers
+                            are forked, so this can be any function.
+        processes (int): Number of worker processes, None for one per core, 0
+                         to run the replicates in this process.
+
+    Returns:
+        (list): The result of every replicate, in the order of the seeds.
+
+    Raises:
+        ValueError: If the tiled engine is run in worker processes, which
+                    are daemonic and cannot start the processes of its
+                    tiles.
+
+    """
+    global _ENSEMBLE
+
+    if params.get("engine") == "tiled" and processes != 0:
+        raise ValueError("The tiled engine cannot run in the workers of an "
+                         "ensemble, run it with processes=0")
+
+    # Only the map of the base model is used.
+    base = Apocalypse(**dict(params, seed=None, collect="off",
+                             engine="agents"))
+    _ENSEMBLE = (base.map, params, measure)
+
+    try:
+        if processes == 0:
+            return [run_replicate(seed) for seed in seeds]
+
+        processes = processes or os.cpu_count()
+
+        with get_context("fork").Pool(processes) as pool:
+            return pool.map(run_replicate, seeds)
+    finally:
+        _ENSEMBLE = None
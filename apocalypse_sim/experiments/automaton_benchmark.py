@@ -0,0 +1,121 @@
+"""Benchmark of the transition table of the automaton.
+
+Runs the same simulations once with the compiled transition table of
+Automaton.update, and once with the update that looks up the transitions by
+state name, and prints the time spent in the updates of the agents.
+
+Usage: mode=3 python automaton_benchmark.py
+"""
+import sys
+sys.path.append("..")
+from model import Apocalypse
+from automaton.automaton import Automaton
+import os
+import time
+
+
+def interpreted_update(fsm, agent):
+    """Update the states of an agent by looking up transitions by name.
+
+    This is how Automaton.update worked before the transition table.
+
+    Args:
+        fsm (:obj:): The automaton of the agent.
+        agent (:obj:): Agent whose states can be updated.
+
+    """
+    for state in agent.states.copy():
+        if not agent.pos:
+            continue
+
+        if state.halt(agent):
+            continue
+
+        transitions = fsm.states[state.name]['transitions']
+        new_states = []
+
+        for transition in transitions:
+            if not agent.pos:
+                continue
+
+            state_object = fsm.states[transition]['object']
+
+            if state_object.transition(agent):
+                new_states.append(state_object)
+
+        if new_states:
+            state.on_leave(agent)
+            fsm.remove_from_state(agent, state)
+
+        if "OnRoad" in new_states:
+            for new_state in new_states:
+                if new_state == "OnRoad":
+                    fsm.add_to_state(agent, new_state)
+                    new_state.on_enter(agent)
+        else:
+            for new_state in new_states:
+                fsm.add_to_state(agent, new_state)
+                new_state.on_enter(agent)
+
+
+def run(params, steps, update):
+    """Run a simulation and time the updates of the automaton.
+
+    Args:
+        params (dict): Parameters of the model.
+        steps (int): Maximum number of steps to run.
+        update (function): Update function to use for the automaton.
+
+    Returns:
+        (tuple): Seconds spent in updates, number of updates and the final
+                 number of susceptible humans and zombies.
+
+    """
+    timing = [0.0, 0]
+
+    def timed_update(fsm, agent):
+        start = time.perf_counter()
+        update(fsm, agent)
+        timing[0] += time.perf_counter() - start
+        timing[1] += 1
+
+    Automaton.update = timed_update
+    model = Apocalypse(**params)
+
+    for _ in range(steps):
+        if model.susceptible == 0 or \
+                (model.infected == 0 and model.carrier == 0):
+            break
+
+        model.step()
+
+    return timing[0], timing[1], model.susceptible, model.infected
+
+
+if __name__ == "__main__":
+    compiled_update = Automaton.update
+    params = {
+        "width": 50,
+        "height": 50,
+        "density": 0.35,
+        "infected_chance": 0.1,
+        "map_id": 0,
+        "incubation_time": 2,
+        "human_kill_agent_chance": 0.5,
+    }
+
+    for seed in ("1", "2", "3"):
+        params["seed"] = seed
+        results = {}
+
+        for name, update in (("interpreted", interpreted_update),
+                             ("compiled", compiled_update)):
+            results[name] = run(params, 100, update)
+            seconds, updates, _, _ = results[name]
+            print("mode %s seed %s %-11s %.3fs for %d updates, %.2fus each"
+                  % (os.environ["mode"], seed, name, seconds, updates,
+                     seconds / max(updates, 1) * 1e6))
+
+        assert results["interpreted"][1:] == results["compiled"][1:]
+
+    Automaton.update = compiled_update
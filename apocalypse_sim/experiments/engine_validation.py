@@ -0,0 +1,213 @@
+"""Validation of the arrays engine against the agents engine.
+
+Runs the parameter grid of the experiments in data/ with both engines of
+Apocalypse, using the seeds of the data, and compares for every density and
+incubation time the rate at which the humans win and the distribution of the
+number of steps a simulation takes. The distributions of steps are compared
+with the two-sample Kolmogorov-Smirnov statistic, the largest distance between
+their cumulative distributions.
+
+Runs that hit MAX_STEPS are left out, they have no winner. Over all cells of
+the grid the arrays engine passes when its human win rate is within
+WIN_RATE_TOLERANCE of the one of the agents engine, and the KS statistic of
+the steps is below its critical value at significance ALPHA. The cells are
+printed for where the engines differ, a cell on its own has too few runs to
+pass or fail.
+
+Usage: python engine_validation.py [runs per density and incubation time]
+"""
+import sys
+sys.path.append("..")
+from model import Apocalypse
+from multiprocessing import Pool
+from termination import HUMANS_WON, OUTCOMES
+import csv
+import os
+import time
+import numpy as np
+
+DATA_FILES = {
+    True: "data/density_and_incubation_grouping.csv",
+    False: "data/density_and_incubation_nogrouping.csv",
+}
+
+MAX_STEPS = 1000
+
+# Largest difference in human win rate, and significance of the KS test, for
+# the arrays engine to pass.
+WIN_RATE_TOLERANCE = 0.05
+ALPHA = 0.05
+
+ENGINES = ("agents", "arrays")
+
+
+def get_model_params():
+    """Standard parameters of the model in the experiments of the data."""
+    return {
+        "width": 30,
+        "height": 30,
+        "infected_chance": 0.05,
+        "map_id": 0,
+        "human_kill_agent_chance": 0.35,
+        "max_steps": MAX_STEPS,
+        "collect": "off",
+    }
+
+
+def read_grid(runs):
+    """Read the parameters of the runs in the data files.
+
+    Args:
+        runs (int): Number of runs to take for every grouping, density and
+                    incubation time.
+
+    Returns:
+        (list): The parameters of every run.
+
+    """
+    grid = []
+
+    for grouping, data_file in DATA_FILES.items():
+        taken = {}
+
+        with open(data_file, "r") as file:
+            for row in csv.reader(file):
+                key = (float(row[0]), int(row[1]))
+
+                if taken.get(key, 0) >= runs:
+                    continue
+
+                taken[key] = taken.get(key, 0) + 1
+                params = get_model_params()
+                params.update(density=key[0], incubation_time=key[1],
+                              grouping=grouping, seed=row[3])
+                grid.append(params)
+
+    return grid
+
+
+def run_simulation(params):
+    """Run one simulation with both engines.
+
+    Args:
+        params (dict): Parameters of the model.
+
+    Returns:
+        (tuple): The parameters, and for every engine the reason the run
+                 ended, the number of steps and the seconds it took.
+
+    """
+    os.environ["mode"] = "3"
+    results = {}
+
+    for engine in ENGINES:
+        start = time.perf_counter()
+        model = Apocalypse(engine=engine, **params)
+        reason = model.run_model()
+
+        results[engine] = (reason, model.schedule.steps,
+                           time.perf_counter() - start)
+
+    return params, results
+
+
+def ks_statistic(a, b):
+    """Get the two-sample Kolmogorov-Smirnov statistic of two samples."""
+    a = np.sort(a)
+    b = np.sort(b)
+    values = np.concatenate([a, b])
+    cdf_a = np.searchsorted(a, values, side="right") / len(a)
+    cdf_b = np.searchsorted(b, values, side="right") / len(b)
+
+    return np.abs(cdf_a - cdf_b).max()
+
+
+def ks_critical(n, m, alpha=ALPHA):
+    """Get the critical value of the KS statistic of samples of size n and m
+    at a significance, from the asymptotic distribution of the statistic."""
+    return np.sqrt(-np.log(alpha / 2) / 2) * np.sqrt((n + m) / (n * m))
+
+
+def report(results):
+    """Print the comparison of the engines for every cell of the grid, and
+    whether the arrays engine passes over the whole grid.
+
+    Args:
+        results (list): Results of run_simulation.
+
+    Returns:
+        (bool): True if the arrays engine passes.
+
+    """
+    cells = {}
+
+    for params, result in results:
+        key = (params["grouping"], params["density"],
+               params["incubation_time"])
+        cells.setdefault(key, []).append(result)
+
+    print("grouping density incubation | human wins agents arrays | "
+          "mean steps agents arrays | KS steps")
+
+    for key in sorted(cells):
+        finished = {engine: [run[engine] for run in cells[key]
+                             if run[engine][0] in OUTCOMES]
+                    for engine in ENGINES}
+
+        if not all(finished.values()):
+            print("%8d %7.2f %10d | no finished runs" % key)
+            continue
+
+        wins = {engine: np.mean([run[0] == HUMANS_WON
+                                 for run in finished[engine]])
+                for engine in ENGINES}
+        steps = {engine: np.array([run[1] for run in finished[engine]])
+                 for engine in ENGINES}
+
+        print("%8d %7.2f %10d | %17.2f %6.2f | %17.1f %6.1f | %8.2f"
+              % (key + (wins["agents"], wins["arrays"],
+                        steps["agents"].mean(), steps["arrays"].mean(),
+                        ks_statistic(steps["agents"], steps["arrays"]))))
+
+    finished = {engine: [result[engine] for _, result in results
+                         if result[engine][0] in OUTCOMES]
+                for engine in ENGINES}
+    wins = {engine: np.mean([run[0] == HUMANS_WON for run in finished[engine]])
+            for engine in ENGINES}
+    steps = {engine: np.array([run[1] for run in finished[engine]])
+             for engine in ENGINES}
+
+    for engine in ENGINES:
+        print("%s engine: %d of %d runs finished, human win rate %.3f, "
+              "mean steps %.1f" % (engine, len(finished[engine]),
+                                   len(results), wins[engine],
+                                   steps[engine].mean()))
+
+    gap = wins["arrays"] - wins["agents"]
+    ks = ks_statistic(steps["agents"], steps["arrays"])
+    critical = ks_critical(len(steps["agents"]), len(steps["arrays"]))
+    passed = abs(gap) <= WIN_RATE_TOLERANCE and ks < critical
+
+    print("human win rate gap: %+.3f, tolerance %.3f" % (gap,
+                                                        WIN_RATE_TOLERANCE))
+    print("KS steps: %.3f, critical value %.3f at alpha %.2f"
+          % (ks, critical, ALPHA))
+    print("PASS" if passed else "FAIL")
+
+    for engine in ENGINES:
+        seconds = sum(result[engine][2] for _, result in results)
+        total_steps = sum(result[engine][1] for _, result in results)
+        print("%s engine: %.1fs for %d steps, %.2fms per step"
+              % (engine, seconds, total_steps,
+                 seconds / max(total_steps, 1) * 1000))
+
+    return passed
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    with Pool() as pool:
+        results = pool.map(run_simulation, read_grid(runs))
+
+    sys.exit(0 if report(results) else 1)
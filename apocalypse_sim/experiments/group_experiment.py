@@ -6,12 +6,12 @@ We do this then for humans wo use herding and humans wo do not.
 """
 import sys
 sys.path.append("..")
-from model import Apocalypse
+from ensemble import run_ensemble
+from termination import winner
 import os
 import numpy as np
 import random
 import csv
-from p_tqdm import p_umap
 
 
 def make_params():
@@ -38,7 +38,12 @@ def get_model_params(group):
         "infected_chance": 0.05,
         "map_id": 0,
         "grouping": group,
-        "human_kill_agent_chance": 0.35
+        "human_kill_agent_chance": 0.35,
+        # Runs that reach the limit, or where the zombies and humans are
+        # walled off from each other, have no winner, see the reason column.
+        # No stalemate limit, as quiet zombies may still find a human.
+        "max_steps": 1000,
+        "stop_unreachable": True
     }
 
 def make_models(inc_times, simulations, group):
@@ -65,34 +70,40 @@ def write_models(models, model_file):
         for model in models:
             writer.writerow(model.values())
 
-def run_simulation(params):
-    """Run experiment with given parameters. Return outcome of experiment."""
-    model = Apocalypse(**params)
+def run_cell(replicates):
+    """Run the experiments of one density, which share their map, on
+    multiple cores. Return the experiments with their outcome.
 
-    while True:
-        model.step()
+    Runs that were stopped have no winner, only the reason they ended, see
+    termination.py.
+    """
+    params = dict(replicates[0])
+    del params['seed'], params['iteration']
+    outcomes = run_ensemble(params, [model['seed'] for model in replicates])
 
-        # Zombies win
-        if model.susceptible == 0:
-            params['winner'] = 'zombies'
-            params['steps'] = model.schedule.steps
-            return params
+    for model, (reason, steps) in zip(replicates, outcomes):
+        model['winner'] = winner(reason)
+        model['steps'] = steps
+        model['reason'] = reason
 
-        # Humans win
-        elif model.infected == 0 and model.carrier == 0:
-            params['winner'] = 'human'
-            params['steps'] = model.schedule.steps
-            return params
+    return replicates
 
 def run_experiment(models, series_file):
-    """Run experiment on multiple cores and write result to series_file."""
-    results = p_umap(run_simulation, models)
+    """Run experiment per density and write result to series_file."""
+    cells = {}
+
+    for model in models:
+        cells.setdefault(model['density'], []).append(model)
+
+    results = [result for replicates in cells.values()
+               for result in run_cell(replicates)]
     print("time for writing the results")
     with open(series_file, "a") as file:
         for result in results:
-            file.write('{:.2f},{:d},{:d},{:},{:},{:d}\n'.format(
+            file.write('{:.2f},{:d},{:d},{:},{:},{:d},{:}\n'.format(
                 result["density"], int(result["grouping"]), int(result["iteration"]),
-                result["seed"], result["winner"], result["steps"]
+                result["seed"], result["winner"], result["steps"],
+                result["reason"]
             ))
 
 
@@ -0,0 +1,68 @@
+"""Benchmark of lazy activation.
+
+Runs the same simulations with RandomActivation and with LazyActivation,
+checks that they give the same counters, and prints the time of both and
+the number of agent steps lazy activation took without the automaton.
+
+Usage: python lazy_benchmark.py
+"""
+import sys
+sys.path.append("..")
+from model import Apocalypse
+import os
+import time
+
+RUNS = {
+    "0": {"width": 200, "height": 200, "density": 0.3, "map_id": 0,
+          "grouping": False},
+    "2": {"width": 200, "height": 200, "density": 0.2, "map_id": 0,
+          "province": "Utrecht", "grouping": False},
+}
+
+
+def run(mode, params, activation, steps):
+    """Run a simulation.
+
+    Args:
+        mode (string): The mode to run the model in.
+        params (dict): Parameters of the model.
+        activation (string): "random" or "lazy".
+        steps (int): Maximum number of steps to run.
+
+    Returns:
+        (tuple): The counters after every step, the seconds the steps took
+                 and the schedule.
+
+    """
+    os.environ["mode"] = mode
+    model = Apocalypse(seed="1", infected_chance=0.1, collect="off",
+                       activation=activation, **params)
+    counters = []
+    start = time.perf_counter()
+
+    for _ in range(steps):
+        if model.susceptible == 0 or \
+                (model.infected == 0 and model.carrier == 0):
+            break
+
+        model.step()
+        counters.append((model.susceptible, model.infected, model.carrier,
+                         model.recovered))
+
+    return counters, time.perf_counter() - start, model.schedule
+
+
+if __name__ == "__main__":
+    # The maps read their data relative to the simulation directory
+    os.chdir("..")
+
+    for mode, params in RUNS.items():
+        full, full_seconds, _ = run(mode, params, "random", 50)
+        lazy, lazy_seconds, schedule = run(mode, params, "lazy", 50)
+        assert full == lazy
+
+        print("mode %s: random %.1fs, lazy %.1fs, %d of %d agent steps "
+              "parked (%.0f%%)"
+              % (mode, full_seconds, lazy_seconds, schedule.parked_steps,
+                 schedule.total_steps,
+                 100 * schedule.parked_steps / max(schedule.total_steps, 1)))
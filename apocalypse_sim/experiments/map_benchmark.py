@@ -0,0 +1,50 @@
+"""Benchmark of map construction.
+
+Builds every map of every mode and prints, per mode, the seconds it took to
+make the models and the seconds spent labelling the cells of the grid in
+MapGen.spawn_map. Given a cache directory, the maps are loaded from the cache
+of compiled maps, after they are stored there on the first run.
+
+Usage: python map_benchmark.py [cache directory]
+"""
+import sys
+sys.path.append("..")
+from model import Apocalypse
+import os
+import time
+
+# For every mode the map ids and the width and height of the grid.
+MAPS = {
+    "0": (range(7), 100, 100),
+    "1": (range(4), 50, 50),
+    "2": ([0], 200, 200),
+    "3": ([0], 30, 30),
+    "4": ([0], 50, 100),
+    "5": ([0], 50, 50),
+    "6": (range(4), 50, 50),
+}
+
+if __name__ == "__main__":
+    # The maps read their data relative to the simulation directory
+    cache = os.path.abspath(sys.argv[1]) if len(sys.argv) > 1 else None
+    os.chdir("..")
+
+    for mode, (map_ids, width, height) in MAPS.items():
+        os.environ["mode"] = mode
+        build_seconds = 0
+        spawn_seconds = 0
+
+        for map_id in map_ids:
+            start = time.perf_counter()
+            model = Apocalypse(width=width, height=height, density=0.1,
+                               map_id=map_id, seed="1", collect="off",
+                               map_cache=cache)
+            build_seconds += time.perf_counter() - start
+
+            start = time.perf_counter()
+            model.map.spawn_map()
+            spawn_seconds += time.perf_counter() - start
+
+        print("mode %s: %d maps of %dx%d built in %.3fs, spawn_map %.3fs"
+              % (mode, len(map_ids), width, height, build_seconds,
+                 spawn_seconds))
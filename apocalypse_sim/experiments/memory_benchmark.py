@@ -0,0 +1,107 @@
+"""Benchmark of the memory the agents of a model take.
+
+Makes a model for modes 0, 2 and 3 and prints the bytes per agent, counted in
+two ways. The objects count adds up the agent objects, their instance dicts
+(if they have one), state lists, decision dicts and traits that are not kept
+in columns, and the row of every agent in the columns of the AgentStore. The
+model count is the memory of the whole model with agents, minus the memory of
+the same model without agents, divided by the number of agents.
+
+Usage: python memory_benchmark.py
+"""
+import sys
+sys.path.append("..")
+import gc
+import os
+import tracemalloc
+
+PARAMS = {
+    "0": {"width": 100, "height": 100, "map_id": 0},
+    "2": {"width": 200, "height": 200, "map_id": 0, "province": "Utrecht"},
+    "3": {"width": 100, "height": 100, "map_id": 0},
+}
+
+
+def object_bytes(agent):
+    """Count the bytes of the objects a single agent owns.
+
+    Args:
+        agent (:obj:): The agent to count.
+
+    Returns:
+        (int): Bytes of the agent, its dict, states, decisions and traits.
+
+    """
+    size = sys.getsizeof(agent) + sys.getsizeof(agent.states)
+
+    if hasattr(agent, "__dict__"):
+        size += sys.getsizeof(agent.__dict__)
+
+    if agent.decisions is not None:
+        size += sys.getsizeof(agent.decisions)
+
+    extra = agent.traits.extra
+
+    if extra is not None:
+        size += sys.getsizeof(extra)
+
+    return size
+
+
+def row_bytes(store):
+    """Count the bytes of one row in all columns of a store."""
+    return sum(column.itemsize for column in store.columns.values())
+
+
+def model_bytes(density, params):
+    """Measure the memory of a new model.
+
+    Args:
+        density (float): Density of the agents.
+        params (dict): Other parameters of the model.
+
+    Returns:
+        (tuple): Bytes allocated for the model, and the model.
+
+    """
+    from model import Apocalypse
+
+    gc.collect()
+    tracemalloc.start()
+    model = Apocalypse(density=density, infected_chance=0.1, seed="1",
+                       collect="off", **params)
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return size, model
+
+
+def run(mode, density):
+    """Print the bytes per agent of a mode.
+
+    Args:
+        mode (string): The mode to run the model in.
+        density (float): Density of the agents.
+
+    """
+    os.environ["mode"] = mode
+    empty, _ = model_bytes(0.0, PARAMS[mode])
+    full, model = model_bytes(density, PARAMS[mode])
+
+    agents = model.schedule.agents
+    objects = sum(object_bytes(agent) for agent in agents) / len(agents)
+    columns = row_bytes(model.store)
+
+    print("mode %s: %d agents, objects %.0f B + columns %d B per agent, "
+          "model %.0f B per agent"
+          % (mode, len(agents), objects, columns,
+             (full - empty) / len(agents)))
+
+
+if __name__ == "__main__":
+    # The maps read their data relative to the simulation directory
+    os.chdir("..")
+
+    for mode in PARAMS:
+        run(mode, 0.5)
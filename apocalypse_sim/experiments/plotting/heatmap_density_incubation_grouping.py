@@ -5,6 +5,7 @@ import numpy as np
 import pandas as pd
 
 vals = {}
+stopped = []
 
 
 data_file = '../data/density_and_incubation_grouping.csv'
@@ -22,10 +23,24 @@ with open(data_file, 'r') as file:
             vals[density] = {}
 
         if incubation not in vals[density]:
-            vals[density][incubation] = 0
+            vals[density][incubation] = [0, 0]
+
+        # Runs stopped before either side won are left out and reported.
+        if winner not in ('human', 'zombies'):
+            stopped.append((density, incubation, result[-1]))
+            continue
+
+        vals[density][incubation][1] += 1
 
         if winner == 'human':
-            vals[density][incubation] += 1
+            vals[density][incubation][0] += 1
+
+if stopped:
+    print("{:d} runs without a winner left out:".format(len(stopped)))
+
+    for density, incubation, reason in stopped:
+        print("density {:}, incubation {:}: {:}".format(density, incubation,
+                                                       reason))
 
 result = []
 
@@ -35,21 +50,21 @@ for i, k in enumerate(sorted(vals.keys(), key=lambda x: float(x))):
     result.append([0] * len(f))
 
     for j, m in enumerate(sorted(f, key=lambda x: int(x))):
-        result[i][j] = vals[k][m]
+        wins, finished = vals[k][m]
+        result[i][j] = wins / finished if finished else 0
 
-plt.imshow(result, vmin=0, vmax=25, cmap='BuGn',
+plt.imshow(result, vmin=0, vmax=1, cmap='BuGn',
             interpolation='spline16', origin='lower')
 
 m = np.array(result)
 win_min = m.min()
 win_max = m.max()
 
-cbar = plt.colorbar(ticks=[0, 25])
+cbar = plt.colorbar(ticks=[0, 1])
 
-cbar.ax.set_yticklabels(
-    ["{:d}%".format(int(100 * (0 / 25))), "{:d}%".format(int(100 * (25 / 25)))])
+cbar.ax.set_yticklabels(["0%", "100%"])
 
-cbar.ax.set_ylabel('Out of 25 simulations', rotation=90)
+cbar.ax.set_ylabel('Out of the finished simulations', rotation=90)
 
 ax = plt.axes()
 
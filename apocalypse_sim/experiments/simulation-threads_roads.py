@@ -44,7 +44,9 @@ def get_model_params():
         "infected_chance": 0.05,
         "incubation_time": None,
         "map_id": 0,
-        "human_kill_agent_chance": 0.35
+        "human_kill_agent_chance": 0.35,
+        "max_steps": 200,
+        "stalemate_steps": 50
     }
 
 
@@ -68,20 +70,15 @@ def run_simulation(params):
     """Run experiment with given parameters. Return outcome of experiment."""
     model = Apocalypse(**params)
     series = []
-    it = 0
-    while True:
-        it += 1
+
+    while model.running:
         model.step()
         series.append((model.susceptible, model.infected, model.carrier,
                        model.recovered))
-        if (model.infected == 0 and model.carrier == 0) or \
-                (model.susceptible == 0):
-            return {"data": series, "density": str(params["density"]),
-                    "incubation_time": str(params["incubation_time"])}
-        # Zombies win
-        if it > 200:
-            return {"data": series, "density": str(params["density"]),
-                    "incubation_time": str(params["incubation_time"])}
+
+    return {"data": series, "density": str(params["density"]),
+            "incubation_time": str(params["incubation_time"]),
+            "reason": model.reason}
 
 
 def run_experiment(models, series_file):
@@ -0,0 +1,63 @@
+"""Benchmark of model snapshots.
+
+Warms up an outbreak on a 200x200 map, takes a snapshot of it and restores
+it. Prints the size of the snapshot and the time taking and restoring it
+took, and checks that the restored model continues like the original one.
+
+Usage: python snapshot_benchmark.py [warm up steps] [steps after restoring]
+"""
+import sys
+sys.path.append("..")
+from model import Apocalypse
+import os
+import time
+
+RUNS = {
+    "0": {"width": 200, "height": 200, "density": 0.3, "map_id": 0},
+    "2": {"width": 200, "height": 200, "density": 0.2, "map_id": 0,
+          "province": "Utrecht"},
+}
+
+
+def trace(model, steps):
+    """Step a model and get its counters and agent positions every step."""
+    rows = []
+
+    for _ in range(steps):
+        if not model.running:
+            break
+
+        model.step()
+        rows.append((model.susceptible, model.infected, model.carrier,
+                     model.recovered,
+                     sorted((agent.unique_id, agent.pos)
+                            for agent in model.schedule.agents)))
+
+    return rows
+
+
+if __name__ == "__main__":
+    # The maps read their data relative to the simulation directory
+    os.chdir("..")
+    warm_up = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    for mode, params in RUNS.items():
+        os.environ["mode"] = mode
+        model = Apocalypse(seed="1", infected_chance=0.1, collect="off",
+                           **params)
+        trace(model, warm_up)
+
+        start = time.perf_counter()
+        data = model.snapshot()
+        taken = time.perf_counter() - start
+
+        start = time.perf_counter()
+        restored = Apocalypse.restore(data)
+        restored_seconds = time.perf_counter() - start
+
+        assert trace(model, steps) == trace(restored, steps)
+
+        print("mode %s: %d agents, snapshot of %d bytes taken in %.0fms, "
+              "restored in %.0fms" % (mode, model.store.size, len(data),
+                                      taken * 1000, restored_seconds * 1000))
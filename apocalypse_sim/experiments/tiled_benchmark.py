@@ -0,0 +1,75 @@
+"""Benchmark of the tiled engine.
+
+Runs the same simulation with the tiled engine for a number of tiles, once
+with a process per tile and once with all tiles in one process. Prints the
+time per step of both, and checks that they give the same counters.
+
+Usage: python tiled_benchmark.py [width] [height] [steps]
+"""
+import sys
+sys.path.append("..")
+from model import Apocalypse
+from tiled_engine import TiledEngine
+import os
+import time
+
+
+def run(params, tiles, parallel, steps):
+    """Run a simulation with the tiled engine.
+
+    Args:
+        params (dict): Parameters of the model.
+        tiles (int): Number of tiles.
+        parallel (bool): Step every tile in its own process.
+        steps (int): Maximum number of steps to run.
+
+    Returns:
+        (tuple): The counters after every step, and the seconds per step.
+
+    """
+    model = Apocalypse(engine="agents", **params)
+    model.engine = TiledEngine(model, tiles, parallel)
+    counters = []
+    start = time.perf_counter()
+
+    for _ in range(steps):
+        if model.susceptible == 0 or \
+                (model.infected == 0 and model.carrier == 0):
+            break
+
+        model.step()
+        counters.append((model.susceptible, model.infected, model.carrier,
+                         model.recovered))
+
+    seconds = time.perf_counter() - start
+    model.engine.close()
+
+    return counters, seconds / max(len(counters), 1)
+
+
+if __name__ == "__main__":
+    os.environ["mode"] = "3"
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    steps = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    params = {
+        "width": width,
+        "height": height,
+        "density": 0.3,
+        "infected_chance": 0.05,
+        "map_id": 0,
+        "seed": "1",
+        "collect": "off",
+    }
+
+    for tiles in (1, 2, 4, 8):
+        if width < tiles * 9:
+            break
+
+        local, local_seconds = run(params, tiles, False, steps)
+        parallel, parallel_seconds = run(params, tiles, True, steps)
+        assert local == parallel
+
+        print("%d tiles: %.1fms per step in one process, %.1fms with a "
+              "process per tile" % (tiles, local_seconds * 1000,
+                                    parallel_seconds * 1000))
@@ -0,0 +1,127 @@
+"""geodata.py.
+
+Province outlines and densities of the Netherlands map, compiled from the
+geojson and csv files into one NumPy bundle. The bundle holds the vertices of
+all rings in one array, with the province of every ring and the density of
+every province by its 'statnaam', so loading it needs neither pygeoj nor
+pandas. These are only imported when the bundle is made again, which happens
+when the source files change.
+"""
+import hashlib
+import numpy as np
+import os
+
+# Paths are relative to the simulation directory, like in map_layouts.py.
+GEOJSON = "grid_map/data/provincie_2020.geojson"
+DENSITIES = "grid_map/data/provinces_densities.csv"
+BUNDLE = "grid_map/data/provinces.npz"
+
+
+def sources_hash():
+    """Get the hash of the geojson and csv files the bundle is made from."""
+    digest = hashlib.sha1()
+
+    for path in (GEOJSON, DENSITIES):
+        with open(path, "rb") as file:
+            digest.update(hashlib.sha1(file.read()).digest())
+
+    return digest.hexdigest()
+
+
+def compile_bundle(path=BUNDLE):
+    """Make the bundle out of the geojson and csv files.
+
+    Every polygon of a province is a ring in the bundle, in the order of the
+    features and their coordinates in the geojson file.
+
+    Args:
+        path (string): Path the bundle is written to.
+
+    """
+    import pandas as pd
+    import pygeoj
+
+    poly_data = pygeoj.load(filepath=GEOJSON)
+    df = pd.read_csv(DENSITIES)
+
+    names = []
+    rings = []
+    multi = []
+
+    for feature in poly_data:
+        statnaam = feature.properties["statnaam"]
+
+        if feature.geometry.type == "Polygon":
+            polygons = [(polygon, False)
+                        for polygon in feature.geometry.coordinates]
+        elif feature.geometry.type == "MultiPolygon":
+            polygons = [(polygon, True)
+                        for m_poly in feature.geometry.coordinates
+                        for polygon in m_poly]
+        else:
+            polygons = []
+
+        for polygon, in_multi in polygons:
+            names.append(statnaam)
+            rings.append(np.array(polygon, dtype=np.float64).reshape(-1, 2))
+            multi.append(in_multi)
+
+    sizes = [len(ring) for ring in rings]
+
+    np.savez(path,
+             source=np.array(sources_hash()),
+             bbox=np.array(poly_data.bbox, dtype=np.float64),
+             statnaam=np.array(df["statnaam"], dtype=str),
+             density=np.array(df["density_of_total"], dtype=np.float64),
+             ring_statnaam=np.array(names, dtype=str),
+             ring_multi=np.array(multi, dtype=bool),
+             offsets=np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64),
+             vertices=np.concatenate(rings))
+
+
+class Provinces:
+    """Outlines and densities of the provinces, loaded from the bundle.
+
+    Attributes:
+        bbox (list): Minimum and maximum longitude and latitude of all rings.
+        densities (dict): Density of total of every province, by statnaam.
+        rings (list): For every ring its statnaam, an array of shape (n, 2)
+                      with its vertices, and whether it is part of a
+                      multipolygon.
+
+    """
+
+    def __init__(self, path=BUNDLE):
+        """Load the bundle, made again first if the source files changed.
+
+        Args:
+            path (string): Path of the bundle.
+
+        """
+        source = sources_hash()
+
+        if not self.is_current(path, source):
+            compile_bundle(path)
+
+        with np.load(path) as bundle:
+            self.bbox = bundle["bbox"].tolist()
+            self.densities = dict(zip(bundle["statnaam"].tolist(),
+                                      bundle["density"].tolist()))
+
+            offsets = bundle["offsets"].tolist()
+            vertices = bundle["vertices"]
+            self.rings = [
+                (statnaam, vertices[start:end], in_multi)
+                for statnaam, in_multi, start, end in zip(
+                    bundle["ring_statnaam"].tolist(),
+                    bundle["ring_multi"].tolist(), offsets, offsets[1:])
+            ]
+
+    @staticmethod
+    def is_current(path, source):
+        """Check if the bundle exists and was made from the source files."""
+        if not os.path.exists(path):
+            return False
+
+        with np.load(path) as bundle:
+            return str(bundle["source"]) == source
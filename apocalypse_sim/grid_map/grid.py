@@ -0,0 +1,427 @@
+"""grid.py.
+
+Grid the model places its agents on. It is a mesa MultiGrid which also keeps
+an occupancy raster, so agents can look up free cells without iterating over
+the objects in those cells, and the terrain of the map as rasters, so only
+humans and zombies have to live in the cells of the grid. Humans and zombies
+are indexed by kind, and the neighbourhoods an agent asks for during its step
+are cached until something moves in them.
+"""
+from mesa.space import MultiGrid
+from automaton.state import state_flag
+from grid_map.spatial_index import BucketIndex, KINDS, SUSCEPTIBLE, \
+    INFECTED, ZOMBIES, ALL_KINDS
+
+import numpy as np
+
+# Bits of a cell in the occupancy raster.
+WALL = 1
+ROAD = 2
+HUMAN = 4
+ZOMBIE = 8
+
+OCCUPANCY_FLAGS = {"human": HUMAN, "zombie": ZOMBIE}
+
+INFECTED_STATE = state_flag("Infected")
+
+# Offsets of the cells around a cell, in the order mesa iterates them.
+MOORE_OFFSETS = [(dx, dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1)
+                 if dx or dy]
+
+
+class OccupancyGrid(MultiGrid):
+    """MultiGrid with a bitmask per cell of what occupies the cell.
+
+    Walls and roads are not agents, they are part of the terrain of the grid,
+    which is set once with set_terrain. The position and kind of every agent
+    on the grid are kept in the agent store as well, -1 and 0 for agents that
+    are not on the grid.
+
+    Attributes:
+        occupancy (:obj:): Array of shape (width + 2, height + 2) holding the
+                           occupancy bits of every cell. It has a border of
+                           one wall cell around the grid, so the cell (x, y)
+                           is found at index (x + 1, y + 1).
+        place_ids (:obj:): Array of shape (width, height) with the index of
+                           the place a cell belongs to, -1 if it is no place.
+        road_ids (:obj:): Array of shape (width, height) with the index of
+                          the road a cell belongs to, -1 if it is no road.
+        places (list): The places the place ids refer to.
+        roads (list): The roads the road ids refer to.
+        indexes (dict): Spatial index of the agents of each kind.
+        active_agent (:obj:): Agent taking its step, whose neighbourhood
+                              queries are cached.
+
+    """
+
+    def __init__(self, width, height, torus):
+        """Initialize the grid and an empty occupancy raster.
+
+        Until the terrain is set, every cell of the grid is open.
+
+        Args:
+            width (int): Grid width.
+            height (int): Grid height.
+            torus (bool): If the grid wraps around at the edges.
+
+        """
+        super().__init__(width, height, torus)
+
+        self.occupancy = np.zeros((width + 2, height + 2), dtype=np.uint8)
+        self.occupancy[0, :] = WALL
+        self.occupancy[-1, :] = WALL
+        self.occupancy[:, 0] = WALL
+        self.occupancy[:, -1] = WALL
+
+        self.place_ids = np.full((width, height), -1, dtype=np.int32)
+        self.road_ids = np.full((width, height), -1, dtype=np.int32)
+        self.places = []
+        self.roads = []
+
+        self.indexes = {kind: BucketIndex(width, height) for kind in KINDS}
+        self._kinds = {}
+
+        self.active_agent = None
+        self._neighbourhoods = {}
+
+    @property
+    def empties(self):
+        """List of all cells without any agent in them."""
+        return [(x, y) for x in range(self.width) for y in range(self.height)
+                if not self.grid[x][y]]
+
+    @empties.setter
+    def empties(self, cells):
+        """Ignore the list of empty cells MultiGrid keeps up to date.
+
+        Keeping that list up to date costs a search through it on every move,
+        so it is derived from the cells when needed instead.
+
+        """
+        pass
+
+    def set_terrain(self, places, roads, place_ids, road_ids):
+        """Set the terrain of the grid.
+
+        Cells that belong to a road get the road bit in the occupancy raster,
+        cells that belong to neither a place nor a road are walls.
+
+        Args:
+            places (list): Places of the map.
+            roads (list): Roads of the map.
+            place_ids (:obj:): Array of shape (width, height) with the index
+                               in places of each cell, -1 for no place.
+            road_ids (:obj:): Array of shape (width, height) with the index in
+                              roads of each cell, -1 for no road.
+
+        """
+        self.places = places
+        self.roads = roads
+        self.place_ids = place_ids
+        self.road_ids = road_ids
+
+        inner = self.occupancy[1:-1, 1:-1]
+        inner &= HUMAN | ZOMBIE
+        inner[road_ids >= 0] |= ROAD
+        inner[(place_ids < 0) & (road_ids < 0)] |= WALL
+
+    def place_at(self, pos):
+        """Return the place a cell belongs to, None if there is none."""
+        place_id = self.place_ids.item(pos[0], pos[1])
+
+        if place_id < 0:
+            return None
+
+        return self.places[place_id]
+
+    def road_at(self, pos):
+        """Return the road a cell belongs to, None if there is none."""
+        road_id = self.road_ids.item(pos[0], pos[1])
+
+        if road_id < 0:
+            return None
+
+        return self.roads[road_id]
+
+    def move_agent(self, agent, pos):
+        """Move an agent from its current position to a new position.
+
+        Args:
+            agent (:obj:): Agent to move, which keeps its kind.
+            pos (tuple): Position to move the agent to.
+
+        """
+        pos = self.torus_adj(pos)
+        kind = self._kinds[agent]
+
+        self._remove_agent(agent.pos, agent)
+        self._place_agent(pos, agent, kind)
+        agent.pos = pos
+
+    def _place_agent(self, pos, agent, kind=None):
+        """Place the agent in its cell, index it and set its occupancy bit."""
+        x, y = pos
+        self.grid[x][y].add(agent)
+
+        if kind is None:
+            kind = self.agent_kind(agent)
+
+        self._kinds[agent] = kind
+        self.indexes[kind].insert(agent, pos)
+
+        store = agent.store
+        store.kind[agent.slot] = kind
+        store.x[agent.slot] = x
+        store.y[agent.slot] = y
+
+        if self._neighbourhoods:
+            self._invalidate(x, y)
+
+        flag = OCCUPANCY_FLAGS.get(agent.agent_type, 0)
+
+        if flag:
+            self.occupancy[x + 1, y + 1] |= flag
+
+    def _remove_agent(self, pos, agent):
+        """Remove the agent from its cell and update the occupancy bits.
+
+        The bit of the agents type is only cleared if no other agent of the
+        same type is left in the cell.
+
+        """
+        x, y = pos
+        self.grid[x][y].remove(agent)
+        self.indexes[self._kinds.pop(agent)].remove(agent, pos)
+
+        store = agent.store
+        store.kind[agent.slot] = 0
+        store.x[agent.slot] = -1
+        store.y[agent.slot] = -1
+
+        if self._neighbourhoods:
+            self._invalidate(x, y)
+
+        flag = OCCUPANCY_FLAGS.get(agent.agent_type, 0)
+
+        if not flag:
+            return
+
+        for other in self.grid[x][y]:
+            if other.agent_type == agent.agent_type:
+                return
+
+        self.occupancy[x + 1, y + 1] &= ~np.uint8(flag)
+
+    @staticmethod
+    def agent_kind(agent):
+        """Get the kind of index an agent belongs in.
+
+        Args:
+            agent (:obj:): A human or zombie.
+
+        Returns:
+            (int): ZOMBIES for zombies, INFECTED for humans in the Infected
+                   state and SUSCEPTIBLE for all other humans.
+
+        """
+        if agent.agent_type == "zombie":
+            return ZOMBIES
+
+        if agent.state_flags & INFECTED_STATE:
+            return INFECTED
+
+        return SUSCEPTIBLE
+
+    def kind(self, agent):
+        """Return the kind of index an agent is in, None if not on the grid."""
+        return self._kinds.get(agent)
+
+    def update_kind(self, agent):
+        """Move an agent to the index of its kind after its states changed.
+
+        Args:
+            agent (:obj:): Agent on the grid whose kind may have changed.
+
+        """
+        old = self._kinds.get(agent)
+        new = self.agent_kind(agent)
+
+        if old is None or old == new:
+            return
+
+        self.indexes[old].remove(agent, agent.pos)
+        self.indexes[new].insert(agent, agent.pos)
+        self._kinds[agent] = new
+        agent.store.kind[agent.slot] = new
+
+        if self._neighbourhoods:
+            self._invalidate(*agent.pos)
+
+    def query(self, pos, radius, kinds=ALL_KINDS, include_center=True):
+        """Get the agents of some kinds within range of a position.
+
+        Args:
+            pos (tuple): Position to look around.
+            radius (int): Range in which agents are found, as in a Moore
+                          neighbourhood.
+            kinds (int): The kinds of agents to get, SUSCEPTIBLE, INFECTED
+                         and ZOMBIES or-ed together.
+            include_center (bool): Include agents on pos itself if true.
+
+        Returns:
+            (list): The agents in range, ordered by cell in the order mesa
+                    iterates a neighbourhood.
+
+        """
+        found = []
+
+        for kind in KINDS:
+            if kinds & kind:
+                found.extend(self.indexes[kind].query(pos, radius,
+                                                      include_center))
+
+        found.sort(key=lambda agent: (agent.pos[1], agent.pos[0]))
+
+        return found
+
+    def is_cell_empty(self, pos):
+        """Return True if there are no agents in the cell."""
+        x, y = pos
+
+        return not self.grid[x][y]
+
+    def activate(self, agent):
+        """Start caching the neighbourhood queries of an agent.
+
+        Only the agent taking its step has its neighbourhoods cached, so
+        activating an agent drops the cache of the previous one.
+
+        Args:
+            agent (:obj:): The agent which starts its step.
+
+        """
+        self.active_agent = agent
+        self._neighbourhoods.clear()
+
+    def agent_neighbors(self, agent, moore=True, include_center=True,
+                        radius=1, scan_radius=1, kinds=ALL_KINDS):
+        """Get the neighbours of an agent, cached for the active agent.
+
+        The first query of the active agent gets all agents within at least
+        scan_radius around it. Smaller neighbourhoods and neighbourhoods of
+        fewer kinds around the same position are filtered out of that query.
+        A cached neighbourhood is dropped as soon as an agent enters or leaves
+        one of its cells or changes kind in it.
+
+        Args:
+            agent (:obj:): Agent to get the neighbours of.
+            moore (bool): If true, get diagonal neighbours as well.
+            include_center (bool): Include the cell of the agent if true.
+            radius (int): Range in which neighbours can be found.
+            scan_radius (int): Range to scan on the first query of the active
+                               agent, usually its vision.
+            kinds (int): The kinds of agents to get.
+
+        Returns:
+            (list): List of neighbours, in the order mesa would return them,
+                    which must not be modified.
+
+        """
+        pos = agent.pos
+
+        if not moore:
+            return [other for other in
+                    self.get_neighbors(pos, moore, include_center, radius)
+                    if self._kinds[other] & kinds]
+
+        if agent is not self.active_agent:
+            return self.query(pos, radius, kinds, include_center)
+
+        key = (pos, kinds, include_center, radius)
+        neighbours = self._neighbourhoods.get(key)
+
+        if neighbours is not None:
+            return neighbours
+
+        # Find the widest scan around this position to filter from.
+        wide = None
+
+        for (c_pos, c_kinds, c_center, c_radius), c_neighbours in \
+                self._neighbourhoods.items():
+            if c_pos == pos and c_kinds == ALL_KINDS and c_center and \
+                    c_radius >= radius and (wide is None or
+                                            c_radius > wide[0]):
+                wide = (c_radius, c_neighbours)
+
+        if wide is None:
+            wide_radius = max(radius, scan_radius)
+            wide = (wide_radius, self.query(pos, wide_radius))
+            self._neighbourhoods[(pos, ALL_KINDS, True, wide_radius)] = \
+                wide[1]
+
+            if wide_radius == radius and include_center and \
+                    kinds == ALL_KINDS:
+                return wide[1]
+
+        x, y = pos
+        agent_kinds = self._kinds
+        neighbours = [other for other in wide[1]
+                      if agent_kinds[other] & kinds and
+                      abs(other.pos[0] - x) <= radius and
+                      abs(other.pos[1] - y) <= radius and
+                      (include_center or other.pos != pos)]
+        self._neighbourhoods[key] = neighbours
+
+        return neighbours
+
+    def window(self, agent, radius):
+        """Get the cached neighbourhood the active agent sees.
+
+        The same list is returned until an agent enters or leaves one of its
+        cells, or changes kind in it, so it tells whether anything changed
+        around the agent since it was last asked for.
+
+        Args:
+            agent (:obj:): Agent to get the neighbourhood of.
+            radius (int): Range of the neighbourhood.
+
+        Returns:
+            (list): The neighbourhood, which must not be modified.
+            None: If the agent is not the active agent.
+
+        """
+        if agent is not self.active_agent:
+            return None
+
+        return self.agent_neighbors(agent, radius=radius, scan_radius=radius)
+
+    def _invalidate(self, x, y):
+        """Drop the cached neighbourhoods which contain the cell (x, y)."""
+        for key in list(self._neighbourhoods):
+            (c_x, c_y), _, _, radius = key
+
+            if abs(x - c_x) <= radius and abs(y - c_y) <= radius:
+                del self._neighbourhoods[key]
+
+    def free_cells(self, pos, blocked):
+        """Find the cells around a position that are not blocked.
+
+        Args:
+            pos (tuple): Position to look around.
+            blocked (int): Occupancy bits of the cells that may not be
+                           entered, this should always contain WALL.
+
+        Returns:
+            (list): The position itself, followed by all surrounding cells
+                    which have none of the blocked bits set.
+
+        """
+        x, y = pos
+        occupied = self.occupancy.item
+        free = [pos]
+
+        for d_x, d_y in MOORE_OFFSETS:
+            if not occupied(x + d_x + 1, y + d_y + 1) & blocked:
+                free.append((x + d_x, y + d_y))
+
+        return free
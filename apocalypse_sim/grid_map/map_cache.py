@@ -0,0 +1,155 @@
+"""map_cache.py.
+
+On disk cache of compiled maps. A compiled map is everything MapGen makes
+before it spawns agents: the place and road labels of every cell, the cells
+of every place, the places and roads themselves with their densities, colours
+and road directions, the hard coded agents and the door. Every map is stored
+in a directory of its own, named after the parameters of the model the map
+depends on and a hash of the files it is made from. The label rasters and
+cells are NumPy files that are memory mapped when the map is loaded.
+"""
+from grid_map.map_layouts import Map
+
+import hashlib
+import numpy as np
+import os
+import pickle
+import tempfile
+
+# Code every compiled map depends on: the layouts, MapGen which compiles them,
+# and the classes of the places and roads, which are pickled.
+SOURCES = [os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+           for name in ("map_layouts.py", "map_gen.py", "map_object.py")]
+
+# Files the layouts of a mode are made from, besides the sources. Paths of
+# data files are relative to the simulation directory, like in
+# map_layouts.py.
+DATA_FILES = {
+    "2": ["grid_map/geodata.py", "grid_map/data/provincie_2020.geojson",
+          "grid_map/data/provinces_densities.csv"],
+}
+
+# Hashes of the files read in this process, by path, size and time of the
+# last change.
+_hashes = {}
+
+
+def source_hash(mode):
+    """Get the hash of the files the maps of a mode are made from.
+
+    Args:
+        mode (string): The mode.
+
+    Returns:
+        (string): Hexadecimal hash of the contents of the files.
+
+    """
+    digest = hashlib.sha1()
+
+    for path in SOURCES + DATA_FILES.get(mode, []):
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+        if key not in _hashes:
+            with open(path, "rb") as file:
+                _hashes[key] = hashlib.sha1(file.read()).hexdigest()
+
+        digest.update(_hashes[key].encode())
+
+    return digest.hexdigest()
+
+
+def cache_path(directory, key):
+    """Get the directory of a compiled map in the cache.
+
+    Args:
+        directory (string): Directory of the cache.
+        key (tuple): Key of the map, see MapGen.
+
+    Returns:
+        (string): Path of the directory of the map.
+
+    """
+    mode, map_id, width, height, density, door_width = key
+    name = "mode%s-map%d-%dx%d-door%d-density%r-%s" % (
+        mode, map_id, width, height, door_width, float(density),
+        source_hash(mode)[:16])
+
+    return os.path.join(directory, name)
+
+
+def save_map(directory, key, compiled):
+    """Store a compiled map in the cache.
+
+    The map is written to a temporary directory first, which is then renamed,
+    so processes reading the cache never see half a map.
+
+    Args:
+        directory (string): Directory of the cache.
+        key (tuple): Key of the map, see MapGen.
+        compiled (tuple): The Map, place labels, road labels, cells of every
+                          place and door, see MapGen.compiled.
+
+    """
+    the_map, place_ids, road_ids, coords, door = compiled
+    path = cache_path(directory, key)
+    os.makedirs(directory, exist_ok=True)
+    temp = tempfile.mkdtemp(dir=directory)
+
+    sizes = [len(cells) for cells in coords]
+    offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+    cells = np.concatenate(list(coords) + [np.zeros((0, 2), dtype=np.int32)])
+
+    np.save(os.path.join(temp, "place_ids.npy"), place_ids)
+    np.save(os.path.join(temp, "road_ids.npy"), road_ids)
+    np.save(os.path.join(temp, "cells.npy"), cells.astype(np.int32))
+    np.save(os.path.join(temp, "offsets.npy"), offsets)
+
+    with open(os.path.join(temp, "objects.pkl"), "wb") as file:
+        pickle.dump((the_map.places, the_map.roads, the_map.agents, door),
+                    file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    try:
+        os.rename(temp, path)
+    except OSError:
+        # Another process stored the same map first.
+        for name in os.listdir(temp):
+            os.remove(os.path.join(temp, name))
+
+        os.rmdir(temp)
+
+
+def load_map(directory, key, model):
+    """Load a compiled map from the cache.
+
+    Args:
+        directory (string): Directory of the cache.
+        key (tuple): Key of the map, see MapGen.
+        model (:obj:): Model the map is loaded for.
+
+    Returns:
+        (tuple): The compiled map, see save_map.
+        None: If the map is not in the cache.
+
+    """
+    path = cache_path(directory, key)
+
+    if not os.path.isdir(path):
+        return None
+
+    with open(os.path.join(path, "objects.pkl"), "rb") as file:
+        places, roads, agents, door = pickle.load(file)
+
+    the_map = Map.__new__(Map)
+    the_map.model = model
+    the_map.places = places
+    the_map.roads = roads
+    the_map.agents = agents
+
+    arrays = {name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+              for name in ("place_ids", "road_ids", "cells", "offsets")}
+    offsets = arrays["offsets"].tolist()
+    coords = [arrays["cells"][start:end]
+              for start, end in zip(offsets, offsets[1:])]
+
+    return the_map, arrays["place_ids"], arrays["road_ids"], coords, door
@@ -2,23 +2,90 @@
 
 Spawns all map objects and agents and schedules them.
 """
+import os
 import sys
 from agents.human_agent import HumanAgent
 from agents.zombie_agent import ZombieAgent
-from grid_map.map_object import Place, Road, MapObjectAgent
+from grid_map.map_object import Place, Road
 from grid_map.map_layouts import Map
+from grid_map.map_cache import load_map, save_map
 
 from math import floor, ceil
 
-from shapely.geometry import Polygon, Point
+import numpy as np
+import shapely
+
+from shapely.geometry import Polygon
 
 sys.path.append("..")
 
 
-class MapGen:
-    """Generates a map and spawns the needed agents in the map."""
+def rasterize(map_objects, ids, free):
+    """Label the cells that intersect map objects with their index.
+
+    Every object tests the cells of the grid within its bounds, with one
+    vectorized call on its prepared polygon. A cell gets the index of the
+    first object it intersects.
+
+    Args:
+        map_objects (list): Places or roads, in order of priority.
+        ids (:obj:): Array of shape (width, height) the indices are written
+                     to.
+        free (:obj:): Boolean array of shape (width, height) with the cells
+                      that may be labelled, which is updated.
+
+    Returns:
+        (list): For every object the arrays of the x and y coordinates of
+                the cells it intersects, row by row. Cells of objects that
+                overlap are in both.
+
+    """
+    width, height = ids.shape
+    cells = []
+
+    for index, map_object in enumerate(map_objects):
+        min_x, min_y, max_x, max_y = map_object.poly.bounds
+        x0 = max(floor(min_x), 0)
+        y0 = max(floor(min_y), 0)
+        x1 = min(floor(max_x) + 1, width)
+        y1 = min(floor(max_y) + 1, height)
 
-    def __init__(self, map_id, city_id, infected_chance, province, model):
+        if x0 >= x1 or y0 >= y1:
+            cells.append((np.zeros(0, dtype=int), np.zeros(0, dtype=int)))
+            continue
+
+        ys, xs = np.mgrid[y0:y1, x0:x1].reshape(2, -1)
+        shapely.prepare(map_object.poly)
+        hit = shapely.intersects_xy(map_object.poly, xs, ys)
+        xs = xs[hit]
+        ys = ys[hit]
+        first = free[xs, ys]
+
+        ids[xs[first], ys[first]] = index
+        free[xs[first], ys[first]] = False
+        cells.append((xs, ys))
+
+    return cells
+
+
+class MapGen:
+    """Generates a map and spawns the needed agents in the map.
+
+    Attributes:
+        model (:obj:): Model instance for which the map is made.
+        map (:obj:): The Map with the places, roads and agents of the layout.
+        key (tuple): The mode and the parameters of the model the map depends
+                     on, models with the same key can share the map.
+        place_ids (:obj:): Index of the place of every cell, -1 for none.
+        road_ids (:obj:): Index of the road of every cell, -1 for none.
+        coords (list): For every place an array of shape (n, 2) with the
+                       coordinates of its cells.
+        door (list): The two ends of the door, [(-1, -1)] for no door.
+
+    """
+
+    def __init__(self, map_id, city_id, infected_chance, province, model,
+                 base=None, cache=None):
         """Construct a map.
 
         Args:
@@ -30,52 +97,98 @@ class MapGen:
             province (string): In the Netherlands map you can choose in which
                                province the outbreak starts.
             model (:obj:): Model instance for which the map is made.
+            base (:obj:): MapGen of another model with the same key, whose
+                          map and terrain are reused instead of made again.
+                          Only the agents are spawned for this model.
+            cache (string): Directory of the cache of compiled maps, see
+                            map_cache.py. None to always make the map.
+
+        Raises:
+            ValueError: If the base map was made for another key.
 
         """
         self.model = model
-        self.map = Map(map_id, model)
+        self.key = (os.environ["mode"], map_id, model.width, model.height,
+                    model.density, model.door_width)
+
+        if base is not None:
+            if base.key != self.key:
+                raise ValueError("Base map made for %s, not for %s"
+                                 % (base.key, self.key))
+
+            self.use(base.compiled())
+        elif cache is not None:
+            compiled = load_map(cache, self.key, model)
+
+            if compiled is None:
+                self.make(map_id)
+                save_map(cache, self.key, self.compiled())
+            else:
+                self.use(compiled)
+        else:
+            self.make(map_id)
 
-        self.spawn_map()
         self.spawn_agents()
         self.spawn_agents_in_city(city_id, infected_chance, province)
 
-    def spawn_map(self):
-        """Spawn map agents.
+    def make(self, map_id):
+        """Make the map of a layout and label the cells of the grid."""
+        self.map = Map(map_id, self.model)
+        self.spawn_map()
+        self.door = list(self.model.door)
+
+    def compiled(self):
+        """Get the map, the labels and cells made by make.
 
-        Loops through the coordinates in the grid and spawns a place, road,
-        or a wall on the cell.
+        Returns:
+            (tuple): The Map, place labels, road labels, cells of every place
+                     and door.
 
         """
-        for cell in self.model.grid.coord_iter():
-            x = cell[1]
-            y = cell[2]
+        return self.map, self.place_ids, self.road_ids, self.coords, self.door
+
+    def use(self, compiled):
+        """Use a map made before, from compiled, for the grid.
+
+        Args:
+            compiled (tuple): The map, see compiled.
 
-            added = False
+        """
+        self.map, self.place_ids, self.road_ids, self.coords, door = compiled
+        self.door = list(door)
+        self.model.door = list(door)
+        self.model.grid.set_terrain(self.map.places, self.map.roads,
+                                    self.place_ids, self.road_ids)
 
-            for place in self.map.places:
-                if place.poly.intersects(Point(x, y)):
-                    added = True
-                    new_agent = MapObjectAgent(
-                        (x, y), "city", self.model, color=place.color)
+    def spawn_map(self):
+        """Spawn the map in the grid.
 
-                    self.model.grid.place_agent(new_agent, (x, y))
+        Labels each cell as part of a place, a road or a wall, and stores the
+        labels as the terrain of the grid. A cell belongs to the first place
+        it intersects, and otherwise to the first road it intersects. The
+        cells of every place, which places that overlap share, are kept to
+        spawn agents in.
 
-                    break
+        """
+        grid = self.model.grid
+        place_ids = np.full((grid.width, grid.height), -1, dtype=np.int32)
+        road_ids = np.full((grid.width, grid.height), -1, dtype=np.int32)
 
-            if not added:
-                for r in self.map.roads:
-                    if r.poly.intersects(Point(x, y)):
-                        added = True
-                        new_agent = MapObjectAgent((x, y), "road", self.model,
-                                                    place=r)
-                        self.model.grid.place_agent(new_agent, (x, y))
+        cells = rasterize(self.map.places, place_ids, place_ids < 0)
+        rasterize(self.map.roads, road_ids, place_ids < 0)
 
-                        break
+        grid.set_terrain(self.map.places, self.map.roads, place_ids,
+                         road_ids)
 
-            if not added:
-                new_agent = MapObjectAgent((x, y), "wall", self.model)
+        self.place_ids = place_ids
+        self.road_ids = road_ids
+        self.coords = []
 
-                self.model.grid.place_agent(new_agent, (x, y))
+        for place, (xs, ys) in zip(self.map.places, cells):
+            # Like get_coords, a place has no cells on its upper bounds.
+            _, _, max_x, max_y = place.poly.bounds
+            inside = (xs < ceil(max_x)) & (ys < ceil(max_y))
+            self.coords.append(np.stack([xs[inside], ys[inside]], axis=1))
 
     def spawn_agents(self):
         """Spawn hard coded agents, good for unit testing."""
@@ -117,11 +230,12 @@ class MapGen:
         one_patient = False
 
         for c_id, place in enumerate(self.map.places):
-            p_coords = place.get_coords()
+            p_coords = self.coords[c_id]
 
             infected_coords = []
             choices = range(len(p_coords))
-            amount = place.density_to_amount(place.population_density)
+            amount = place.density_to_amount(place.population_density,
+                                             len(p_coords))
             agent_coords = self.model.random.sample(choices, amount)
 
             if (province == "" and city_id == c_id) or \
@@ -137,8 +251,11 @@ class MapGen:
                     infected_coords = self.model.random.sample(agent_coords,
                                                                amount)
 
+            # A set, so looking up each agent does not scan the sample.
+            infected_coords = set(infected_coords)
+
             for i in agent_coords:
-                pos = p_coords[int(i)]
+                pos = tuple(p_coords[int(i)].tolist())
                 properties = {}
                 properties["place"] = self.get_place(pos)
 
@@ -163,10 +280,16 @@ class MapGen:
                 self.model.schedule.add(new_agent)
 
     def get_place(self, pos):
-        """Return place of current position."""
-        for place in self.map.places + self.map.roads:
-            if place.poly.intersects(Point(pos)):
-                return place
+        """Return place of current position, or else its road."""
+        place_id = self.place_ids.item(pos[0], pos[1])
+
+        if place_id >= 0:
+            return self.map.places[place_id]
+
+        road_id = self.road_ids.item(pos[0], pos[1])
+
+        if road_id >= 0:
+            return self.map.roads[road_id]
 
         return False
 
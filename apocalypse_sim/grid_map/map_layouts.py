@@ -3,11 +3,36 @@
 Hold the layout and situations, here you should make situations.
 """
 from .map_object import Place, Road
-import pygeoj
+from .geodata import Provinces
+from itertools import groupby
+from operator import itemgetter
 import numpy as np
-import pandas as pd
 import os
 
+# Size of the grid the roads of the Netherlands map are given for.
+NETHERLANDS_GRID = 200
+
+# Roads between the provinces and islands of the Netherlands, on a grid of
+# NETHERLANDS_GRID by NETHERLANDS_GRID.
+NETHERLANDS_ROADS = [
+    [(88, 156), (87, 157), (104, 168), (104, 166)],
+    [(101, 139), (99, 138), (110, 129), (111, 129)],
+    [(25, 42), (26, 42), (26, 45), (24, 45)],
+    [(28, 74), (26, 74), (25, 72), (26, 71)],
+    [(71, 157), (72, 157), (72, 160), (71, 160)],
+    [(79, 176), (80, 175), (79, 173), (78, 174)],
+    [(88, 183), (90, 182), (94, 187), (94, 188)],
+    [(112, 192), (113, 191), (117, 192), (117, 193)],
+    [(133, 194), (134, 193), (144, 195), (144, 196)],
+]
+
+# Smallest area of an island of the Netherlands map that is kept, in cells of
+# a grid of NETHERLANDS_GRID by NETHERLANDS_GRID.
+NETHERLANDS_MIN_AREA = 10
+
+# Largest distance, in cells, an outline moves when it is simplified.
+SIMPLIFY_TOLERANCE = 0.25
+
 
 class Map:
     """Map object.
@@ -95,12 +120,16 @@ class Map:
     def nethelands_map(self):
         """Map of holland.
 
-        Gets the polygons for each province out of a geojson file and the
-        densities of each province out of csv file. They are coupled with the
-        'statnaam'.
+        Gets the polygons and densities of each province out of the bundle
+        made from a geojson and a csv file, see geodata.py. They are coupled
+        with the 'statnaam'.
 
-        Polygons are in longitude latitude, this is converted to the range
-        200, 200. It therefore needs to be called for a grid of 200 by 200.
+        Polygons are in longitude latitude, this is converted to the width and
+        height of the grid, so the map can be made for a grid of any size.
+        The outlines are then simplified, as details smaller than a cell are
+        not seen on the grid. The roads between the provinces and the smallest
+        area of an island that is kept are given for a grid of 200 by 200 and
+        scaled with the grid.
 
         The densities are person per km and needs to fit on the grid, therefore
         we stretch it between 0.1 and 1. So relative the densities represent
@@ -111,61 +140,34 @@ class Map:
 
         """
         cities = []
+        provinces = Provinces()
 
-        poly_data = pygeoj.load(
-            filepath="grid_map/data/provincie_2020.geojson")
-        df = pd.read_csv("grid_map/data/provinces_densities.csv")
+        min_dens = min(provinces.densities.values())
+        max_dens = max(provinces.densities.values())
 
-        min_dens = df["density_of_total"].min()
-        max_dens = df["density_of_total"].max()
+        scale_x = self.model.width / NETHERLANDS_GRID
+        scale_y = self.model.height / NETHERLANDS_GRID
+        min_area = NETHERLANDS_MIN_AREA * scale_x * scale_y
 
-        for feature in poly_data:
+        for statnaam, rings in groupby(provinces.rings, itemgetter(0)):
             color = "".join(["{0:02X}".format(x) for x in
                              np.random.choice(range(256), size=3)])
             color = "#" + color
-            statnaam = feature.properties["statnaam"]
+            dens = self.stretch_density(provinces.densities[statnaam],
+                                        min_dens, max_dens)
+            dens *= self.model.density
 
-            if feature.geometry.type == "Polygon":
-                for polygon in feature.geometry.coordinates:
-                    vert = self.stretch_to_grid(polygon, poly_data)
-                    dens = df[df["statnaam"] ==
-                              statnaam]["density_of_total"].values[0]
-                    dens = self.stretch_density(
-                        dens, min_dens, max_dens) * self.model.density
-                    province = Place(vert, dens, name=statnaam, color=color)
+            for _, polygon, in_multi in rings:
+                vert = self.stretch_to_grid(polygon, provinces)
+                province = Place(vert, dens, name=statnaam, color=color)
+                province.simplify(SIMPLIFY_TOLERANCE)
 
+                # Small islands are left out.
+                if not in_multi or province.poly.area > min_area:
                     cities.append(province)
 
-            elif feature.geometry.type == "MultiPolygon":
-                for m_poly in feature.geometry.coordinates:
-                    for polygon in m_poly:
-                        vert = self.stretch_to_grid(polygon, poly_data)
-                        dens = df[df["statnaam"] ==
-                                  statnaam]["density_of_total"].values[0]
-                        dens = self.stretch_density(
-                            dens, min_dens, max_dens) * self.model.density
-                        province = Place(
-                            vert, dens, name=statnaam, color=color)
-
-                        if province.poly.area > 10:
-                            cities.append(province)
-
-        road1 = Place([[88, 156], [87, 157], [104, 168], [104, 166]], 0)
-        road2 = Place([[101, 139], [99, 138], [110, 129], [111, 129]], 0)
-        road3 = Place([[25, 42], [26, 42], [26, 45], [24, 45]], 0)
-        road4 = Place([[28, 74], [26, 74], [25, 72], [26, 71]], 0)
-
-        road5 = Place([[71, 157], [72, 157], [72, 160], [71, 160]], 0)
-        road6 = Place([[79, 176], [80, 175], [79, 173], [78, 174]], 0)
-
-        road7 = Place([[88, 183], [90, 182], [94, 187], [94, 188]], 0)
-
-        road8 = Place([[112, 192], [113, 191], [117, 192], [117, 193]], 0)
-
-        road9 = Place([[133, 194], [134, 193], [144, 195], [144, 196]], 0)
-
-        roades = [road1, road2, road3, road4, road5, road6, road7, road8,
-                  road9]
+        roades = [Place([(x * scale_x, y * scale_y) for x, y in road], 0)
+                  for road in NETHERLANDS_ROADS]
 
         return cities, roades, []
 
@@ -176,17 +178,14 @@ class Map:
     def stretch_to_grid(self, polygon, data):
         """Fit polygon to grid.
 
-        Stretch the given polygon data to a grid of 200 by 200. Given all
-        polygons.
+        Stretch the given polygon, an array of longitudes and latitudes, to
+        the width and height of the grid. Given all polygons.
         """
         min_x, min_y, max_x, max_y = data.bbox
 
-        xs = [x[0] for x in polygon]
-        ys = [x[1] for x in polygon]
-
-        xs = [(x - min_x)/(max_x - min_x) * (200) for x in xs]
-        ys = [(y - min_y)/(max_y - min_y) * (200) for y in ys]
-        vert = list(zip(xs, ys))
+        xs = (polygon[:, 0] - min_x)/(max_x - min_x) * self.model.width
+        ys = (polygon[:, 1] - min_y)/(max_y - min_y) * self.model.height
+        vert = np.stack([xs, ys], axis=1)
 
         return vert
 
@@ -5,30 +5,12 @@ to these places which can then change the agents attributes.
 """
 from matplotlib.path import Path
 from copy import deepcopy
-from mesa import Agent as MesaAgent
 from math import floor, ceil
 
-from shapely.geometry import Polygon, Point
+from shapely.geometry import Polygon
 
-
-class MapObjectAgent(MesaAgent):
-    """Hold all immovable agents as a Mesa Agent."""
-
-    def __init__(self, pos, agent_type, model, place=None, color=""):
-        """MapObjectAgent.
-
-        Args:
-            pos (tuple): Spawn location agent.
-            agent_type (string): Human or zombie.
-            model (:obj:): Model object holds all needed information.
-            color (string): Display color agent.
-
-        """
-        super().__init__(pos, model)
-
-        self.agent_type = agent_type
-        self.color = color
-        self.place = place
+import numpy as np
+import shapely
 
 
 class MapObject:
@@ -58,20 +40,35 @@ class MapObject:
         """
         return "None"
 
+    def simplify(self, tolerance):
+        """Simplify the polygon, keeping it valid.
+
+        Args:
+            tolerance (float): Largest distance the outline may move.
+
+        """
+        self.poly = self.poly.simplify(tolerance, preserve_topology=True)
+
     def get_coords(self):
         """Return all coordinates in the polygon.
 
+        The coordinates within the bounds are tested at once, on the prepared
+        polygon.
+
         Returns:
-            (list): List of all coordinated in polygon.
+            (list): List of all coordinated in polygon, row by row.
 
         """
         min_x, min_y, max_x, max_y = self.poly.bounds
 
-        xs = [x for x in range(floor(min_x), ceil(max_x))]
-        ys = [y for y in range(floor(min_y), ceil(max_y))]
+        xs, ys = np.meshgrid(np.arange(floor(min_x), ceil(max_x)),
+                             np.arange(floor(min_y), ceil(max_y)))
+        xs = xs.ravel()
+        ys = ys.ravel()
+        shapely.prepare(self.poly)
+        inside = shapely.intersects_xy(self.poly, xs, ys)
 
-        return [(x, y) for y in ys for x in xs
-                if self.poly.intersects(Point(x, y))]
+        return list(zip(xs[inside].tolist(), ys[inside].tolist()))
 
 
 class Place(MapObject):
@@ -101,14 +98,22 @@ class Place(MapObject):
         """
         return "Place"
 
-    def density_to_amount(self, density):
+    def density_to_amount(self, density, area=None):
         """Convert the density to a value given the place area.
 
+        Args:
+            density (float): Percentage of the place that has agents.
+            area (int): Number of cells of the place, counted with get_coords
+                        if not given.
+
         Returns:
             (int): Density converted to an actual amount of agents.
 
         """
-        return ceil(len(self.get_coords()) * density)
+        if area is None:
+            area = len(self.get_coords())
+
+        return ceil(area * density)
 
 
 class Road(MapObject):
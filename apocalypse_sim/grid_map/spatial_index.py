@@ -0,0 +1,100 @@
+"""spatial_index.py.
+
+Bucket grids which index the agents of one kind by position, so agents can
+find the humans or zombies around them without scanning every cell in range.
+"""
+
+# Kinds of agents, each kind has its own index. They are bits so multiple
+# kinds can be asked for at once.
+SUSCEPTIBLE = 1
+INFECTED = 2
+ZOMBIES = 4
+HUMANS = SUSCEPTIBLE | INFECTED
+ALL_KINDS = HUMANS | ZOMBIES
+
+KINDS = (SUSCEPTIBLE, INFECTED, ZOMBIES)
+
+
+class BucketIndex:
+    """Index of agents, which puts the agents in square buckets of cells.
+
+    Attributes:
+        bucket_size (int): Width and height of a bucket in cells.
+        buckets (list): For each bucket column a list with for each bucket
+                        row the list of agents in that bucket.
+
+    """
+
+    def __init__(self, width, height, bucket_size=8):
+        """Initialize an empty index.
+
+        Args:
+            width (int): Grid width.
+            height (int): Grid height.
+            bucket_size (int): Width and height of a bucket in cells.
+
+        """
+        self.bucket_size = bucket_size
+        self.buckets = [[[] for _ in range(height // bucket_size + 1)]
+                        for _ in range(width // bucket_size + 1)]
+
+    def insert(self, agent, pos):
+        """Add an agent at a position to the index."""
+        size = self.bucket_size
+        self.buckets[pos[0] // size][pos[1] // size].append(agent)
+
+    def remove(self, agent, pos):
+        """Remove an agent, that was added at a position, from the index."""
+        size = self.bucket_size
+        self.buckets[pos[0] // size][pos[1] // size].remove(agent)
+
+    def agents(self):
+        """Get all agents in the index."""
+        return [agent for column in self.buckets for bucket in column
+                for agent in bucket]
+
+    def candidates(self, pos, radius):
+        """Get the agents in the buckets overlapping a square window.
+
+        Args:
+            pos (tuple): Center of the window.
+            radius (int): Distance from the center to the edges of the window.
+
+        Returns:
+            (list): All agents in the buckets overlapping the window, this
+                    contains agents outside of the window as well.
+
+        """
+        size = self.bucket_size
+        x, y = pos
+        min_bx = max(x - radius, 0) // size
+        min_by = max(y - radius, 0) // size
+        max_bx = min((x + radius) // size, len(self.buckets) - 1)
+        max_by = min((y + radius) // size, len(self.buckets[0]) - 1)
+
+        found = []
+
+        for column in self.buckets[min_bx:max_bx + 1]:
+            for bucket in column[min_by:max_by + 1]:
+                found.extend(bucket)
+
+        return found
+
+    def query(self, pos, radius, include_center=True):
+        """Get the agents within a Chebyshev distance of a position.
+
+        Args:
+            pos (tuple): Position to look around.
+            radius (int): Range in which agents are found.
+            include_center (bool): Include agents on pos itself if true.
+
+        Returns:
+            (list): The agents in range, in no particular order.
+
+        """
+        x, y = pos
+
+        return [agent for agent in self.candidates(pos, radius)
+                if abs(agent.pos[0] - x) <= radius and
+                abs(agent.pos[1] - y) <= radius and
+                (include_center or agent.pos != pos)]
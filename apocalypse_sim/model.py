@@ -4,15 +4,24 @@ Creates the model which we use to simulate a zombie outbreak.
 """
 from mesa import Model, Agent
 from mesa.time import RandomActivation
-from mesa.space import MultiGrid
 from mesa.datacollection import DataCollector
 from matplotlib.path import Path
 from agents.human_agent import HumanAgent
 from agents.zombie_agent import ZombieAgent
-from grid_map.map_object import MapObjectAgent
 from grid_map.map_gen import MapGen
+from grid_map.grid import OccupancyGrid
 from automaton.automaton import Automaton
+from automaton.chasing import NearestHumans
+from agents.store import AgentStore
+from collector import ColumnCollector
+from array_engine import ArrayEngine
+from tiled_engine import TiledEngine
+from scheduler import LazyActivation
+from termination import Termination
+from snapshot import take_snapshot, restore_snapshot
+from grid_map.spatial_index import SUSCEPTIBLE, INFECTED, ZOMBIES
 
+import numpy as np
 import random
 import sys
 
@@ -27,7 +36,14 @@ class Apocalypse(Model):
     def __init__(self, height=50, width=50, density=0.1, infected_chance=0.05,
                  map_id=5, city_id=0, province="", human_kill_agent_chance=0.6,
                  patient_zero=False, door_width=5, seed=None,
-                 incubation_time=3, server=None, grouping=True, iteration=-1):
+                 incubation_time=3, server=None, grouping=True, iteration=-1,
+                 herding="sequential", escaping="sequential",
+                 chasing="sequential", collect="auto", collect_every=1,
+                 collect_on_change=False, collect_path=None,
+                 engine="agents", tiles=4, activation="random",
+                 park_after=3, max_steps=None, stalemate_steps=None,
+                 stop_unreachable=False, time_budget=None, base_map=None,
+                 map_cache=None):
         """Initializes the apocalypse object, makes the grid and puts agents on
         that grid.
 
@@ -52,6 +68,63 @@ class Apocalypse(Model):
                                    human to turn into a zombie.
             server (:obj:): Server instance, used to pause the server.
             grouping (bool): Allow humans to form groups.
+            herding (string): "sequential" to compute the direction of a
+                              herding human when it moves, "batched" to
+                              compute the directions of all humans at once,
+                              once per step.
+            escaping (string): "sequential" to compute the escape of a human
+                               from zombies when it moves, "batched" to
+                               compute the escapes of all humans that see a
+                               zombie at once, once per step.
+            chasing (string): "sequential" to search the nearest humans of a
+                              zombie when it moves, "batched" to search the
+                              nearest humans of all zombies at once, once per
+                              step.
+            collect (string): Data to collect every step. "off" for no data,
+                              "counters" for the number of susceptible,
+                              infected and recovered agents, "agents" for the
+                              counters and the positions of all agents.
+                              "auto" collects agents when running with a
+                              server and counters otherwise.
+            collect_every (int): Only collect the counters every k-th step.
+            collect_on_change (bool): Only collect the counters when one of
+                                      them changed.
+            collect_path (string): Directory to stream the collected counters
+                                   to, which may not hold chunks of another
+                                   run yet, None to only keep the latest
+                                   ones.
+            engine (string): "agents" to step every agent object in random
+                             order, "arrays" to step all humans and zombies
+                             at once as NumPy arrays, see array_engine.py,
+                             "tiled" to step them as arrays in tiles of
+                             columns, each in its own process, see
+                             tiled_engine.py.
+            tiles (int): Number of tiles of the tiled engine. Runs with the
+                         same seed and number of tiles are the same.
+            activation (string): "random" to step every agent in random
+                                 order, "lazy" to park humans far away from
+                                 any zombie, see scheduler.py. Both give the
+                                 same runs.
+            park_after (int): Number of steps a human has to be far away
+                              from any zombie before lazy activation parks
+                              it.
+            max_steps (int): Stop after this many steps, None for no limit.
+            stalemate_steps (int): Stop when the number of susceptible,
+                                   infected and recovered agents did not
+                                   change for this many steps, None for no
+                                   limit.
+            stop_unreachable (bool): Stop when no zombie or infected human
+                                     can reach a susceptible human through
+                                     the open cells of the map.
+            time_budget (float): Stop after this many seconds, None for no
+                                 limit.
+            base_map (:obj:): The map of another model with the same mode,
+                              map_id, width, height, density and door_width,
+                              which is reused instead of made again, see
+                              ensemble.py.
+            map_cache (string): Directory of an on disk cache of compiled
+                                maps, see grid_map/map_cache.py. None to
+                                make the map every time.
 
         """
 
@@ -69,49 +142,183 @@ class Apocalypse(Model):
         self.patient_zero = patient_zero
         self.human_kill_zombie_chance = human_kill_agent_chance
         self.grouping = grouping
+        self.herding = herding
+        self.escaping = escaping
+        self.chasing = chasing
+        self.nearest_humans = NearestHumans()
         self.door = [(-1, -1)]
         self.door_coords = []
         self.door_width = door_width
         self.incubation_time = incubation_time
         self.fsm = Automaton(self)
 
+        # Keeps the fields of all agents in columns.
+        self.store = AgentStore()
+
         # Set agents step function in a schedule to be called in random order.
-        self.schedule = RandomActivation(self)
+        if activation == "lazy":
+            self.schedule = LazyActivation(self, park_after)
+        elif activation == "random":
+            self.schedule = RandomActivation(self)
+        else:
+            raise ValueError("Unknown activation: %s" % activation)
 
-        # Makes multigrid, grid which can hold multiple agents on one cell.
-        self.grid = MultiGrid(width, height, torus=False)
+        # Makes multigrid, grid which can hold multiple agents on one cell and
+        # keeps track of what occupies each cell.
+        self.grid = OccupancyGrid(width, height, torus=False)
 
         # Collects data each step and plots it in server.py.
-        self.datacollector = DataCollector(
-            {"infected": "infected",
-             "susceptible": "susceptible",
-             "recovered": "recovered"},
-            {"x": lambda a: a.pos[0], "y": lambda a: a.pos[1]})
+        if collect == "auto":
+            collect = "agents" if server else "counters"
+
+        self.collect = collect
+        self.datacollector = self.make_datacollector(
+            collect, collect_every, collect_on_change, collect_path)
 
         # Creates agents and map layouts.
-        self.map = MapGen(map_id, city_id, infected_chance, province, self)
+        self.map = MapGen(map_id, city_id, infected_chance, province, self,
+                          base_map, map_cache)
 
         # If there is a door in the map you get the coordinates.
         if self.door[0] != (-1, -1):
             self.get_door_coords()
 
+        # The arrays engine takes over the spawned agents.
+        if engine == "arrays":
+            self.engine = ArrayEngine(self)
+        elif engine == "tiled":
+            self.engine = TiledEngine(self, tiles)
+        elif engine == "agents":
+            self.engine = None
+        else:
+            raise ValueError("Unknown engine: %s" % engine)
+
+        # Decides when the run is over, see termination.py.
+        self.termination = Termination(max_steps, stalemate_steps,
+                                       stop_unreachable, time_budget)
+        self.reason = None
         self.running = True
-        self.datacollector.collect(self)
+
+        if self.datacollector:
+            self.datacollector.collect(self)
+
+        self.check_termination()
 
     def step(self):
         """Step function.
 
         Call all agents and collect data, stop if there are no more zombies
-        or no more humans.
+        or no more humans, or another policy of termination.py ends the run.
         """
-        if ((self.susceptible == 0) or
-            (self.infected == 0 and self.carrier == 0)):
+        if not self.running:
+            return
 
+        if self.engine:
+            self.engine.step()
+        else:
+            self.schedule.step()
+
+        if self.datacollector:
+            self.datacollector.collect(self)
+
+        self.check_termination()
+
+    def check_termination(self):
+        """Stop the run if it is over, the server stops with it."""
+        self.reason = self.termination.check(self)
+
+        if self.reason:
             self.running = False
-            self.server.model.running = False
 
-        self.schedule.step()
-        self.datacollector.collect(self)
+    def run_model(self):
+        """Run the model until it is over.
+
+        Returns:
+            (string): The reason the run ended, see termination.py.
+
+        """
+        while self.running:
+            self.step()
+
+        return self.reason
+
+    def snapshot(self):
+        """Take a snapshot of the whole state of the model, see snapshot.py.
+
+        Returns:
+            (bytes): The snapshot.
+
+        """
+        return take_snapshot(self)
+
+    @classmethod
+    def restore(cls, data, collect_path=None):
+        """Make a model out of a snapshot, which continues where the model
+        the snapshot was taken of was.
+
+        Args:
+            data (bytes): A snapshot made by snapshot.
+            collect_path (string): Directory to stream the collected counters
+                                   to, which may not hold chunks of another
+                                   run yet, None to only keep the latest
+                                   ones.
+
+        Returns:
+            (:obj:): The restored model.
+
+        """
+        return restore_snapshot(cls, data, collect_path)
+
+    def outbreak_positions(self):
+        """Get the positions of the two sides of the outbreak.
+
+        Returns:
+            (tuple): Arrays of shape (n, 2) with the positions of the
+                     susceptible humans, and of the zombies and infected
+                     humans.
+
+        """
+        if self.engine:
+            return self.engine.outbreak_positions()
+
+        return (self.store.positions(self.store.slots(SUSCEPTIBLE)),
+                self.store.positions(self.store.slots(ZOMBIES | INFECTED)))
+
+    @staticmethod
+    def make_datacollector(collect, every=1, on_change=False, path=None):
+        """Make the data collector for a collection policy.
+
+        Counters are collected in the NumPy columns of a ColumnCollector,
+        agents in a DataCollector of mesa.
+
+        Args:
+            collect (string): "off", "counters" or "agents", see __init__.
+            every (int): Only collect counters every k-th step.
+            on_change (bool): Only collect counters when one changed.
+            path (string): Directory to stream the counters to.
+
+        Returns:
+            (:obj:): The data collector, None if nothing is collected.
+
+        """
+        if collect == "off":
+            return None
+
+        model_reporters = {"infected": "infected",
+                           "susceptible": "susceptible",
+                           "recovered": "recovered"}
+
+        if collect == "counters":
+            return ColumnCollector(model_reporters, every=every,
+                                   on_change=on_change, path=path,
+                                   dtype=np.int64)
+
+        if collect == "agents":
+            return DataCollector(
+                model_reporters,
+                {"x": lambda a: a.pos[0], "y": lambda a: a.pos[1]})
+
+        raise ValueError("Unknown collection policy: %s" % collect)
 
     def get_door_coords(self):
         """Door range to coordinates.
@@ -26,18 +26,32 @@ def model_draw(agent):
         portrayal = zombie_portrayal(agent, portrayal)
     elif agent.agent_type == "human":
         portrayal = human_portrayal(agent, portrayal)
-    elif agent.agent_type == "city":
-        portrayal = city_portrayal(agent, portrayal)
-    elif agent.agent_type == "road":
-        portrayal = road_portrayal(agent, portrayal)
-    else:
-        portrayal = {"Shape": "rect", "w": 1, "h": 1, "Filled": "true",
-                     "Layer": 1, "Text": "pos:" + str(agent.pos)}
-        portrayal["Color"] = ["#000000"]
 
     return portrayal
 
 
+def terrain_draw(grid, pos):
+    """Portrayal Method for the terrain of a cell on the canvas.
+
+    Reads the terrain rasters of the grid and draws the cell as part of a
+    city, a road or a wall.
+    """
+    portrayal = {"Shape": "rect", "w": 1, "h": 1, "Filled": "true",
+                 "Layer": 0}
+
+    place = grid.place_at(pos)
+
+    if place is not None:
+        return city_portrayal(place, portrayal)
+
+    road = grid.road_at(pos)
+
+    if road is not None:
+        return road_portrayal(road, portrayal)
+
+    return wall_portrayal(pos, portrayal)
+
+
 def zombie_portrayal(agent, portrayal):
     """Portrayal zombie agent."""
     agent_properties = {}
@@ -79,22 +93,27 @@ def human_portrayal(agent, portrayal):
     return {**portrayal, **agent_properties}
 
 
-def road_portrayal(agent, portrayal):
-    """Portrayal road agent."""
-    portrayal = {"Shape": "rect", "w": 1, "h": 1, "Filled": "true", "Layer": 0}
+def road_portrayal(road, portrayal):
+    """Portrayal road cell."""
     portrayal["Color"] = ["#f5e3427A"]
 
     return portrayal
 
 
-def city_portrayal(agent, portrayal):
-    """Portrayal city agent."""
-    portrayal = {"Shape": "rect", "w": 1,
-                 "h": 1, "Filled": "true", "Layer": 0}
-
-    if agent.color != "":
-        portrayal["Color"] = agent.color + "40"
+def city_portrayal(place, portrayal):
+    """Portrayal city cell."""
+    if place.color != "":
+        portrayal["Color"] = place.color + "40"
     else:
         portrayal["Color"] = ["#dd42f540"]
 
     return portrayal
+
+
+def wall_portrayal(pos, portrayal):
+    """Portrayal wall cell."""
+    portrayal["Layer"] = 1
+    portrayal["Text"] = "pos:" + str(pos)
+    portrayal["Color"] = ["#000000"]
+
+    return portrayal
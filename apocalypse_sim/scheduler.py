@@ -0,0 +1,117 @@
+"""scheduler.py.
+
+Activation of the agents which skips the automaton for humans that wander
+far away from any zombie. Such a human can only stay in HumanWandering, so
+it is parked: it takes its random step without the transitions of its
+states being tried. As soon as the outbreak comes within range it is
+promoted back to the full automaton.
+"""
+from mesa.time import RandomActivation
+from automaton.herding import window_sums
+from automaton.state import state_flag
+from grid_map.spatial_index import SUSCEPTIBLE, INFECTED, ZOMBIES
+
+import numpy as np
+import os
+
+# The states of a human that wanders and is not infected.
+WANDERING = state_flag("HumanWandering") | state_flag("Susceptible")
+
+
+class LazyActivation(RandomActivation):
+    """RandomActivation which parks humans far from any zombie.
+
+    A human is parked in a step if it is only wandering, and no zombie or
+    infected human (and with grouping no other human) was within its vision
+    plus one cell at the start of the step, for more than park_after steps
+    in a row. Every agent moves at most one cell before the parked human
+    takes its step, so none of its transitions could have happened, and the
+    run is the same as with RandomActivation.
+
+    Attributes:
+        park_after (int): Number of steps a human has to be clear before it
+                          is parked.
+        calm (:obj:): For every slot of the agent store, the number of steps
+                      in a row the agent was clear.
+        parked_steps (int): Number of agent steps taken while parked, which
+                            skipped the automaton.
+        total_steps (int): Number of agent steps taken.
+
+    """
+
+    def __init__(self, model, park_after=3):
+        """Create an empty schedule.
+
+        Args:
+            model (:obj:): The model of the agents.
+            park_after (int): Number of steps a human has to be clear before
+                              it is parked.
+
+        """
+        super().__init__(model)
+
+        self.park_after = park_after
+        self.calm = np.zeros(0, dtype=np.int32)
+        self.parked_steps = 0
+        self.total_steps = 0
+
+    def parked(self):
+        """Find the agents that are parked in this step.
+
+        Returns:
+            (list): For every slot of the agent store, True if the agent is
+                    parked.
+
+        """
+        store = self.model.store
+        grid = self.model.grid
+
+        if len(self.calm) < store.size:
+            calm = np.zeros(len(store.x), dtype=np.int32)
+            calm[:len(self.calm)] = self.calm
+            self.calm = calm
+
+        parked = np.zeros(store.size, dtype=bool)
+
+        # Roads move agents more than one cell, so nothing is parked.
+        if os.environ["mode"] == "5":
+            return parked.tolist()
+
+        humans = store.slots(SUSCEPTIBLE)
+        xs = store.x[humans]
+        ys = store.y[humans]
+        radius = store.vision[humans] + 1
+
+        threats = store.slots(ZOMBIES | INFECTED)
+        count = np.zeros((grid.width, grid.height), dtype=np.int64)
+        np.add.at(count, (store.x[threats], store.y[threats]), 1)
+        clear = window_sums(count, xs, ys, radius) == 0
+        clear &= store.state_flags[humans] == WANDERING
+
+        if self.model.grouping:
+            count[:] = 0
+            np.add.at(count, (xs, ys), 1)
+            clear &= window_sums(count, xs, ys, radius) == count[xs, ys]
+
+        calm = np.where(clear, self.calm[humans] + 1, 0)
+        self.calm[:store.size] = 0
+        self.calm[humans] = calm
+        parked[humans] = calm > self.park_after
+
+        return parked.tolist()
+
+    def step(self):
+        """Execute the step of all agents in random order, parked or not."""
+        parked = self.parked()
+
+        for agent in self.agent_buffer(shuffled=True):
+            if parked[agent.slot]:
+                agent.parked_step()
+                self.parked_steps += 1
+            else:
+                agent.step()
+
+            self.total_steps += 1
+
+        self.steps += 1
+        self.time += 1
@@ -11,11 +11,12 @@ from mesa.visualization.ModularVisualization import ModularServer
 from mesa.visualization.modules import CanvasGrid, ChartModule, TextElement
 from mesa.visualization.UserParam import UserSettableParameter
 from gui_styling.CSSImportModule import CSSImportModule
-from model_representation.portrayals import model_draw
+from model_representation.portrayals import model_draw, terrain_draw
 from model_representation.mode import get_mode
 
 import os
 import webbrowser
+from collections import defaultdict
 import tornado.ioloop
 import numpy as np
 
@@ -62,9 +63,46 @@ class ModularServerExtd(ModularServer):
         tornado.ioloop.IOLoop.current().start()
 
 
+class CanvasGridExtd(CanvasGrid):
+    """Used instead of CanvasGrid.
+
+    The walls, cities and roads of the map are not agents in the grid, but
+    rasters of the grid. This canvas draws them from those rasters underneath
+    the agents.
+
+    """
+
+    def __init__(self, portrayal_method, terrain_method, grid_width,
+                 grid_height, canvas_width=500, canvas_height=500):
+        """Initialize the canvas."""
+        super().__init__(portrayal_method, grid_width, grid_height,
+                         canvas_width, canvas_height)
+
+        self.terrain_method = terrain_method
+
+    def render(self, model):
+        """Draw the terrain and the agents of every cell."""
+        grid_state = defaultdict(list)
+
+        for x in range(model.grid.width):
+            for y in range(model.grid.height):
+                portrayals = [self.terrain_method(model.grid, (x, y))]
+
+                for obj in model.grid.get_cell_list_contents([(x, y)]):
+                    portrayals.append(self.portrayal_method(obj))
+
+                for portrayal in portrayals:
+                    if portrayal:
+                        portrayal["x"] = x
+                        portrayal["y"] = y
+                        grid_state[portrayal["Layer"]].append(portrayal)
+
+        return grid_state
+
+
 model_params, canvas_height, canvas_width, grid_height, grid_width = get_mode()
-canvas_element = CanvasGrid(model_draw, grid_width,
-                            grid_height, canvas_width, canvas_height)
+canvas_element = CanvasGridExtd(model_draw, terrain_draw, grid_width,
+                                grid_height, canvas_width, canvas_height)
 
 chart = ChartModule([{"Label": "susceptible",
                       "Color": "Green"},
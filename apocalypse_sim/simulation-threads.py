@@ -1,4 +1,5 @@
-from model import Apocalypse
+from ensemble import run_ensemble
+from termination import winner
 import numpy as np
 import random
 import sys
@@ -7,7 +8,6 @@ import subprocess
 import time
 import multiprocessing as mp
 import csv
-from p_tqdm import p_umap
 
 def read_last_line(filename):
     return subprocess.check_output(['tail', '-1', filename])[0:-1].decode('utf-8')
@@ -56,7 +56,12 @@ def get_model_params():
         "incubation_time": None,
         "map_id": 0,
         "human_kill_agent_chance": 0.35,
-        "grouping": False
+        "grouping": False,
+        # Runs that reach the limit, or where the zombies and humans are
+        # walled off from each other, have no winner, see the reason column.
+        # No stalemate limit, as quiet zombies may still find a human.
+        "max_steps": 1000,
+        "stop_unreachable": True
     }
 
 densities = np.arange(density_start, density_end, density_stepsize)
@@ -65,25 +70,20 @@ simulations = np.arange(simulation_start, simulation_end, simulation_stepsize)
 
 first = True
 
-def run_simulation(params):
-    model = Apocalypse(**params)
+def run_cell(replicates):
+    """Run the experiments of one density and incubation time, which share
+    their map."""
+    params = dict(replicates[0])
+    del params['seed'], params['iteration']
+    outcomes = run_ensemble(params, [model['seed'] for model in replicates])
 
-    while True:
-        model.step()
+    # Runs that were stopped have no winner, only a reason.
+    for model, (reason, steps) in zip(replicates, outcomes):
+        model['winner'] = winner(reason)
+        model['steps'] = steps
+        model['reason'] = reason
 
-        # Zombies win
-        if model.susceptible == 0:
-            params['winner'] = 'zombies'
-            params['steps'] = model.schedule.steps
-
-            return params
-
-        # Humans win
-        elif model.infected == 0 and model.carrier == 0:
-            params['winner'] = 'human'
-            params['steps'] = model.schedule.steps
-
-            return params
+    return replicates
 
 models = []
 
@@ -111,11 +111,19 @@ with open('models.csv', 'w', newline="") as csv_file:
     for model in models:
        writer.writerow(model.values())
 
-results = p_umap(run_simulation, models)
+cells = {}
+
+for model in models:
+    cells.setdefault((model["density"], model["incubation_time"]),
+                     []).append(model)
+
+results = [result for replicates in cells.values()
+           for result in run_cell(replicates)]
 print("time for writing the results")
 with open('out.csv', "a") as file:
     for result in results:
-        file.write('{:.2f},{:d},{:d},{:},{:},{:d}, {:d}\n'.format(
+        file.write('{:.2f},{:d},{:d},{:},{:},{:d}, {:d},{:}\n'.format(
             result["density"], int(result["incubation_time"]), int(result["iteration"]),
-            result["seed"], result["winner"], result["steps"], int(result["grouping"])
+            result["seed"], result["winner"], result["steps"],
+            int(result["grouping"]), result["reason"]
         ))
@@ -0,0 +1,353 @@
+"""snapshot.py.
+
+Snapshots of the whole state of a model, so many variants of a scenario can
+be branched from one warmed up outbreak without simulating it again. A
+snapshot is a compressed pickle of plain values and NumPy arrays: the columns
+of the agent store, the states and order of the agents, the occupancy and
+terrain rasters of the grid, the counters and the state of the random number
+generators. A model restored from a snapshot continues exactly like the model
+the snapshot was taken of.
+
+Caches that only live within a step, like the batches of the states and the
+decisions of the agents, are not part of a snapshot. The collected data is not
+either, a restored model collects from the step it was restored at, to a new
+directory if the counters are streamed to disk. Snapshots are pickles, so only
+restore snapshots you made yourself.
+"""
+from agents.human_agent import HumanAgent
+from agents.zombie_agent import ZombieAgent
+from agents.store import AgentStore
+from array_engine import ArrayEngine, HUMAN_FIELDS, ZOMBIE_FIELDS, COUNTERS
+from automaton.automaton import Automaton
+from automaton.chasing import NearestHumans
+from collector import ColumnCollector
+from grid_map.grid import OccupancyGrid
+from grid_map.spatial_index import KINDS
+from mesa.time import RandomActivation
+from scheduler import LazyActivation
+from termination import Termination
+
+import numpy as np
+import os
+import pickle
+import time
+import zlib
+
+MAGIC = b"APOCSNAP"
+VERSION = 1
+
+# Attributes of the model which are plain values.
+MODEL_FIELDS = ("_seed", "height", "width", "density", "infected_chance",
+                "carrier", "infected", "susceptible", "recovered", "total",
+                "patient_zero", "human_kill_zombie_chance", "grouping",
+                "herding", "escaping", "chasing", "door", "door_coords",
+                "door_width", "incubation_time", "collect", "running",
+                "reason")
+
+# Attributes of the termination policy which are plain values.
+TERMINATION_FIELDS = ("max_steps", "stalemate_steps", "unreachable",
+                      "time_budget", "counters", "unchanged")
+
+
+def take_snapshot(model):
+    """Take a snapshot of a model between two steps.
+
+    Args:
+        model (:obj:): The model.
+
+    Returns:
+        (bytes): The snapshot.
+
+    Raises:
+        ValueError: If the model runs on the tiled engine, whose state lives
+                    in its worker processes.
+
+    """
+    if model.engine is not None and not isinstance(model.engine, ArrayEngine):
+        raise ValueError("Only models on the agents or arrays engine can be "
+                         "snapshotted")
+
+    state = {
+        "mode": os.environ["mode"],
+        "model": {name: getattr(model, name) for name in MODEL_FIELDS},
+        "random": model.random.getstate(),
+        "store": store_state(model.store, model.fsm),
+        "grid": grid_state(model.grid),
+        "schedule": schedule_state(model.schedule),
+        "termination": termination_state(model.termination),
+        "collector": collector_state(model.datacollector),
+        "engine": engine_state(model.engine),
+    }
+
+    return MAGIC + VERSION.to_bytes(2, "little") + zlib.compress(
+        pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), 1)
+
+
+def restore_snapshot(model_cls, data, collect_path=None):
+    """Make a model out of a snapshot.
+
+    Args:
+        model_cls (type): Class of the model, Apocalypse.
+        data (bytes): The snapshot.
+        collect_path (string): Directory to stream the collected counters
+                               to, None to only keep the latest ones.
+
+    Returns:
+        (:obj:): The restored model, without a server.
+
+    Raises:
+        ValueError: If the data is no snapshot of this version, or the
+                    snapshot was taken in another mode.
+
+    """
+    if data[:len(MAGIC)] != MAGIC or \
+            int.from_bytes(data[len(MAGIC):len(MAGIC) + 2], "little") != \
+            VERSION:
+        raise ValueError("Not a snapshot of version %d" % VERSION)
+
+    state = pickle.loads(zlib.decompress(data[len(MAGIC) + 2:]))
+
+    if state["mode"] != os.environ["mode"]:
+        raise ValueError("Snapshot of mode %s restored in mode %s"
+                         % (state["mode"], os.environ["mode"]))
+
+    model = model_cls.__new__(model_cls)
+
+    for name, value in state["model"].items():
+        setattr(model, name, value)
+
+    model.random.setstate(state["random"])
+    model.server = None
+    model.map = None
+    model.fsm = Automaton(model)
+    model.nearest_humans = NearestHumans()
+    model.store = restore_store(model, state["store"])
+    model.grid = restore_grid(model, state["grid"])
+    model.schedule = restore_schedule(model, state["schedule"])
+    model.termination = restore_termination(state["termination"])
+    model.datacollector = model.make_datacollector(*state["collector"],
+                                                   path=collect_path)
+    model.engine = restore_engine(model, state["engine"])
+
+    if model.datacollector:
+        model.datacollector.collect(model)
+
+    return model
+
+
+def store_state(store, fsm):
+    """Get the state of the agent store and of the agents in its slots."""
+    agents = store.agents
+    index = {state.name: i for i, state in enumerate(fsm.order)}
+    slot = {agent: i for i, agent in enumerate(agents)}
+
+    return {
+        "columns": {name: column[:store.size].copy()
+                    for name, column in store.columns.items()},
+        "unique_ids": np.array([agent.unique_id for agent in agents],
+                               dtype=np.int64),
+        "zombie": np.array([agent.agent_type == "zombie" for agent in agents],
+                           dtype=bool),
+        "state_counts": np.array([len(agent.states) for agent in agents],
+                                 dtype=np.int8),
+        "states": np.array([index[state.name] for agent in agents
+                            for state in agent.states], dtype=np.int16),
+        "targets": np.array([slot[agent.target]
+                             if getattr(agent, "target", None) is not None
+                             else -1 for agent in agents], dtype=np.int64),
+        "extra": dict(store.extras),
+    }
+
+
+def restore_store(model, state):
+    """Make the agent store and the agents in its slots."""
+    columns = state["columns"]
+    size = len(columns["x"])
+    store = AgentStore(max(size, 1))
+    store.size = size
+
+    for name, column in columns.items():
+        store.columns[name][:size] = column
+
+    store.extras = state["extra"]
+    order = model.fsm.order
+    ends = np.cumsum(state["state_counts"]).tolist()
+    states = state["states"].tolist()
+    start = 0
+
+    for i, (unique_id, zombie) in enumerate(zip(
+            state["unique_ids"].tolist(), state["zombie"].tolist())):
+        agent_cls = ZombieAgent if zombie else HumanAgent
+        agent = agent_cls.__new__(agent_cls)
+        agent.unique_id = unique_id
+        agent.model = model
+        agent.store = store
+        agent.slot = i
+        agent.states = [order[index] for index in states[start:ends[i]]]
+        agent.fsm = model.fsm
+        agent.decisions = None
+        x = store.x.item(i)
+        agent.pos = (x, store.y.item(i)) if x >= 0 else None
+
+        if zombie:
+            agent.target = None
+
+        store.agents.append(agent)
+        start = ends[i]
+
+    for agent, target in zip(store.agents, state["targets"].tolist()):
+        if target >= 0:
+            agent.target = store.agents[target]
+
+    return store
+
+
+def grid_state(grid):
+    """Get the state of the grid, with the agents of each index in order."""
+    return {
+        "occupancy": grid.occupancy,
+        "place_ids": grid.place_ids,
+        "road_ids": grid.road_ids,
+        "places": grid.places,
+        "roads": grid.roads,
+        "indexes": {kind: np.array([agent.slot for agent in index.agents()],
+                                   dtype=np.int64)
+                    for kind, index in grid.indexes.items()},
+    }
+
+
+def restore_grid(model, state):
+    """Make the grid and put the agents of the store back on it."""
+    grid = OccupancyGrid(model.width, model.height, torus=False)
+    grid.occupancy = state["occupancy"]
+    grid.place_ids = state["place_ids"]
+    grid.road_ids = state["road_ids"]
+    grid.places = state["places"]
+    grid.roads = state["roads"]
+    agents = model.store.agents
+
+    # Inserting the agents in the order of the index keeps the order of the
+    # agents in every bucket, which is the order queries list them in.
+    for kind in KINDS:
+        for slot in state["indexes"][kind].tolist():
+            agent = agents[slot]
+            grid.grid[agent.pos[0]][agent.pos[1]].add(agent)
+            grid.indexes[kind].insert(agent, agent.pos)
+            grid._kinds[agent] = kind
+
+    return grid
+
+
+def schedule_state(schedule):
+    """Get the state of the schedule, with its agents in order."""
+    state = {
+        "steps": schedule.steps,
+        "time": schedule.time,
+        "slots": np.array([agent.slot for agent in schedule.agents],
+                          dtype=np.int64),
+    }
+
+    if isinstance(schedule, LazyActivation):
+        state["lazy"] = (schedule.park_after, schedule.calm.copy(),
+                         schedule.parked_steps, schedule.total_steps)
+
+    return state
+
+
+def restore_schedule(model, state):
+    """Make the schedule and add the agents in their order."""
+    if "lazy" in state:
+        park_after, calm, parked_steps, total_steps = state["lazy"]
+        schedule = LazyActivation(model, park_after)
+        schedule.calm = calm
+        schedule.parked_steps = parked_steps
+        schedule.total_steps = total_steps
+    else:
+        schedule = RandomActivation(model)
+
+    schedule.steps = state["steps"]
+    schedule.time = state["time"]
+
+    for slot in state["slots"].tolist():
+        schedule.add(model.store.agents[slot])
+
+    return schedule
+
+
+def termination_state(termination):
+    """Get the state of the termination policy, with the time spent."""
+    state = {name: getattr(termination, name) for name in TERMINATION_FIELDS}
+    state["elapsed"] = time.perf_counter() - termination.start
+
+    return state
+
+
+def restore_termination(state):
+    """Make the termination policy, which goes on with the time spent."""
+    termination = Termination(state["max_steps"], state["stalemate_steps"],
+                              state["unreachable"], state["time_budget"])
+    termination.counters = state["counters"]
+    termination.unchanged = state["unchanged"]
+    termination.start -= state["elapsed"]
+
+    return termination
+
+
+def collector_state(collector):
+    """Get the arguments to make an empty collector like a model has.
+
+    The directory the counters are streamed to is left out, it holds the
+    chunks of this model, so a restored model is given a directory of its own,
+    see Apocalypse.restore.
+
+    """
+    if collector is None:
+        return ("off",)
+
+    if isinstance(collector, ColumnCollector):
+        return ("counters", collector.every, collector.on_change)
+
+    return ("agents",)
+
+
+def engine_state(engine):
+    """Get the rows and random state of the arrays engine, if there is one."""
+    if engine is None:
+        return None
+
+    state = {name: getattr(engine, name)
+             for name in HUMAN_FIELDS + ZOMBIE_FIELDS + ("terrain",)}
+    state["rng"] = engine.rng.bit_generator.state
+    state["rounds"] = engine.rounds
+
+    return state
+
+
+def restore_engine(model, state):
+    """Make the arrays engine out of its rows, if the model had one."""
+    if state is None:
+        return None
+
+    engine = ArrayEngine.__new__(ArrayEngine)
+    engine.model = model
+    engine.rng = np.random.default_rng()
+    engine.rng.bit_generator.state = state.pop("rng")
+    engine.width = model.grid.width
+    engine.height = model.grid.height
+    engine.incubation_time = model.incubation_time
+    engine.kill_chance = model.human_kill_zombie_chance
+    engine.grouping = model.grouping
+    engine.changes = dict.fromkeys(COUNTERS, 0)
+    engine.halo_humans = 0
+    engine.halo_zombies = 0
+
+    # Snapshots from before the rounds acted on one snapshot per step. The
+    # rounds of the agents are drawn again at the start of every step.
+    engine.rounds = int(state.pop("rounds", 1))
+    engine.human_round = np.zeros(len(state["human_pos"]), dtype=np.int64)
+    engine.zombie_round = np.zeros(len(state["zombie_pos"]), dtype=np.int64)
+
+    for name, value in state.items():
+        setattr(engine, name, value)
+
+    return engine
@@ -0,0 +1,191 @@
+"""termination.py.
+
+Policies that decide when a run of the model is over, and why. Besides the
+outcomes, a run can be stopped after a number of steps, when it is stuck in
+a stalemate, or when its wall clock budget is spent. The reason a run ended
+is one of the codes below.
+"""
+from collections import deque
+from grid_map.grid import WALL
+
+import numpy as np
+import time
+
+# Reasons a run ended, the outcomes match the winner column of the data.
+ZOMBIES_WON = "zombies"
+HUMANS_WON = "human"
+MAX_STEPS = "max_steps"
+STALEMATE = "stalemate"
+UNREACHABLE = "unreachable"
+TIME_BUDGET = "time_budget"
+OUTCOMES = (ZOMBIES_WON, HUMANS_WON)
+
+MOORE_OFFSETS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1),
+                 (1, 0), (1, 1)]
+
+
+def open_areas(walls):
+    """Label the areas of open cells that agents can walk between.
+
+    Args:
+        walls (:obj:): Boolean raster of the cells with a wall.
+
+    Returns:
+        (:obj:): For every cell the number of its area, -1 for walls.
+
+    """
+    width, height = walls.shape
+    labels = np.where(walls, -1, -2)
+    label = 0
+
+    for x, y in zip(*np.nonzero(labels == -2)):
+        if labels[x, y] != -2:
+            continue
+
+        labels[x, y] = label
+        queue = deque([(x, y)])
+
+        while queue:
+            cx, cy = queue.popleft()
+
+            for dx, dy in MOORE_OFFSETS:
+                nx = cx + dx
+                ny = cy + dy
+
+                if 0 <= nx < width and 0 <= ny < height and \
+                        labels[nx, ny] == -2:
+                    labels[nx, ny] = label
+                    queue.append((nx, ny))
+
+        label += 1
+
+    return labels
+
+
+def winner(reason):
+    """Get the winner of a run out of the reason it ended.
+
+    Args:
+        reason (string): The reason the run ended.
+
+    Returns:
+        (string): zombies or human, or an empty string if the run was stopped
+                  before either of them won.
+
+    """
+    return reason if reason in OUTCOMES else ""
+
+
+class Termination:
+    """Decides after every step whether a run is over.
+
+    Attributes:
+        max_steps (int): Number of steps after which a run stops, None for
+                         no limit.
+        stalemate_steps (int): Number of steps in a row the counters may stay
+                               the same before a run stops, None for no
+                               limit.
+        unreachable (bool): Stop a run when no zombie or infected human is in
+                            the same open area as a susceptible human.
+        time_budget (float): Seconds of wall clock time a run may take, None
+                             for no limit.
+        start (float): Time the run started at.
+        counters (tuple): The counters of the model after the last check.
+        unchanged (int): Number of steps in a row the counters stayed the
+                         same.
+        areas (:obj:): Open area of every cell, made at the first check of
+                       reachability.
+
+    """
+
+    def __init__(self, max_steps=None, stalemate_steps=None,
+                 unreachable=False, time_budget=None):
+        """Start the clock of a run.
+
+        Args:
+            max_steps (int): Number of steps after which a run stops.
+            stalemate_steps (int): Number of steps in a row the counters may
+                                   stay the same.
+            unreachable (bool): Stop when the zombies cannot reach a human.
+            time_budget (float): Seconds a run may take.
+
+        """
+        self.max_steps = max_steps
+        self.stalemate_steps = stalemate_steps
+        self.unreachable = unreachable
+        self.time_budget = time_budget
+        self.start = time.perf_counter()
+        self.counters = None
+        self.unchanged = 0
+        self.areas = None
+
+    def check(self, model):
+        """Check whether a run is over.
+
+        Args:
+            model (:obj:): The model of the run.
+
+        Returns:
+            (string): The reason the run is over, None if it is not.
+
+        """
+        if model.susceptible == 0:
+            return ZOMBIES_WON
+
+        if model.infected == 0 and model.carrier == 0:
+            return HUMANS_WON
+
+        counters = (model.susceptible, model.infected, model.carrier,
+                    model.recovered)
+        self.unchanged = self.unchanged + 1 if counters == self.counters \
+            else 0
+        self.counters = counters
+
+        # Zombies that reach a human change the counters sooner or later, so
+        # only a step without changes is checked.
+        if self.unreachable and self.unchanged and not self.reachable(model):
+            return UNREACHABLE
+
+        if self.stalemate_steps is not None and \
+                self.unchanged >= self.stalemate_steps:
+            return STALEMATE
+
+        if self.max_steps is not None and \
+                model.schedule.steps >= self.max_steps:
+            return MAX_STEPS
+
+        if self.time_budget is not None and \
+                time.perf_counter() - self.start >= self.time_budget:
+            return TIME_BUDGET
+
+        return None
+
+    def reachable(self, model):
+        """Check if a zombie or infected human shares an area with a human.
+
+        Walls never change, so agents in different open areas can never meet.
+        Infected humans turn, and humans may escape through a door, without
+        meeting anyone, so a run with either is never stuck.
+
+        Args:
+            model (:obj:): The model of the run.
+
+        Returns:
+            (bool): True if some susceptible human can still be reached, or
+                    the counters can still change otherwise.
+
+        """
+        if model.carrier or model.door[0] != (-1, -1):
+            return True
+
+        if self.areas is None:
+            # Without the border of walls, so the areas are indexed by the
+            # positions of the agents.
+            inner = model.grid.occupancy[1:-1, 1:-1]
+            self.areas = open_areas(inner & WALL != 0)
+
+        humans, threats = model.outbreak_positions()
+        human_areas = self.areas[humans[:, 0], humans[:, 1]]
+        threat_areas = self.areas[threats[:, 0], threats[:, 1]]
+
+        return bool(np.isin(threat_areas, human_areas).any())
@@ -0,0 +1,415 @@
+"""tiled_engine.py.
+
+Engine which splits the grid into tiles, strips of columns that are each
+stepped by their own worker process with the rules of the arrays engine.
+Every round of a step takes three exchanges between the workers and the
+engine:
+
+1. Every tile takes in the agents that crossed a border, turns its humans
+   and draws the rounds of its agents in the first round, and sends the
+   agents within HALO cells of its borders, the halo strips, to the tiles
+   next to it.
+2. Every tile fights and chooses the moves of its own agents of the round,
+   seeing the agents in the halo strips of its neighbours. It sends the
+   fights with humans of its neighbours, and the moves into the cells along
+   its borders.
+3. Every tile applies the fights of its neighbours, resolves the moves into
+   its border cells together with the moves of its neighbours, moves its
+   agents and sends the agents that crossed a border to their new tile.
+
+Agents keep their round when they cross a border, so they act once a step.
+
+Every tile has its own random stream, spawned from the seed of the model, so
+a seed and a number of tiles always give the same run.
+"""
+from array_engine import ArrayEngine, HUMAN_FIELDS, ZOMBIE_FIELDS, \
+    COUNTERS, MOVE_OFFSETS, first_claims, split_outbreak
+from multiprocessing import Pipe, Process
+
+import numpy as np
+import weakref
+
+# Width of the halo strips, the largest vision an agent can have, see the
+# setVision methods of the agents.
+HALO = 9
+
+
+class Tile(ArrayEngine):
+    """The agents in a strip of columns of the grid.
+
+    Attributes:
+        index (int): Number of the tile, from left to right.
+        x0 (int): First column of the tile.
+        x1 (int): Column after the last column of the tile.
+        halo_sides (tuple): Number of rows of humans in the halo from the
+                            left and from the right neighbour.
+        pending (tuple): The moves chosen in this round, until they are
+                         resolved.
+
+    """
+
+    def __init__(self, engine, index, x0, x1, seed):
+        """Take the agents of the columns of a tile from an engine.
+
+        Args:
+            engine (:obj:): ArrayEngine which took over the agents.
+            index (int): Number of the tile.
+            x0 (int): First column of the tile.
+            x1 (int): Column after the last column of the tile.
+            seed (:obj:): SeedSequence of the random stream of the tile.
+
+        """
+        self.model = None
+        self.rng = np.random.default_rng(seed)
+        self.width = engine.width
+        self.height = engine.height
+        self.incubation_time = engine.incubation_time
+        self.kill_chance = engine.kill_chance
+        self.grouping = engine.grouping
+        self.rounds = engine.rounds
+        self.terrain = engine.terrain
+        self.changes = dict.fromkeys(COUNTERS, 0)
+        self.halo_humans = 0
+        self.halo_zombies = 0
+        self.halo_sides = (0, 0)
+        self.pending = None
+
+        self.index = index
+        self.x0 = x0
+        self.x1 = x1
+
+        rows = engine.take(self.columns(engine.human_pos, x0, x1),
+                           self.columns(engine.zombie_pos, x0, x1))
+
+        for name, column in rows.items():
+            setattr(self, name, column)
+
+    @staticmethod
+    def columns(positions, start, end):
+        """Get a mask of the positions from column start up to end."""
+        return (positions[:, 0] >= start) & (positions[:, 0] < end)
+
+    def begin(self, steps, turn, migrants):
+        """Start a round, after taking in the agents that crossed a border.
+
+        Args:
+            steps (int): The current step.
+            turn (int): The round of the step.
+            migrants (list): Rows of the agents that moved into the tile, or
+                             None, from the left and from the right.
+
+        Returns:
+            (tuple): The halo strips for the left and right neighbour.
+
+        """
+        for rows in migrants:
+            if rows is not None:
+                self.extend(rows)
+
+        if turn == 0:
+            self.turn(steps)
+            self.draw_rounds()
+
+        return (self.take(self.columns(self.human_pos, 0, self.x0 + HALO),
+                          self.columns(self.zombie_pos, 0, self.x0 + HALO)),
+                self.take(self.columns(self.human_pos, self.x1 - HALO,
+                                       self.width),
+                          self.columns(self.zombie_pos, self.x1 - HALO,
+                                       self.width)))
+
+    def act(self, steps, turn, halos):
+        """Fight and choose moves, seeing the halo strips of the neighbours.
+
+        Args:
+            steps (int): The current step.
+            turn (int): The round of the step.
+            halos (list): The halo strip of the left and of the right
+                          neighbour, None for no neighbour.
+
+        Returns:
+            (tuple): For the left and the right neighbour, the fights with
+                     its humans and the moves into the cells along the
+                     border with it.
+
+        """
+        sides = tuple(0 if rows is None else len(rows["human_ids"])
+                      for rows in halos)
+        halos = [rows for rows in halos if rows is not None]
+
+        # The halo comes after the own rows, first the one from the left.
+        for name in HUMAN_FIELDS + ZOMBIE_FIELDS:
+            setattr(self, name, np.concatenate(
+                [getattr(self, name)] + [rows[name] for rows in halos]))
+
+        self.halo_humans = sum(sides)
+        self.halo_zombies = sum(len(rows["zombie_pos"]) for rows in halos)
+        self.halo_sides = sides
+        start = len(self.human_pos) - self.halo_humans
+        kills = self.kills[start:].copy()
+        infected_at = self.infected_at[start:].copy()
+
+        self.fight(steps, turn)
+
+        # Fights with humans of the neighbours.
+        gained = self.kills[start:] - kills
+        infected = (infected_at < 0) & (self.infected_at[start:] >= 0)
+        ids = self.human_ids[start:]
+
+        positions, moves = self.choose_moves(turn)
+        targets = positions + MOVE_OFFSETS[moves]
+        ranks = self.rng.random(len(positions))
+        movers = np.flatnonzero(moves)
+        cells = self.cell_numbers(targets[movers])
+        self.pending = (moves, movers, cells, ranks[movers])
+
+        messages = []
+        left = slice(0, sides[0])
+        right = slice(sides[0], sides[0] + sides[1])
+
+        for rows, border in ((left, (self.x0 - 1, self.x0)),
+                             (right, (self.x1 - 1, self.x1))):
+            hit = np.flatnonzero((gained[rows] > 0) | infected[rows])
+            claims = np.isin(targets[movers, 0], border)
+            messages.append((
+                (ids[rows][hit], gained[rows][hit], infected[rows][hit]),
+                (cells[claims], ranks[movers][claims])))
+
+        return tuple(messages)
+
+    def settle(self, steps, turn, messages):
+        """Apply the fights and moves of this round.
+
+        Args:
+            steps (int): The current step.
+            turn (int): The round of the step.
+            messages (list): What the left and the right neighbour sent to
+                             this tile from act, None for no neighbour.
+
+        Returns:
+            (tuple): Rows of the agents that moved to the left and to the
+                     right neighbour, and the changes of the counters.
+
+        """
+        # Drop the halo, the neighbours keep their own agents up to date.
+        for fields, halo in ((HUMAN_FIELDS, self.halo_humans),
+                             (ZOMBIE_FIELDS, self.halo_zombies)):
+            for name in fields:
+                column = getattr(self, name)
+                setattr(self, name, column[:len(column) - halo])
+
+        self.halo_humans = 0
+        self.halo_zombies = 0
+
+        moves, movers, cells, ranks = self.pending
+        self.pending = None
+        claim_cells = [cells]
+        claim_ranks = [ranks]
+
+        for message in messages:
+            if message is None:
+                continue
+
+            (ids, gained, infected), (cells, ranks) = message
+            rows = np.flatnonzero(np.isin(self.human_ids, ids))
+            order = np.argsort(ids)
+            found = order[np.searchsorted(ids[order], self.human_ids[rows])]
+
+            self.kills[rows] += gained[found]
+            newly = rows[infected[found] & (self.infected_at[rows] < 0)]
+            self.infected_at[newly] = steps
+            self.changes["carrier"] += len(newly)
+
+            claim_cells.append(cells)
+            claim_ranks.append(ranks)
+
+        won = first_claims(np.concatenate(claim_cells),
+                           np.concatenate(claim_ranks))[:len(movers)]
+        moves[movers[~won]] = 0
+        self.apply_moves(moves, turn)
+
+        migrants = []
+
+        for start, end in ((0, self.x0), (self.x1, self.width)):
+            humans = self.columns(self.human_pos, start, end)
+            zombies = self.columns(self.zombie_pos, start, end)
+            migrants.append(self.take(humans, zombies)
+                            if humans.any() or zombies.any() else None)
+            self.remove(humans, zombies)
+
+        changes = self.changes
+        self.changes = dict.fromkeys(COUNTERS, 0)
+
+        return migrants[0], migrants[1], changes
+
+
+class LocalWorker:
+    """Steps a tile in the process of the model."""
+
+    def __init__(self, tile):
+        """Make a worker for a tile."""
+        self.tile = tile
+        self.result = None
+
+    def send(self, method, args):
+        """Call a method of the tile."""
+        self.result = getattr(self.tile, method)(*args)
+
+    def recv(self):
+        """Get the result of the last call."""
+        return self.result
+
+    def close(self):
+        """Stop the worker."""
+        pass
+
+
+class ProcessWorker:
+    """Steps a tile in a process of its own."""
+
+    def __init__(self, tile):
+        """Start a process for a tile."""
+        self.conn, child = Pipe()
+        self.process = Process(target=serve, args=(tile, child), daemon=True)
+        self.process.start()
+
+    def send(self, method, args):
+        """Let the process call a method of its tile."""
+        self.conn.send((method, args))
+
+    def recv(self):
+        """Wait for the result of the last call."""
+        return self.conn.recv()
+
+    def close(self):
+        """Stop the process."""
+        if self.process.is_alive():
+            self.conn.send(None)
+            self.process.join()
+
+
+def serve(tile, conn):
+    """Call the methods of a tile sent over a connection, until None."""
+    while True:
+        message = conn.recv()
+
+        if message is None:
+            break
+
+        method, args = message
+        conn.send(getattr(tile, method)(*args))
+
+
+def close_workers(workers):
+    """Stop all workers of an engine."""
+    for worker in workers:
+        worker.close()
+
+
+class TiledEngine:
+    """Runs the humans and zombies of a model in tiles of columns.
+
+    Attributes:
+        model (:obj:): The model the engine runs.
+        rounds (int): Number of rounds a step is split into.
+        workers (list): The worker stepping each tile, from left to right.
+        migrants (list): For every tile the rows of the agents that moved
+                         into it from the left and from the right.
+
+    """
+
+    def __init__(self, model, tiles=4, parallel=True):
+        """Take over the agents of a model and split them into tiles.
+
+        Args:
+            model (:obj:): Model whose map and agents are made.
+            tiles (int): Number of tiles.
+            parallel (bool): Step every tile in a process of its own, False
+                             to step them one by one in this process.
+
+        Raises:
+            ValueError: If a tile would be narrower than the halo.
+
+        """
+        if tiles < 1 or model.grid.width < tiles * HALO:
+            raise ValueError("Cannot split a grid of width %d into %d tiles "
+                             "of at least %d columns"
+                             % (model.grid.width, tiles, HALO))
+
+        engine = ArrayEngine(model)
+        bounds = np.linspace(0, model.grid.width, tiles + 1).astype(int)
+        seeds = np.random.SeedSequence(
+            model.random.getrandbits(64)).spawn(tiles)
+
+        self.model = model
+        self.rounds = engine.rounds
+        worker = ProcessWorker if parallel else LocalWorker
+        self.workers = [worker(Tile(engine, i, bounds[i], bounds[i + 1],
+                                    seeds[i]))
+                        for i in range(tiles)]
+        self.migrants = [(None, None) for _ in self.workers]
+
+        weakref.finalize(self, close_workers, self.workers)
+
+    def call(self, method, args):
+        """Call a method of every tile at once, with the arguments of each.
+
+        Args:
+            method (string): Name of the method.
+            args (list): For every tile the tuple of arguments.
+
+        Returns:
+            (list): The result of every tile.
+
+        """
+        for worker, tile_args in zip(self.workers, args):
+            worker.send(method, tile_args)
+
+        return [worker.recv() for worker in self.workers]
+
+    def neighbours(self, results, i):
+        """Get what the left and right neighbour of tile i sent to it."""
+        left = results[i - 1][1] if i > 0 else None
+        right = results[i + 1][0] if i < len(results) - 1 else None
+
+        return left, right
+
+    def step(self):
+        """Let all tiles take one step."""
+        steps = self.model.schedule.steps
+        tiles = range(len(self.workers))
+
+        for turn in range(self.rounds):
+            halos = self.call("begin", [(steps, turn, self.migrants[i])
+                                        for i in tiles])
+            messages = self.call("act", [(steps, turn,
+                                          self.neighbours(halos, i))
+                                         for i in tiles])
+            results = self.call("settle", [(steps, turn,
+                                            self.neighbours(messages, i))
+                                           for i in tiles])
+
+            self.migrants = [self.neighbours(results, i) for i in tiles]
+
+            for _, _, changes in results:
+                for name in COUNTERS:
+                    setattr(self.model, name,
+                            getattr(self.model, name) + changes[name])
+
+        self.model.schedule.steps += 1
+        self.model.schedule.time += 1
+
+    def outbreak_positions(self):
+        """Get the positions of the two sides of the outbreak in all tiles,
+        and of the agents moving between tiles, see split_outbreak."""
+        sides = self.call("outbreak_positions", [() for _ in self.workers])
+
+        for migrants in self.migrants:
+            sides.extend(split_outbreak(rows) for rows in migrants
+                         if rows is not None)
+
+        return tuple(np.concatenate([side[i] for side in sides])
+                     for i in range(2))
+
+    def close(self):
+        """Stop the workers of the tiles."""
+        close_workers(self.workers)